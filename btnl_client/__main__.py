@@ -1,8 +1,13 @@
 import argparse
+import asyncio
+import sys
 from btnl_client.product import BitnomialHttpClient, AuthBitnomialHttpClient
 import btnl_client.product as web
 from datetime import date, datetime
 import btnl_client.websocket as ws
+from btnl_client.feed_simulator import FeedSimulator, SyntheticMarket
+import btnl_client.bench as bench
+from btnl_client.transport import use_uvloop
 
 
 def get_parser():
@@ -35,6 +40,7 @@ def get_parser():
     parser = argparse.ArgumentParser(prog="btnl_client", description="CLI BTNL client")
     parser.add_argument("--base-url", type=str, default=web.BASE_URL)
     parser.add_argument("--env", type=str, default="prod")
+    parser.add_argument("--uvloop", action="store_true")
     command = parser.add_subparsers(dest="command", required=True)
     get_product_spec = command.add_parser("get-product-spec")
     get_product_spec.add_argument("product_id", type=int)
@@ -53,13 +59,40 @@ def get_parser():
     get_fills = command.add_parser("get-block-trades")
     add_auth_args(get_fills)
     get_fills.add_argument("--status", type=web.BlockTradeStatus, action="append")
-    command.add_parser("ws-feed")
+    ws_feed = command.add_parser("ws-feed")
+    ws_feed.add_argument("--uri", type=str, default=ws.WEBSOCKET_URI)
+    ws_feed.add_argument(
+        "--product-code", type=str, dest="product_codes", action="append"
+    )
+    feed_server = command.add_parser("feed-server")
+    feed_server.add_argument("--host", type=str, default="127.0.0.1")
+    feed_server.add_argument("--ws-port", type=int, default=8765)
+    feed_server.add_argument("--btp-port", type=int, default=11001)
+    feed_server.add_argument(
+        "--symbol", type=str, dest="symbols", action="append", default=None
+    )
+    feed_server.add_argument("--rate", type=float, default=1000)
+    feed_server.add_argument("--depth", type=int, default=10)
+    feed_server.add_argument("--burst-size", type=int, default=0)
+    feed_server.add_argument("--burst-interval", type=float, default=1.0)
+    feed_server.add_argument("--seed", type=int, default=None)
+    bench_parser = command.add_parser("bench")
+    bench_parser.add_argument(
+        "--suite", type=str, dest="suites", action="append", choices=list(bench.SUITES)
+    )
+    bench_parser.add_argument("--min-time", type=float, default=0.2)
+    bench_parser.add_argument("--match", type=str, default="")
+    bench_parser.add_argument("--output", type=str, default=None)
+    bench_parser.add_argument("--baseline", type=str, default=None)
+    bench_parser.add_argument("--threshold", type=float, default=0.1)
     return parser
 
 
 def main():
     parser = get_parser()
     args = parser.parse_args()
+    if args.uvloop and not use_uvloop():
+        print("uvloop is not installed, using asyncio's event loop", file=sys.stderr)
     if args.command == "get-orders":
         client = AuthBitnomialHttpClient(
             connection_id=args.connection_id,
@@ -163,21 +196,47 @@ def main():
         )
         print(result)
     elif args.command == "ws-feed":
-        client = ws.BitnomialWebSocketClient("wss://bitnomial.com/exchange/ws")
+        client = ws.BitnomialWebSocketClient(args.uri)
 
+        channel_codes = args.product_codes or ["BUI"]
         channels = [
-            ws.Channel(name=ws.ChannelName.Trade, product_codes=["BUI"]),
-            ws.Channel(name=ws.ChannelName.Book, product_codes=["BUI"]),
-            ws.Channel(name=ws.ChannelName.Status, product_codes=["BUI"]),
+            ws.Channel(name=ws.ChannelName.Trade, product_codes=channel_codes),
+            ws.Channel(name=ws.ChannelName.Book, product_codes=channel_codes),
+            ws.Channel(name=ws.ChannelName.Status, product_codes=channel_codes),
         ]
 
         message = ws.SubscribeMessage(
             type=ws.SubscribeType.Subscribe,
-            product_codes=["BUI", "BUSO"],
+            product_codes=args.product_codes or ["BUI", "BUSO"],
             channels=channels,
         )
 
         client.run(message)
+    elif args.command == "feed-server":
+        symbols = args.symbols or ["BUIZ6"]
+        market = SyntheticMarket(
+            {symbol: i + 1 for i, symbol in enumerate(symbols)},
+            depth=args.depth,
+            seed=args.seed,
+        )
+        simulator = FeedSimulator(
+            market,
+            rate=args.rate,
+            burst_size=args.burst_size,
+            burst_interval=args.burst_interval,
+        )
+        asyncio.run(simulator.serve_forever(args.host, args.ws_port, args.btp_port))
+    elif args.command == "bench":
+        sys.exit(
+            bench.main(
+                args.suites,
+                min_time=args.min_time,
+                match=args.match,
+                output=args.output,
+                baseline=args.baseline,
+                threshold=args.threshold,
+            )
+        )
 
 
 if __name__ == "__main__":
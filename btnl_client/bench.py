@@ -0,0 +1,559 @@
+import asyncio
+import json
+import platform
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+import btnl_client.hmac_utils as hmac_utils
+import btnl_client.websocket as ws
+from btnl_client.client import OrderEntryClient
+from btnl_client.feed_simulator import FeedSimulator, MarketEvent, SyntheticMarket
+from btnl_client.protocol import (
+    Ack,
+    Close,
+    CloseReason,
+    Disconnect,
+    DisconnectReason,
+    Fill,
+    Header,
+    Heartbeat,
+    Liquidity,
+    LoginAck,
+    LoginReject,
+    LoginRejectReason,
+    LoginRequest,
+    LogoutRequest,
+    MarketState,
+    MarketStateUpdate,
+    Message,
+    Modify,
+    ModifyTemplate,
+    Open,
+    OpenTemplate,
+    Reject,
+    RejectReason,
+    Side,
+    TimeInForce,
+    new_message,
+)
+from btnl_client.protocol.pricefeed import Block, Book, BookLevel, Level, Trade
+from btnl_client.latency import Histogram
+from btnl_client.simulator import ExchangeSimulator
+from btnl_client.transport import PROFILES, TransportProfile
+
+
+@dataclass
+class BenchResult:
+    name: str
+    iterations: int
+    ns_per_op: float
+
+    @property
+    def ops_per_sec(self) -> float:
+        return 1e9 / self.ns_per_op if self.ns_per_op else float("inf")
+
+
+def measure(
+    name: str, fn: Callable[[], object], min_time: float = 0.2, repeat: int = 5
+) -> BenchResult:
+    """
+    Time `fn` in batches large enough to run for `min_time` seconds and keep
+    the fastest of `repeat` batches
+    """
+    iterations = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter_ns() - start
+        if elapsed >= min_time * 1e9 / repeat:
+            break
+        iterations *= 2
+    best = elapsed
+    for _ in range(repeat - 1):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            fn()
+        best = min(best, time.perf_counter_ns() - start)
+    return BenchResult(name, iterations, best / iterations)
+
+
+SIGN_PARAMS = {
+    "symbol": ["BUIH4", "BUIM4"],
+    "connection_id": None,
+    "cursor": "MTIzNDU2Nzg5MA==",
+    "order": "asc",
+    "limit": 1000,
+}
+
+
+def bench_signing(min_time: float = 0.2) -> List[BenchResult]:
+    token = "0" * 64
+    timestamp = hmac_utils.timestamp_string()
+    signer = hmac_utils.RequestSigner(1, token)
+    batch = [("GET", "/prod/fills", SIGN_PARAMS)] * 100
+    return [
+        measure(
+            "hmac.signature",
+            lambda: hmac_utils.signature(
+                "GET", "/prod/fills", SIGN_PARAMS, timestamp, 1, token
+            ),
+            min_time,
+        ),
+        measure(
+            "hmac.RequestSigner.sign",
+            lambda: signer.sign("GET", "/prod/fills", SIGN_PARAMS, timestamp),
+            min_time,
+        ),
+        measure(
+            "hmac.RequestSigner.headers_many[100]",
+            lambda: signer.headers_many(batch),
+            min_time,
+        ),
+    ]
+
+
+def bench_order_encoding(min_time: float = 0.2) -> List[BenchResult]:
+    open_template = OpenTemplate(3668, Side.Bid, TimeInForce.Day)
+    modify_template = ModifyTemplate()
+    return [
+        measure(
+            "encode.Open.message",
+            lambda: new_message(
+                1, Open(2, 3668, Side.Bid, 10000, 10, TimeInForce.Day)
+            ).to_btp(),
+            min_time,
+        ),
+        measure(
+            "encode.Open.template",
+            lambda: open_template.encode(1, 2, 10000, 10),
+            min_time,
+        ),
+        measure(
+            "encode.Modify.message",
+            lambda: new_message(1, Modify(2, 3, 10000, 10)).to_btp(),
+            min_time,
+        ),
+        measure(
+            "encode.Modify.template",
+            lambda: modify_template.encode(1, 2, 3, 10000, 10),
+            min_time,
+        ),
+    ]
+
+
+def _book(depth: int) -> Book:
+    return Book(
+        1,
+        3668,
+        [BookLevel(10000 - i, 10 + i) for i in range(depth)],
+        [BookLevel(10001 + i, 10 + i) for i in range(depth)],
+    )
+
+
+# One sample of every BTP message body
+BTP_SAMPLES = {
+    "LoginRequest": LoginRequest(1, bytes(32), 30),
+    "LogoutRequest": LogoutRequest("N"),
+    "LoginAck": LoginAck(),
+    "LoginReject": LoginReject(LoginRejectReason.Unauthorized),
+    "Heartbeat": Heartbeat(),
+    "Disconnect": Disconnect(DisconnectReason.SequenceIdFault, 10, 12),
+    "Open": Open(2, 3668, Side.Bid, 10000, 10, TimeInForce.Day),
+    "Modify": Modify(2, 3, 10000, 10),
+    "Ack": Ack(1, 2, None),
+    "Reject": Reject(2, 3, RejectReason.OrderNotFound),
+    "Close": Close(1, 2, CloseReason.IOCFinished),
+    "Fill": Fill(1, 2, 10000, 10, Liquidity.Add),
+    "MarketStateUpdate": MarketStateUpdate(MarketState.Open, 1, 3668),
+    "Pricefeed.Trade": Trade(1, 3668, Side.Bid, 10000, 10),
+    "Pricefeed.Level": Level(1, 3668, Side.Ask, 10000, 10),
+    "Pricefeed.Block": Block(1, 3668, 10000, 10),
+    "Pricefeed.Book[1]": _book(1),
+    "Pricefeed.Book[10]": _book(10),
+    "Pricefeed.Book[100]": _book(100),
+}
+
+
+def bench_codecs(min_time: float = 0.2) -> List[BenchResult]:
+    results = []
+    for name, body in BTP_SAMPLES.items():
+        frame = new_message(1, body).to_btp()
+        results.append(
+            measure(
+                f"encode.{name}",
+                lambda body=body: new_message(1, body).to_btp(),
+                min_time,
+            )
+        )
+        results.append(
+            measure(
+                f"decode.{name}",
+                lambda frame=frame: Message.from_btp(frame),
+                min_time,
+            )
+        )
+    header = new_message(1, BTP_SAMPLES["Open"]).to_btp()[: Header.LEN]
+    results.append(measure("decode.Header", lambda: Header.from_btp(header), min_time))
+    return results
+
+
+def _ws_sample(kind: ws.MessageType, **fields) -> str:
+    return MarketEvent(
+        kind, 1234567, "BUIZ6", 3668, 1700000000123456789, **fields
+    ).to_json()
+
+
+WS_SAMPLES = {
+    "trade": _ws_sample(ws.MessageType.Trade, price=10000, quantity=10),
+    "level": _ws_sample(ws.MessageType.Level, price=10000, quantity=10),
+    "block": _ws_sample(ws.MessageType.Block, price=10000, quantity=500),
+    "status": _ws_sample(ws.MessageType.Status, state=MarketState.Halt),
+    "book[10]": _ws_sample(
+        ws.MessageType.Book,
+        bids=[(10000 - i, 10) for i in range(10)],
+        asks=[(10001 + i, 10) for i in range(10)],
+    ),
+    "book[100]": _ws_sample(
+        ws.MessageType.Book,
+        bids=[(10000 - i, 10) for i in range(100)],
+        asks=[(10001 + i, 10) for i in range(100)],
+    ),
+}
+
+
+def bench_websocket(min_time: float = 0.2) -> List[BenchResult]:
+    return [
+        measure(
+            f"ws.parse_message.{name}",
+            lambda text=text: ws.parse_message(text),
+            min_time,
+        )
+        for name, text in WS_SAMPLES.items()
+    ]
+
+
+class _CountingClient(OrderEntryClient):
+    received = 0
+
+    async def app_message(self, message):
+        self.received += 1
+
+
+async def _order_entry_loopback(orders: int, round_trips: int) -> List[BenchResult]:
+    simulator = ExchangeSimulator()
+    await simulator.start()
+    client = _CountingClient("127.0.0.1", simulator.port, 1, "00" * 32)
+    await client.connect()
+    receiving = asyncio.ensure_future(client.receive_messages_loop())
+    try:
+        # Sequential: one order in flight at a time
+        start = time.perf_counter_ns()
+        for order_id in range(1, round_trips + 1):
+            body = Open(order_id, 1, Side.Bid, 100, 1, TimeInForce.Day)
+            await (await client.send_tracked(body, (order_id, None)))
+        round_trip = (time.perf_counter_ns() - start) / round_trips
+
+        # Pipelined: everything sent up front, waiting only for the acks
+        expected = client.received + orders
+        start = time.perf_counter_ns()
+        for order_id in range(round_trips + 1, round_trips + orders + 1):
+            await client.send_message(
+                Open(order_id, 1, Side.Bid, 100, 1, TimeInForce.Day)
+            )
+            if order_id % 1000 == 0:
+                await client.writer.drain()
+        while client.received < expected:
+            await asyncio.sleep(0.001)
+        pipelined = (time.perf_counter_ns() - start) / orders
+    finally:
+        receiving.cancel()
+        client.stop()
+        await simulator.close()
+    return [
+        BenchResult("e2e.order_entry.round_trip", round_trips, round_trip),
+        BenchResult("e2e.order_entry.pipelined", orders, pipelined),
+    ]
+
+
+class _CountingFeedClient(ws.BitnomialWebSocketClient):
+    received = 0
+
+    def handle_message(self, message):
+        self.received += 1
+
+
+async def _feed_loopback(messages: int) -> List[BenchResult]:
+    results = []
+    market = SyntheticMarket({"BUIZ6": 1, "BUIH7": 2}, seed=0)
+
+    # BTP pricefeed decoded with Message.read_message
+    simulator = FeedSimulator(market, rate=None, max_batch=1000)
+    await simulator.start(ws_port=None)
+    reader, writer = await asyncio.open_connection("127.0.0.1", simulator.btp_port)
+    await asyncio.sleep(0.05)
+    received = 0
+
+    async def read_btp():
+        nonlocal received
+        while received < messages:
+            await Message.read_message(reader)
+            received += 1
+
+    start = time.perf_counter_ns()
+    publishing = asyncio.ensure_future(simulator.run(messages))
+    await read_btp()
+    results.append(
+        BenchResult(
+            "e2e.feed.btp", messages, (time.perf_counter_ns() - start) / messages
+        )
+    )
+    await publishing
+    writer.close()
+    await simulator.close()
+
+    # Websocket feed through BitnomialWebSocketClient
+    simulator = FeedSimulator(market, rate=None, max_batch=1000)
+    await simulator.start(btp_port=None)
+    client = _CountingFeedClient(simulator.ws_uri)
+    subscribe = ws.SubscribeMessage(
+        ws.SubscribeType.Subscribe,
+        ["BUI"],
+        [ws.Channel(name, ["BUI"]) for name in ws.ChannelName],
+    )
+    connection = asyncio.ensure_future(client.connect(subscribe))
+    while not simulator.subscribers:
+        await asyncio.sleep(0.01)
+    start = time.perf_counter_ns()
+    await simulator.run(messages)
+    while client.received < messages:
+        await asyncio.sleep(0.001)
+    results.append(
+        BenchResult(
+            "e2e.feed.ws", messages, (time.perf_counter_ns() - start) / messages
+        )
+    )
+    connection.cancel()
+    await simulator.close()
+    return results
+
+
+def bench_end_to_end(min_time: float = 0.2) -> List[BenchResult]:
+    """
+    Loopback scenarios through the real clients against the local
+    simulators, sized from `min_time` so quick runs stay quick
+    """
+    scale = max(1, int(min_time * 10))
+
+    async def run():
+        return await _order_entry_loopback(
+            5000 * scale, 500 * scale
+        ) + await _feed_loopback(20000 * scale)
+
+    return asyncio.run(run())
+
+
+async def _transport_loopback(
+    profile: TransportProfile, round_trips: int
+) -> Dict[str, Histogram]:
+    simulator = ExchangeSimulator()
+    await simulator.start()
+    client = _CountingClient(
+        "127.0.0.1", simulator.port, 1, "00" * 32, transport=profile
+    )
+    await client.connect()
+    receiving = asyncio.ensure_future(client.receive_messages_loop())
+    histograms = {"round_trip": Histogram(), "open_modify": Histogram()}
+    try:
+        # One order in flight at a time, IOC so the simulator's book stays
+        # empty
+        for order_id in range(1, round_trips + 1):
+            body = Open(order_id, 1, Side.Bid, 100, 1, TimeInForce.IOC)
+            start = time.perf_counter_ns()
+            await (await client.send_tracked(body, (order_id, None)))
+            histograms["round_trip"].record(time.perf_counter_ns() - start)
+        # Two small frames back to back, the case Nagle's algorithm delays.
+        # The modify cancels the order.
+        for order_id in range(round_trips + 1, 2 * round_trips + 1):
+            start = time.perf_counter_ns()
+            opened = await client.send_tracked(
+                Open(order_id, 1, Side.Bid, 100, 1, TimeInForce.Day), (order_id, None)
+            )
+            modified = await client.send_tracked(
+                Modify(order_id, order_id, 100, 0), (order_id, order_id)
+            )
+            await opened
+            await modified
+            histograms["open_modify"].record(time.perf_counter_ns() - start)
+    finally:
+        receiving.cancel()
+        client.stop()
+        # Let the simulator see the connection close before the loop does
+        await asyncio.sleep(0.01)
+        await simulator.close()
+    return histograms
+
+
+def _run_on(loop: asyncio.AbstractEventLoop, coroutine):
+    """
+    `asyncio.run` on a given loop
+    """
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        tasks = asyncio.all_tasks(loop)
+        if tasks:
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
+
+
+def bench_transport(min_time: float = 0.2) -> List[BenchResult]:
+    """
+    Order entry latency distribution over loopback under each transport
+    profile, and under uvloop as well when it is installed. Profiles whose
+    options the host does not allow still run, with those options skipped.
+    """
+    round_trips = 500 * max(1, int(min_time * 10))
+    loops: Dict[str, Callable[[], asyncio.AbstractEventLoop]] = {
+        "asyncio": asyncio.new_event_loop
+    }
+    try:
+        import uvloop
+
+        loops["uvloop"] = uvloop.new_event_loop
+    except ImportError:
+        pass
+    results = []
+    for loop_name, new_loop in loops.items():
+        for name, profile in PROFILES.items():
+            histograms = _run_on(new_loop(), _transport_loopback(profile, round_trips))
+            for scenario, histogram in histograms.items():
+                for percentile in (50.0, 99.0, 99.9):
+                    results.append(
+                        BenchResult(
+                            f"transport.{loop_name}.{name}.{scenario}.p{percentile:g}",
+                            histogram.count,
+                            histogram.percentile(percentile),
+                        )
+                    )
+    return results
+
+
+SUITES: Dict[str, Callable[[float], List[BenchResult]]] = {
+    "codec": bench_codecs,
+    "order": bench_order_encoding,
+    "ws": bench_websocket,
+    "sign": bench_signing,
+    "e2e": bench_end_to_end,
+    "transport": bench_transport,
+}
+
+
+def run_suites(
+    names: Optional[List[str]] = None, min_time: float = 0.2, match: str = ""
+) -> List[BenchResult]:
+    results = []
+    for name in names or list(SUITES):
+        results.extend(
+            result for result in SUITES[name](min_time) if match in result.name
+        )
+    return results
+
+
+def to_json(results: List[BenchResult]) -> dict:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "results": [
+            dict(asdict(result), ops_per_sec=result.ops_per_sec) for result in results
+        ],
+    }
+
+
+def save_results(results: List[BenchResult], path: str):
+    with open(path, "w") as f:
+        json.dump(to_json(results), f, indent=2)
+
+
+def load_baseline(path: str) -> Dict[str, float]:
+    """
+    `ns_per_op` by benchmark name from a file written by `save_results`
+    """
+    with open(path) as f:
+        data = json.load(f)
+    return {result["name"]: result["ns_per_op"] for result in data["results"]}
+
+
+@dataclass
+class Comparison:
+    name: str
+    baseline_ns: float
+    ns_per_op: float
+
+    @property
+    def change(self) -> float:
+        """
+        Relative change in time per operation, positive is slower
+        """
+        return self.ns_per_op / self.baseline_ns - 1
+
+
+def compare(results: List[BenchResult], baseline: Dict[str, float]) -> List[Comparison]:
+    return [
+        Comparison(result.name, baseline[result.name], result.ns_per_op)
+        for result in results
+        if result.name in baseline
+    ]
+
+
+def print_results(results: List[BenchResult], out: Optional[Callable] = None):
+    out = out or print
+    for result in results:
+        out(
+            f"{result.name:<48} {result.ns_per_op:>12.1f} ns/op "
+            f"{result.ops_per_sec:>14.0f} ops/s"
+        )
+
+
+def print_comparisons(
+    comparisons: List[Comparison], threshold: float, out: Optional[Callable] = None
+):
+    out = out or print
+    for comparison in comparisons:
+        flag = "REGRESSION" if comparison.change > threshold else ""
+        out(
+            f"{comparison.name:<48} {comparison.baseline_ns:>12.1f} -> "
+            f"{comparison.ns_per_op:>12.1f} ns/op {comparison.change:>+8.1%} {flag}"
+        )
+
+
+def main(
+    names: Optional[List[str]] = None,
+    min_time: float = 0.2,
+    match: str = "",
+    output: Optional[str] = None,
+    baseline: Optional[str] = None,
+    threshold: float = 0.1,
+) -> int:
+    """
+    Run the suites, returning 1 if anything is more than `threshold` slower
+    than `baseline`
+    """
+    results = run_suites(names, min_time, match)
+    print_results(results)
+    if output is not None:
+        save_results(results, output)
+    if baseline is None:
+        return 0
+    comparisons = compare(results, load_baseline(baseline))
+    print()
+    print_comparisons(comparisons, threshold)
+    return int(any(comparison.change > threshold for comparison in comparisons))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
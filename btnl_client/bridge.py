@@ -0,0 +1,120 @@
+import asyncio
+import collections
+import concurrent.futures
+import threading
+from typing import Deque, Iterable, List, Optional, Tuple
+
+from btnl_client.client import OrderEntryClient, ack_key
+from btnl_client.protocol import MessageBody, Modify, Open, Side, TimeInForce
+
+
+class OrderBridge:
+    """
+    Lets threads outside the event loop submit messages to an
+    `OrderEntryClient`.
+
+    Submissions are appended to a deque, which is safe to share between
+    threads, and the loop is woken at most once per batch: the first
+    submission after a drain schedules it, later ones see the wakeup is
+    already pending. Each submission returns a `concurrent.futures.Future`
+    that resolves with the `SendResult` once the message is written or
+    held until its product reopens, or with the `Ack` when `wait_ack` is
+    set.
+    """
+
+    def __init__(self, client: OrderEntryClient, loop: asyncio.AbstractEventLoop):
+        self.client = client
+        self.loop = loop
+        self.queue: Deque[Tuple[MessageBody, bool, concurrent.futures.Future]] = (
+            collections.deque()
+        )
+        self._wakeup_pending = False
+        self._wakeup_lock = threading.Lock()
+        self._drain_task: Optional[asyncio.Task] = None
+
+    def submit(
+        self, body: MessageBody, wait_ack: bool = False
+    ) -> concurrent.futures.Future:
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        self.queue.append((body, wait_ack, future))
+        self._wakeup()
+        return future
+
+    def submit_many(
+        self, bodies: Iterable[MessageBody], wait_ack: bool = False
+    ) -> List[concurrent.futures.Future]:
+        entries = [(body, wait_ack, concurrent.futures.Future()) for body in bodies]
+        self.queue.extend(entries)
+        self._wakeup()
+        return [future for _, _, future in entries]
+
+    def open(
+        self,
+        order_id: int,
+        product_id: int,
+        side: Side,
+        price: int,
+        quantity: int,
+        time_in_force: TimeInForce = TimeInForce.Day,
+        timeout: Optional[float] = None,
+    ):
+        """
+        Blocking open, returns the `Ack`
+        """
+        body = Open(order_id, product_id, side, price, quantity, time_in_force)
+        return self.submit(body, wait_ack=True).result(timeout)
+
+    def modify(
+        self,
+        order_id: int,
+        modify_id: int,
+        price: int,
+        quantity: int,
+        timeout: Optional[float] = None,
+    ):
+        """
+        Blocking modify, returns the `Ack`
+        """
+        body = Modify(order_id, modify_id, price, quantity)
+        return self.submit(body, wait_ack=True).result(timeout)
+
+    def _wakeup(self):
+        if self._wakeup_pending:
+            return
+        with self._wakeup_lock:
+            if self._wakeup_pending:
+                return
+            self._wakeup_pending = True
+        self.loop.call_soon_threadsafe(self._on_wakeup)
+
+    def _on_wakeup(self):
+        # Clear the flag before draining so anything appended after this point
+        # either gets drained below or schedules a new wakeup
+        self._wakeup_pending = False
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = self.loop.create_task(self._drain())
+
+    async def _drain(self):
+        queue = self.queue
+        while queue:
+            body, wait_ack, future = queue.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                key = ack_key(body) if wait_ack else None
+                if key is None:
+                    future.set_result(await self.client.send_message(body))
+                else:
+                    ack = await self.client.send_tracked(body, key)
+                    ack.add_done_callback(lambda f, future=future: _copy(f, future))
+            except Exception as e:
+                future.set_exception(e)
+
+
+def _copy(source: asyncio.Future, target: concurrent.futures.Future):
+    if source.cancelled():
+        target.set_exception(concurrent.futures.CancelledError())
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
@@ -1,30 +1,146 @@
 import asyncio
 import time
+from enum import Enum
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
 
+from btnl_client import tracing
+from btnl_client.journal import Direction, JournalWriter
+from btnl_client.latency import LatencyTracker
+from btnl_client.market_registry import MarketStateRegistry
+from btnl_client.metrics import ClientMetrics
 from btnl_client.protocol import (
+    Ack,
     BodyEncoding,
+    Disconnect,
     Heartbeat,
     LoginAck,
+    LoginReject,
+    LoginRejectReason,
     LoginRequest,
     Message,
+    MessageBody,
+    Modify,
+    ModifyTemplate,
     Open,
+    OpenTemplate,
+    Reject,
     Side,
     TimeInForce,
     new_message,
 )
+from btnl_client.rate_limit import Priority, RateGovernor
+from btnl_client.risk import PreTradeReject, RiskGate
+from btnl_client.strategy import Strategy
+from btnl_client.timers import Clock, DeadlineTimer, LoopClock
+from btnl_client.transport import TransportProfile, open_connection, quickack_rearm
+
+
+class LoginRejected(ValueError):
+    def __init__(self, reason: LoginRejectReason):
+        super().__init__(f"Login rejected: {reason.name}")
+        self.reason = reason
+
+
+class SessionDisconnected(ConnectionError):
+    def __init__(self, disconnect: Disconnect):
+        super().__init__(f"Disconnected by exchange: {disconnect}")
+        self.disconnect = disconnect
+
+
+class HeartbeatTimeout(ConnectionError):
+    pass
+
+
+class OrderRejected(ValueError):
+    def __init__(self, reject: Reject):
+        super().__init__(f"Order rejected: {reject}")
+        self.reject = reject
+
+
+class SendResult(Enum):
+    Sent = "sent"
+    # Queued by the MarketStateRegistry until the product reopens
+    Held = "held"
+
+
+def ack_key(body: MessageBody) -> Optional[Tuple[int, Optional[int]]]:
+    """
+    The `(order_id, modify_id)` of the Ack or Reject answering `body`
+    """
+    if isinstance(body, Open):
+        return (body.order_id, None)
+    if isinstance(body, Modify):
+        return (body.order_id, body.modify_id)
+    return None
 
 
 class OrderEntryClient:
     HEARTBEAT_INTERVAL = 30
+    # Silence from the exchange for this many heartbeat intervals means the
+    # connection is dead
+    RECEIVE_TIMEOUT_FACTOR = 1.5
 
-    def __init__(self, host, port, connection_id, hex_auth_token):
+    def __init__(
+        self,
+        host,
+        port,
+        connection_id,
+        hex_auth_token,
+        risk_gate: Optional[RiskGate] = None,
+        governor: Optional[RateGovernor] = None,
+        market_states: Optional[MarketStateRegistry] = None,
+        clock: Optional[Clock] = None,
+        on_receive_timeout: Optional[Callable[[], None]] = None,
+        strategy: Optional[Strategy] = None,
+        journal: Optional[JournalWriter] = None,
+        latency: Optional[LatencyTracker] = None,
+        metrics: Optional[ClientMetrics] = None,
+        receive_timestamps: bool = False,
+        transport: Optional[TransportProfile] = None,
+    ):
         assert len(hex_auth_token) == 64
         self.host = host
         self.port = port
         self.connection_id = connection_id
         self.auth_token = bytes.fromhex(hex_auth_token)
-        self.last_sent_msg_time = 0
+        self.clock = clock or LoopClock()
+        self.last_sent_msg_time = 0.0
+        self.last_received_msg_time = 0.0
         self.sequence_id = 1
+        self.on_receive_timeout = on_receive_timeout
+        self.heartbeat_fault: Optional[asyncio.Future] = None
+        self.journal = journal
+        self.latency = latency
+        self.modify_template = ModifyTemplate()
+        # Order and modify ids only need to be unique, starting from the clock
+        # keeps them unique across restarts within a trading day
+        self.next_order_id = time.time_ns() // 1000
+        self.next_modify_id = self.next_order_id
+        # Futures for bulk sends, keyed by (order_id, modify_id) as in Ack
+        self.pending_acks: Dict[Tuple[int, Optional[int]], asyncio.Future] = {}
+        self.strategy = strategy
+        self.strategy_handlers = strategy.attach(self) if strategy is not None else None
+        self.risk_gate = risk_gate
+        self.governor = governor
+        self.market_states = market_states
+        if market_states is not None:
+            market_states.on_release = self.send_released
+            if risk_gate is not None:
+                # Share one view of market state rather than tracking it twice
+                risk_gate.market_states = market_states.states
+        # Socket options for the connection, asyncio's defaults if None
+        self.transport = transport
+        # Options of `transport` the last connection could not set
+        self.transport_skipped: Dict[str, str] = {}
+        self._quickack: Optional[Callable[[], None]] = None
+        # Stamp every received message with the time_ns it was read at
+        self.receive_timestamps = receive_timestamps
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.attach(self)
+        # Sends of released messages still running, referenced so they are
+        # not garbage collected mid-send
+        self.release_tasks: Set[asyncio.Task] = set()
 
     async def trade(self):
         # Implement handling of outgoing messages here
@@ -36,7 +152,7 @@ class OrderEntryClient:
         pass
 
     def reset_heartbeat_timer(self):
-        self.last_sent_msg_time = time.time()
+        self.last_sent_msg_time = self.clock.time()
 
     async def login(self):
         # Create login request message
@@ -49,54 +165,517 @@ class OrderEntryClient:
         # Send login request
         await self.send_message(login_request)
 
-        login_resp = await Message.read_message(self.reader)
+        login_resp = await self.read_message()
         print(login_resp)
+        if isinstance(login_resp.body, LoginReject):
+            raise LoginRejected(login_resp.body.reject_reason)
         if not isinstance(login_resp.body, LoginAck):
             raise ValueError(f"Bad login response: {login_resp}")
         return login_resp
 
-    async def send_message(self, msg_body):
+    async def send_message(
+        self, msg_body, priority: Optional[Priority] = None
+    ) -> SendResult:
+        """
+        Send `msg_body`, returning whether it was written or is held until
+        its product reopens. Raises `PreTradeReject` if checks fail.
+        """
+        outcome = (await self.send_gated([msg_body], self._write_bodies, priority))[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def send_gated(
+        self,
+        bodies: Sequence[MessageBody],
+        write: Callable[[List[MessageBody]], None],
+        priority: Optional[Priority] = None,
+    ) -> List[Union[SendResult, PreTradeReject]]:
+        """
+        The send path every message takes: market state, risk checks and the
+        rate governor, then `write` with the bodies let through, then
+        latency, market state and tracing bookkeeping.
+
+        Returns per body whether it was sent, held until its product reopens
+        or rejected locally. What the risk checks reserved for bodies let
+        through is released again if acquiring or writing fails.
+        """
+        latency = self.latency
+        traced = bool(tracing.TRACERS)
+        if latency is not None or traced:
+            start = time.perf_counter_ns()
+        registry = self.market_states
+        risk_gate = self.risk_gate
+        outcomes: List[Union[SendResult, PreTradeReject]] = []
+        passed = []
+        for body in bodies:
+            try:
+                if registry is not None and not registry.admit(body):
+                    outcomes.append(SendResult.Held)
+                    continue
+                if risk_gate is not None:
+                    reason = risk_gate.check(body)
+                    if reason is not None:
+                        raise PreTradeReject(reason, body)
+            except PreTradeReject as e:
+                outcomes.append(e)
+                continue
+            outcomes.append(SendResult.Sent)
+            passed.append(body)
+        if not passed:
+            return outcomes
+        if traced:
+            checked = time.perf_counter_ns()
+        try:
+            # Only order entry counts against the messaging rate, heartbeats
+            # and login go out immediately
+            if (
+                self.governor is not None
+                and passed[0].body_encoding == BodyEncoding.OrderEntry
+            ):
+                if priority is None:
+                    # The batch goes at its most urgent body's priority
+                    priority = min(map(self.governor.classify, passed))
+                await self.governor.acquire(priority, len(passed))
+            if traced:
+                acquired = time.perf_counter_ns()
+            write(passed)
+        except BaseException:
+            # Cancelled while queued or failed to write, nothing went out
+            if risk_gate is not None:
+                for body in passed:
+                    risk_gate.release(body)
+            raise
+        if latency is not None or traced:
+            written = time.perf_counter_ns()
+            if latency is not None:
+                for body in passed:
+                    latency.on_sent(body, start, written)
+            if traced:
+                tracing.emit(
+                    tracing.SEND_MESSAGE,
+                    type(passed[0]).__name__,
+                    start,
+                    (
+                        ("checks", checked - start),
+                        ("governor", acquired - checked),
+                        ("write", written - acquired),
+                    ),
+                )
+        if registry is not None:
+            for body in passed:
+                registry.on_sent(body)
+        return outcomes
+
+    def _write_bodies(self, bodies: List[MessageBody]):
+        for body in bodies:
+            self.write_message(body)
+
+    def write_message(self, msg_body):
         seq_id = self.sequence_id
         if msg_body.body_encoding == BodyEncoding.Heartbeat:
             seq_id = 0
         else:
             self.sequence_id += 1
-        msg = new_message(seq_id, msg_body).to_btp()
+        self.write_frame(new_message(seq_id, msg_body).to_btp())
+
+    def write_frame(self, frame: bytes):
         # Write message to socket
         self.reset_heartbeat_timer()
-        self.writer.write(msg)
+        self.writer.write(frame)
+        if self.journal is not None:
+            self.journal.record(Direction.BtpOut, frame)
+        if self.metrics is not None:
+            self.metrics.on_write(frame)
+
+    def _write_opens(self, template: OpenTemplate, bodies: List[Open]):
+        seq_id = self.sequence_id
+        self.sequence_id += len(bodies)
+        if len(bodies) == 1:
+            body = bodies[0]
+            # The transport may hold on to what it is given, so hand it a copy
+            # of the reused buffer
+            self.write_frame(
+                bytes(template.encode(seq_id, body.order_id, body.price, body.quantity))
+            )
+            return
+        frame_len = len(template)
+        frames = bytearray(frame_len * len(bodies))
+        for i, body in enumerate(bodies):
+            template.encode_into(
+                frames,
+                i * frame_len,
+                seq_id + i,
+                body.order_id,
+                body.price,
+                body.quantity,
+            )
+        self.write_frame(frames)
+
+    def _write_modifies(self, bodies: List[Modify]):
+        template = self.modify_template
+        seq_id = self.sequence_id
+        self.sequence_id += len(bodies)
+        frame_len = len(template)
+        frames = bytearray(frame_len * len(bodies))
+        for i, body in enumerate(bodies):
+            template.encode_into(
+                frames,
+                i * frame_len,
+                seq_id + i,
+                body.order_id,
+                body.modify_id,
+                body.price,
+                body.quantity,
+            )
+        self.write_frame(frames)
+
+    async def send_open(
+        self,
+        template: OpenTemplate,
+        order_id: int,
+        price: int,
+        quantity: int,
+        priority: Optional[Priority] = None,
+    ):
+        """
+        Send an `Open` encoded by patching a pre-serialized template instead
+        of packing a message
+        """
+        outcome = (
+            await self.send_gated(
+                [template.body(order_id, price, quantity)],
+                lambda bodies: self._write_opens(template, bodies),
+                priority,
+            )
+        )[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+
+    async def send_modify(
+        self,
+        order_id: int,
+        modify_id: int,
+        price: int,
+        quantity: int,
+        priority: Optional[Priority] = None,
+    ):
+        """
+        Send a `Modify` through the client's pre-serialized modify template
+        """
+        outcome = (
+            await self.send_gated(
+                [ModifyTemplate.body(order_id, modify_id, price, quantity)],
+                self._write_modifies,
+                priority,
+            )
+        )[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+
+    def allocate_order_ids(self, count: int) -> range:
+        first = self.next_order_id
+        self.next_order_id += count
+        return range(first, first + count)
+
+    def allocate_modify_ids(self, count: int) -> range:
+        first = self.next_modify_id
+        self.next_modify_id += count
+        return range(first, first + count)
+
+    async def place_ladder(
+        self,
+        template: OpenTemplate,
+        prices: Sequence[int],
+        quantities: Sequence[int],
+    ) -> List[asyncio.Future]:
+        """
+        Open one order per price with consecutive order and sequence ids, all
+        written to the socket at once. Each returned future resolves to the
+        order's `Ack` or fails with `OrderRejected` or `PreTradeReject`.
+        """
+        assert len(prices) == len(quantities)
+        order_ids = self.allocate_order_ids(len(prices))
+        bodies = [
+            template.body(order_id, price, quantity)
+            for order_id, price, quantity in zip(order_ids, prices, quantities)
+        ]
+        outcomes = await self.send_gated(
+            bodies, lambda passed: self._write_opens(template, passed)
+        )
+        return self._track_outcomes(bodies, outcomes)
+
+    async def modify_many(
+        self, modifies: Sequence[Tuple[int, int, int]]
+    ) -> List[asyncio.Future]:
+        """
+        Modify many orders, given as `(order_id, price, quantity)`, in a single
+        write. Futures resolve as in `place_ladder`.
+        """
+        modify_ids = self.allocate_modify_ids(len(modifies))
+        bodies = [
+            ModifyTemplate.body(order_id, modify_id, price, quantity)
+            for modify_id, (order_id, price, quantity) in zip(modify_ids, modifies)
+        ]
+        outcomes = await self.send_gated(bodies, self._write_modifies)
+        return self._track_outcomes(bodies, outcomes)
+
+    def _track_outcomes(self, bodies, outcomes) -> List[asyncio.Future]:
+        """
+        A future per body for its Ack or Reject, or failed with its local
+        reject. Held bodies resolve once they are released and answered.
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for body, outcome in zip(bodies, outcomes):
+            future = loop.create_future()
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                self.pending_acks[ack_key(body)] = future
+            futures.append(future)
+        return futures
+
+    async def send_tracked(self, body, key) -> asyncio.Future:
+        """
+        Send `body` and return a future for the Ack or Reject matching `key`,
+        an `(order_id, modify_id)` pair
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.pending_acks[key] = future
+            await self.send_message(body)
+        except PreTradeReject as e:
+            del self.pending_acks[key]
+            future.set_exception(e)
+        return future
+
+    def resolve_pending(self, body):
+        if isinstance(body, Ack):
+            future = self.pending_acks.pop((body.order_id, body.modify_id), None)
+            if future is not None and not future.done():
+                future.set_result(body)
+        elif isinstance(body, Reject):
+            future = self.pending_acks.pop((body.order_id, body.modify_id), None)
+            if future is not None and not future.done():
+                future.set_exception(OrderRejected(body))
+
+    def fail_pending(self, exc: BaseException):
+        """
+        Fail every future still waiting on an Ack, e.g. with the error that
+        ended the session. Whether the orders made it is for reconciliation
+        to find out.
+        """
+        # Emptied in place, metrics and others hold on to the dict
+        pending = list(self.pending_acks.values())
+        self.pending_acks.clear()
+        for future in pending:
+            if not future.done():
+                future.set_exception(exc)
 
     async def handle_btp_message(self, message):
-        # TODO make a heartbeat receive timer
         if isinstance(message.body, Heartbeat):
             return
-        await self.app_message(message)
+        if isinstance(message.body, Disconnect):
+            raise SessionDisconnected(message.body)
+        latency = self.latency
+        if latency is not None:
+            latency.on_dispatch(message.body)
+        traced = bool(tracing.TRACERS)
+        if traced:
+            start = time.perf_counter_ns()
+        if self.market_states is not None:
+            self.market_states.on_message(message.body)
+        if self.risk_gate is not None:
+            self.risk_gate.on_message(message.body)
+        if self.pending_acks:
+            self.resolve_pending(message.body)
+        if traced:
+            tracked = time.perf_counter_ns()
+        if self.strategy_handlers is not None:
+            handler = self.strategy_handlers.get(type(message.body))
+            if handler is not None:
+                await handler(message.body)
+        else:
+            await self.app_message(message)
+        if latency is not None:
+            latency.on_handled(message.body)
+        if traced:
+            tracing.emit(
+                tracing.HANDLE_BTP_MESSAGE,
+                type(message.body).__name__,
+                start,
+                (
+                    ("state", tracked - start),
+                    ("handler", time.perf_counter_ns() - tracked),
+                ),
+            )
 
-    async def run(self):
+    def send_released(self, bodies):
+        task = asyncio.get_running_loop().create_task(self._send_released(bodies))
+        self.release_tasks.add(task)
+        task.add_done_callback(self._released_done)
+
+    async def _send_released(self, bodies):
+        outcomes = await self.send_gated(bodies, self._write_bodies)
+        for body, outcome in zip(bodies, outcomes):
+            if not isinstance(outcome, Exception):
+                continue
+            # Checked again on release, e.g. against a price band that moved
+            # while the product was halted
+            future = self.pending_acks.pop(ack_key(body), None)
+            if future is not None and not future.done():
+                future.set_exception(outcome)
+            else:
+                asyncio.get_running_loop().call_exception_handler(
+                    {"message": "Released message rejected", "exception": outcome}
+                )
+
+    def _released_done(self, task: asyncio.Task):
+        self.release_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            task.get_loop().call_exception_handler(
+                {
+                    "message": "Sending released messages failed",
+                    "exception": task.exception(),
+                    "task": task,
+                }
+            )
+
+    async def connect(self):
         # Establish connection
-        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        if self.transport is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+        else:
+            self.reader, self.writer, self.transport_skipped = await open_connection(
+                self.host, self.port, self.transport
+            )
+            self._quickack = None
+            if self.transport.quickack and "quickack" not in self.transport_skipped:
+                self._quickack = quickack_rearm(self.writer)
+        # Every session starts its sequence over
+        self.sequence_id = 1
         # Login
         await self.login()
-        # Handle incoming msgs, trade, and heartbeat concurrently
-        await asyncio.gather(
-            self.receive_messages_loop(), self.trade_loop(), self.heartbeat_loop()
-        )
+
+    async def run(self):
+        await self.connect()
+        await self.run_loops()
+
+    async def run_loops(self):
+        # Handle incoming msgs, trade, and heartbeat concurrently. The loops
+        # only return by raising, so stop the others as soon as one does.
+        tasks = [
+            asyncio.ensure_future(self.receive_messages_loop()),
+            asyncio.ensure_future(self.heartbeat_loop()),
+        ]
+        if self.strategy is None:
+            tasks.append(asyncio.ensure_future(self.trade_loop()))
+        try:
+            if self.strategy is not None:
+                # Strategies are driven by incoming messages and their own timers
+                await self.strategy.on_start()
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+        for task in done:
+            task.result()
+
+    async def read_message(self) -> Message:
+        if (
+            self.journal is None
+            and self.latency is None
+            and self.metrics is None
+            and not self.receive_timestamps
+            and not tracing.TRACERS
+        ):
+            return await Message.read_message(self.reader)
+        frame = await Message.read_frame(self.reader)
+        received_ns = time.time_ns() if self.receive_timestamps else None
+        traced = bool(tracing.TRACERS)
+        if traced:
+            read = time.perf_counter_ns()
+        if self.latency is not None:
+            # Decoding is timed from here
+            self.latency.read_ns = time.perf_counter_ns()
+        if self.journal is not None:
+            self.journal.record(Direction.BtpIn, frame)
+        if self.metrics is None and not traced:
+            message = Message.from_btp(frame)
+            message.received_ns = received_ns
+            return message
+        start = time.perf_counter_ns()
+        message = Message.from_btp(frame)
+        message.received_ns = received_ns
+        decoded = time.perf_counter_ns()
+        if self.metrics is not None:
+            self.metrics.on_read(frame, message.body, decoded - start)
+        if traced:
+            tracing.emit(
+                tracing.READ_MESSAGE,
+                type(message.body).__name__,
+                read,
+                (("record", start - read), ("decode", decoded - start)),
+            )
+        return message
 
     async def receive_messages_loop(self):
         while True:
-            message = await Message.read_message(self.reader)
+            message = await self.read_message()
+            if self._quickack is not None:
+                self._quickack()
+            self.last_received_msg_time = self.clock.time()
             await self.handle_btp_message(message)
 
     async def heartbeat_loop(self):
-        while True:
-            # Check if it's time to send a heartbeat
-            if time.time() - self.last_sent_msg_time > self.HEARTBEAT_INTERVAL:
-                # It's been more than 30s since the last heartbeat
-                self.reset_heartbeat_timer()
-                await self.send_message(Heartbeat())
+        # Both timers are lazy: messages only record their time, and a timer
+        # that fires early re-arms itself at the deadline implied by the
+        # latest message instead of being rescheduled on every message.
+        self.heartbeat_fault = asyncio.get_running_loop().create_future()
+        self.last_received_msg_time = self.clock.time()
+        send_timer = DeadlineTimer(self.clock, lambda: self.heartbeat_due(send_timer))
+        receive_timer = DeadlineTimer(
+            self.clock, lambda: self.receive_due(receive_timer)
+        )
+        send_timer.arm(self.last_sent_msg_time + self.HEARTBEAT_INTERVAL)
+        receive_timer.arm(self.last_received_msg_time + self.receive_timeout)
+        try:
+            await self.heartbeat_fault
+        finally:
+            send_timer.cancel()
+            receive_timer.cancel()
 
-            # Sleep for a bit to prevent this loop from running too fast
-            await asyncio.sleep(self.HEARTBEAT_INTERVAL)
+    @property
+    def receive_timeout(self) -> float:
+        return self.HEARTBEAT_INTERVAL * self.RECEIVE_TIMEOUT_FACTOR
+
+    def heartbeat_due(self, timer: DeadlineTimer):
+        deadline = self.last_sent_msg_time + self.HEARTBEAT_INTERVAL
+        now = self.clock.time()
+        if now >= deadline:
+            if self.metrics is not None:
+                self.metrics.on_heartbeat(now - deadline)
+            self.write_message(Heartbeat())
+            deadline = self.last_sent_msg_time + self.HEARTBEAT_INTERVAL
+        timer.arm(deadline)
+
+    def receive_due(self, timer: DeadlineTimer):
+        deadline = self.last_received_msg_time + self.receive_timeout
+        if self.clock.time() < deadline:
+            timer.arm(deadline)
+            return
+        if self.on_receive_timeout is not None:
+            self.on_receive_timeout()
+            timer.arm(self.clock.time() + self.receive_timeout)
+            return
+        # Fail heartbeat_loop, which brings down the session
+        if self.heartbeat_fault is not None and not self.heartbeat_fault.done():
+            self.heartbeat_fault.set_exception(
+                HeartbeatTimeout(f"Nothing received for {self.receive_timeout}s")
+            )
 
     async def trade_loop(self):
         """
@@ -126,7 +705,7 @@ class OrderEntryClient:
 # print(parsed_msg)
 
 
-# Usage:
+# Usage, against a local exchange started with `python -m btnl_client.simulator`:
 # client = SimpleTrader(
 #     "localhost",
 #     11000,
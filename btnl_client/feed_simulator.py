@@ -0,0 +1,490 @@
+import asyncio
+import bisect
+import functools
+import itertools
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import websockets
+
+import btnl_client.websocket as ws
+from btnl_client.protocol import MarketState, MarketStateUpdate, Side, new_message
+from btnl_client.protocol.pricefeed import Block, Book, BookLevel, Level, Trade
+
+# Websocket channel each message type is published on
+CHANNELS = {
+    ws.MessageType.Trade: ws.ChannelName.Trade,
+    ws.MessageType.Level: ws.ChannelName.Book,
+    ws.MessageType.Book: ws.ChannelName.Book,
+    ws.MessageType.Block: ws.ChannelName.Block,
+    ws.MessageType.Status: ws.ChannelName.Status,
+}
+
+WS_SIDES = {Side.Bid: ws.Side.Bid.value, Side.Ask: ws.Side.Ask.value}
+WS_STATES = {
+    MarketState.Open: ws.MarketStatus.Open.value,
+    MarketState.Halt: ws.MarketStatus.Halt.value,
+    MarketState.Closed: ws.MarketStatus.Closed.value,
+}
+
+
+@functools.lru_cache(maxsize=4)
+def _timestamp_prefix(seconds: int) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+
+
+def format_timestamp(timestamp_ns: int) -> str:
+    """
+    RFC 3339 UTC timestamp with nanoseconds, formatting the date and time
+    only once per second
+    """
+    seconds, nanos = divmod(timestamp_ns, 1_000_000_000)
+    return f"{_timestamp_prefix(seconds)}.{nanos:09d}Z"
+
+
+@dataclass
+class MarketEvent:
+    """
+    One market data update, rendered either as websocket JSON or as a BTP
+    frame so both feeds can carry the same market
+    """
+
+    type: ws.MessageType
+    ack_id: int
+    symbol: str
+    product_id: int
+    timestamp_ns: int
+    side: Side = Side.Bid
+    price: int = 0
+    quantity: int = 0
+    bids: List[Tuple[int, int]] = field(default_factory=list)
+    asks: List[Tuple[int, int]] = field(default_factory=list)
+    state: MarketState = MarketState.Open
+
+    def to_json(self) -> str:
+        # Formatted directly, json.dumps dominates the cost at high rates
+        common = (
+            f'"ack_id":"{self.ack_id}","symbol":"{self.symbol}",'
+            f'"timestamp":"{format_timestamp(self.timestamp_ns)}"'
+        )
+        kind = self.type
+        if kind == ws.MessageType.Trade:
+            return (
+                f'{{"type":"trade",{common},"price":{self.price},'
+                f'"quantity":{self.quantity},"taker_side":"{WS_SIDES[self.side]}"}}'
+            )
+        if kind == ws.MessageType.Level:
+            return (
+                f'{{"type":"level",{common},"price":{self.price},'
+                f'"quantity":{self.quantity},"side":"{WS_SIDES[self.side]}"}}'
+            )
+        if kind == ws.MessageType.Book:
+            return (
+                f'{{"type":"book",{common},"bids":{json.dumps(self.bids)},'
+                f'"asks":{json.dumps(self.asks)}}}'
+            )
+        if kind == ws.MessageType.Block:
+            return (
+                f'{{"type":"block",{common},"price":{self.price},'
+                f'"quantity":{self.quantity},"leader_side":"{WS_SIDES[self.side]}"}}'
+            )
+        return f'{{"type":"status",{common},"state":"{WS_STATES[self.state]}"}}'
+
+    def to_btp_body(self):
+        kind = self.type
+        if kind == ws.MessageType.Trade:
+            return Trade(
+                self.ack_id, self.product_id, self.side, self.price, self.quantity
+            )
+        if kind == ws.MessageType.Level:
+            return Level(
+                self.ack_id, self.product_id, self.side, self.price, self.quantity
+            )
+        if kind == ws.MessageType.Book:
+            return Book(
+                self.ack_id,
+                self.product_id,
+                [BookLevel(price, quantity) for price, quantity in self.bids],
+                [BookLevel(price, quantity) for price, quantity in self.asks],
+            )
+        if kind == ws.MessageType.Block:
+            return Block(self.ack_id, self.product_id, self.price, self.quantity)
+        return MarketStateUpdate(self.state, self.ack_id, self.product_id)
+
+    def to_btp(self, sequence_id: int) -> bytes:
+        return new_message(sequence_id, self.to_btp_body()).to_btp()
+
+
+class _SyntheticBook:
+    def __init__(self, best_bid: int, depth: int, rng: random.Random, max_quantity):
+        self.best_bid = best_bid
+        self.bids = [rng.randint(1, max_quantity) for _ in range(depth)]
+        self.asks = [rng.randint(1, max_quantity) for _ in range(depth)]
+        self.state = MarketState.Open
+
+
+class SyntheticMarket:
+    """
+    Random walk market for a set of `symbols` (symbol -> product id), each
+    with `depth` levels a side one `tick` apart.
+
+    Every event picks a symbol and a message type by the weights in `mix`:
+    level updates change a random level's quantity, trades take from the
+    best level and move the market a tick when they clear it, books are
+    full snapshots, blocks trade off book and status toggles between open
+    and halted. The same `seed` always produces the same market.
+    """
+
+    DEFAULT_MIX = {
+        ws.MessageType.Level: 0.699,
+        ws.MessageType.Trade: 0.25,
+        ws.MessageType.Book: 0.04,
+        ws.MessageType.Block: 0.01,
+        # Rare, but consumers should see halts and reopens
+        ws.MessageType.Status: 0.001,
+    }
+
+    def __init__(
+        self,
+        symbols: Dict[str, int],
+        depth: int = 10,
+        tick: int = 1,
+        start_price: int = 10000,
+        max_quantity: int = 50,
+        mix: Optional[Dict[ws.MessageType, float]] = None,
+        seed: Optional[int] = None,
+        clock: Callable[[], int] = time.time_ns,
+    ):
+        self.symbols = dict(symbols)
+        self.depth = depth
+        self.tick = tick
+        self.max_quantity = max_quantity
+        self.clock = clock
+        self.rng = random.Random(seed)
+        self.books = {
+            symbol: _SyntheticBook(start_price, depth, self.rng, max_quantity)
+            for symbol in self.symbols
+        }
+        mix = mix if mix is not None else self.DEFAULT_MIX
+        self._types = [kind for kind, weight in mix.items() if weight > 0]
+        weights = [mix[kind] for kind in self._types]
+        total = sum(weights)
+        self._cumulative = list(
+            itertools.accumulate(weight / total for weight in weights)
+        )
+        self._symbol_list = list(self.symbols)
+        self.next_ack_id = 1
+
+    def book(self, symbol: str) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+        book = self.books[symbol]
+        tick = self.tick
+        bids = [
+            (book.best_bid - i * tick, quantity)
+            for i, quantity in enumerate(book.bids)
+            if quantity
+        ]
+        best_ask = book.best_bid + tick
+        asks = [
+            (best_ask + i * tick, quantity)
+            for i, quantity in enumerate(book.asks)
+            if quantity
+        ]
+        return bids, asks
+
+    def next_event(self) -> MarketEvent:
+        rng = self.rng
+        symbol = rng.choice(self._symbol_list)
+        book = self.books[symbol]
+        kind = self._types[
+            bisect.bisect_right(self._cumulative, rng.random(), 0, len(self._types) - 1)
+        ]
+        ack_id = self.next_ack_id
+        self.next_ack_id += 1
+        event = MarketEvent(kind, ack_id, symbol, self.symbols[symbol], self.clock())
+        tick = self.tick
+        if kind == ws.MessageType.Level:
+            side = Side.Bid if rng.random() < 0.5 else Side.Ask
+            i = rng.randrange(self.depth)
+            quantity = rng.randint(0 if i else 1, self.max_quantity)
+            if side == Side.Bid:
+                book.bids[i] = quantity
+                event.price = book.best_bid - i * tick
+            else:
+                book.asks[i] = quantity
+                event.price = book.best_bid + (i + 1) * tick
+            event.side = side
+            event.quantity = quantity
+        elif kind == ws.MessageType.Trade:
+            side = Side.Bid if rng.random() < 0.5 else Side.Ask
+            levels = book.asks if side == Side.Bid else book.bids
+            quantity = rng.randint(1, levels[0])
+            event.side = side
+            event.quantity = quantity
+            if side == Side.Bid:
+                event.price = book.best_bid + tick
+            else:
+                event.price = book.best_bid
+            levels[0] -= quantity
+            if levels[0] == 0:
+                self._shift(book, up=side == Side.Bid)
+        elif kind == ws.MessageType.Book:
+            event.bids, event.asks = self.book(symbol)
+        elif kind == ws.MessageType.Block:
+            event.side = Side.Bid if rng.random() < 0.5 else Side.Ask
+            event.price = book.best_bid
+            event.quantity = rng.randint(self.max_quantity, 10 * self.max_quantity)
+        else:
+            book.state = (
+                MarketState.Halt if book.state == MarketState.Open else MarketState.Open
+            )
+            event.state = book.state
+        return event
+
+    def _shift(self, book: _SyntheticBook, up: bool):
+        # Clearing the best level moves the whole book a tick that way
+        rng = self.rng
+        if up:
+            book.asks.pop(0)
+            book.asks.append(rng.randint(1, self.max_quantity))
+            book.bids.insert(0, rng.randint(1, self.max_quantity))
+            book.bids.pop()
+            book.best_bid += self.tick
+        else:
+            book.bids.pop(0)
+            book.bids.append(rng.randint(1, self.max_quantity))
+            book.asks.insert(0, rng.randint(1, self.max_quantity))
+            book.asks.pop()
+            book.best_bid -= self.tick
+        # The level that became the best may have been empty
+        if not book.bids[0]:
+            book.bids[0] = rng.randint(1, self.max_quantity)
+        if not book.asks[0]:
+            book.asks[0] = rng.randint(1, self.max_quantity)
+
+    def events(self, count: int) -> List[MarketEvent]:
+        next_event = self.next_event
+        return [next_event() for _ in range(count)]
+
+
+class _Subscriber:
+    def __init__(self, connection, message: ws.SubscribeMessage):
+        self.connection = connection
+        self.channels: Dict[ws.ChannelName, List[str]] = {}
+        for channel in message.channels:
+            codes = channel.product_codes or message.product_codes
+            self.channels.setdefault(channel.name, []).extend(codes)
+        self._wanted: Dict[Tuple[ws.MessageType, str], bool] = {}
+
+    def wants(self, event: MarketEvent) -> bool:
+        key = (event.type, event.symbol)
+        wanted = self._wanted.get(key)
+        if wanted is None:
+            codes = self.channels.get(CHANNELS[event.type], ())
+            wanted = self._wanted[key] = any(
+                event.symbol.startswith(code) for code in codes
+            )
+        return wanted
+
+
+def parse_subscribe(message: str) -> ws.SubscribeMessage:
+    data = json.loads(message)
+    return ws.SubscribeMessage(
+        type=ws.SubscribeType(data["type"]),
+        product_codes=data.get("product_codes", []),
+        channels=[
+            ws.Channel(
+                ws.ChannelName(channel["name"]), channel.get("product_codes", [])
+            )
+            for channel in data.get("channels", [])
+        ],
+    )
+
+
+class FeedSimulator:
+    """
+    Publishes one `SyntheticMarket` both as a local websocket feed and as a
+    stream of BTP Pricefeed frames, so the two ingest paths can be stressed
+    with the same market and compared.
+
+    Websocket clients subscribe with a `SubscribeMessage` and get the
+    channels and product codes they asked for. BTP connections get every
+    frame without logging in. Events go out every `batch_interval` seconds
+    at `rate` a second on average, or as fast as the consumers keep up with
+    when `rate` is None, plus `burst_size` extra events every
+    `burst_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        market: SyntheticMarket,
+        rate: Optional[float] = 1000,
+        burst_size: int = 0,
+        burst_interval: float = 1.0,
+        batch_interval: float = 0.001,
+        max_batch: int = 10000,
+    ):
+        self.market = market
+        self.rate = rate
+        self.burst_size = burst_size
+        self.burst_interval = burst_interval
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+        self.subscribers: Set[_Subscriber] = set()
+        self.btp_writers: Set[asyncio.StreamWriter] = set()
+        self.sequence_id = 1
+        self.published = 0
+        self.sent_ws = 0
+        self.sent_btp = 0
+        self.ws_server = None
+        self.btp_server: Optional[asyncio.AbstractServer] = None
+        self.host = "127.0.0.1"
+
+    async def start(
+        self,
+        host: str = "127.0.0.1",
+        ws_port: Optional[int] = 0,
+        btp_port: Optional[int] = 0,
+    ):
+        """
+        Start the servers, a port of None leaves that feed out and 0 picks a
+        free port
+        """
+        self.host = host
+        if ws_port is not None:
+            self.ws_server = await websockets.serve(self.handle_ws, host, ws_port)
+        if btp_port is not None:
+            self.btp_server = await asyncio.start_server(
+                self.handle_btp, host, btp_port
+            )
+
+    @property
+    def ws_port(self) -> int:
+        assert self.ws_server is not None
+        return list(self.ws_server.sockets)[0].getsockname()[1]
+
+    @property
+    def ws_uri(self) -> str:
+        return f"ws://{self.host}:{self.ws_port}"
+
+    @property
+    def btp_port(self) -> int:
+        assert self.btp_server is not None
+        return self.btp_server.sockets[0].getsockname()[1]
+
+    async def serve_forever(
+        self, host: str = "127.0.0.1", ws_port: int = 8765, btp_port: int = 11001
+    ):
+        await self.start(host, ws_port, btp_port)
+        try:
+            await self.run()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self.ws_server is not None:
+            self.ws_server.close()
+            await self.ws_server.wait_closed()
+        if self.btp_server is not None:
+            self.btp_server.close()
+            for writer in list(self.btp_writers):
+                writer.close()
+            await self.btp_server.wait_closed()
+
+    async def handle_ws(self, connection, *_):
+        try:
+            subscribe = parse_subscribe(await connection.recv())
+        except (ValueError, KeyError):
+            await connection.close()
+            return
+        subscriber = _Subscriber(connection, subscribe)
+        self.subscribers.add(subscriber)
+        try:
+            await connection.wait_closed()
+        finally:
+            self.subscribers.discard(subscriber)
+
+    async def handle_btp(self, reader, writer):
+        self.btp_writers.add(writer)
+        try:
+            # Nothing is expected from the client, wait for it to go away
+            while await reader.read(4096):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.btp_writers.discard(writer)
+            writer.close()
+
+    async def run(self, count: Optional[int] = None):
+        """
+        Publish events until cancelled, or until `count` have gone out
+        """
+        loop = asyncio.get_running_loop()
+        last = loop.time()
+        owed = 0.0
+        next_burst = last + self.burst_interval if self.burst_size else float("inf")
+        while count is None or self.published < count:
+            now = loop.time()
+            if self.rate is None:
+                batch = self.max_batch
+            else:
+                # Cap the backlog so a stall is not followed by a flood
+                owed = min(owed + (now - last) * self.rate, self.rate)
+                batch = int(owed)
+                owed -= batch
+            last = now
+            if now >= next_burst:
+                batch += self.burst_size
+                next_burst += self.burst_interval
+            if count is not None:
+                batch = min(batch, count - self.published)
+            if batch:
+                await self.publish(self.market.events(batch))
+            await asyncio.sleep(self.batch_interval if self.rate is not None else 0)
+
+    async def publish(self, events: List[MarketEvent]):
+        self.published += len(events)
+        if self.btp_writers:
+            frames = []
+            sequence_id = self.sequence_id
+            for event in events:
+                frames.append(event.to_btp(sequence_id))
+                sequence_id += 1
+            self.sequence_id = sequence_id
+            data = b"".join(frames)
+            for writer in list(self.btp_writers):
+                writer.write(data)
+                self.sent_btp += len(events)
+            await asyncio.gather(
+                *(writer.drain() for writer in self.btp_writers),
+                return_exceptions=True,
+            )
+        if self.subscribers:
+            rendered: Dict[int, str] = {}
+            await asyncio.gather(
+                *(
+                    self._send_ws(subscriber, events, rendered)
+                    for subscriber in list(self.subscribers)
+                ),
+                return_exceptions=True,
+            )
+
+    async def _send_ws(
+        self, subscriber: _Subscriber, events: List[MarketEvent], rendered: Dict
+    ):
+        send = subscriber.connection.send
+        for event in events:
+            if not subscriber.wants(event):
+                continue
+            text = rendered.get(event.ack_id)
+            if text is None:
+                text = rendered[event.ack_id] = event.to_json()
+            await send(text)
+            self.sent_ws += 1
+
+
+if __name__ == "__main__":
+    asyncio.run(FeedSimulator(SyntheticMarket({"BUIZ6": 1})).serve_forever())
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 import hmac
 import hashlib
-from typing import Dict, Union, List, Optional
+import time
+from typing import Dict, Iterable, Union, List, Optional, Tuple
 from base64 import b64encode
 
 
@@ -9,21 +10,28 @@ CONNECTION_ID_HEADER = "BTNL-CONNECTION-ID"
 TIMESTAMP_HEADER = "BTNL-AUTH-TIMESTAMP"
 SIGNATURE_HEADER = "BTNL-SIGNATURE"
 
+Params = Dict[str, Optional[Union[List[str], str]]]
 
-def params_string(params: Dict[str, Optional[Union[List[str], str]]]) -> str:
-    def to_qstr(k, v) -> Optional[str]:
-        if v is None:
-            return None
-        elif v is list:
-            return sep.join(map(lambda x: k + "=" + str(x), filter(None, v)))
-        else:
-            return k + "=" + str(v)
 
+def params_string(params: Params) -> str:
     sep: str = "?"
-    parts = filter(None, map(lambda x: to_qstr(*x), params.items()))
+    parts = []
+    for k, v in params.items():
+        if v is None:
+            continue
+        elif isinstance(v, (list, tuple)):
+            # List params are sent as repeated keys, one per element
+            parts.extend(k + "=" + str(x) for x in v if x)
+        else:
+            parts.append(k + "=" + str(v))
     return sep + sep.join(parts)
 
 
+def timestamp_string(now: Optional[float] = None) -> str:
+    now = time.time() if now is None else now
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(now))
+
+
 def signature(
     method: str,
     path: str,
@@ -48,3 +56,68 @@ def signature(
     ).digest()
 
     return b64encode(hashed).decode()
+
+
+class RequestSigner:
+    """
+    Produces the same signatures as `signature` for one connection, but keys
+    the HMAC once and copies the keyed state for every request. Encoded
+    `method + path` prefixes and the per-second timestamp are cached.
+    """
+
+    def __init__(self, connection_id: int, auth_token: str):
+        self.connection_id = connection_id
+        self._keyed = hmac.new(bytes(auth_token, "utf-8"), digestmod=hashlib.sha256)
+        self._connection_id_str = str(connection_id)
+        self._connection_suffix = (
+            CONNECTION_ID_HEADER + self._connection_id_str
+        ).encode()
+        self._timestamp_prefix = TIMESTAMP_HEADER.encode()
+        self._prefixes: Dict[Tuple[str, str], bytes] = {}
+        self._timestamp_second = -1
+        self._timestamp = ""
+
+    def timestamp(self, now: Optional[float] = None) -> str:
+        now = time.time() if now is None else now
+        second = int(now)
+        if second != self._timestamp_second:
+            self._timestamp = timestamp_string(second)
+            self._timestamp_second = second
+        return self._timestamp
+
+    def sign(self, method: str, path: str, params: Params, timestamp: str) -> str:
+        prefix = self._prefixes.get((method, path))
+        if prefix is None:
+            prefix = (method + path).encode()
+            self._prefixes[(method, path)] = prefix
+        mac = self._keyed.copy()
+        mac.update(prefix)
+        mac.update(params_string(params).encode())
+        mac.update(self._timestamp_prefix)
+        mac.update(timestamp.encode())
+        mac.update(self._connection_suffix)
+        return b64encode(mac.digest()).decode()
+
+    def headers(
+        self, method: str, path: str, params: Params, timestamp: Optional[str] = None
+    ) -> Dict[str, str]:
+        timestamp = timestamp or self.timestamp()
+        return {
+            CONNECTION_ID_HEADER: self._connection_id_str,
+            TIMESTAMP_HEADER: timestamp,
+            SIGNATURE_HEADER: self.sign(method, path, params, timestamp),
+        }
+
+    def headers_many(
+        self,
+        requests: Iterable[Tuple[str, str, Params]],
+        timestamp: Optional[str] = None,
+    ) -> List[Dict[str, str]]:
+        """
+        Sign a batch of `(method, path, params)` requests with one timestamp
+        """
+        timestamp = timestamp or self.timestamp()
+        return [
+            self.headers(method, path, params, timestamp)
+            for method, path, params in requests
+        ]
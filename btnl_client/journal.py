@@ -0,0 +1,278 @@
+import bisect
+import collections
+import mmap
+import os
+import struct
+import threading
+import time
+from enum import IntEnum
+from typing import Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from btnl_client.protocol import BodyEncoding, Header, LoginRequest, Message
+
+MAGIC = b"BTNLJRN1"
+RECORD_HEADER = struct.Struct("<qBI")
+FRAME_HEADER = struct.Struct(Header.FORMAT_STR)
+U64 = struct.Struct("<Q")
+LOGIN = BodyEncoding.Login.value.encode()
+AUTH_TOKEN_OFFSET = Header.LEN + struct.calcsize("<cQ")
+AUTH_TOKEN_LEN = 32
+
+
+class Direction(IntEnum):
+    BtpIn = 0
+    BtpOut = 1
+    # Websocket feed messages, stored as their UTF-8 JSON text
+    WsIn = 2
+
+
+def redact(frame: bytes) -> bytes:
+    """
+    Blank out the auth token of a LoginRequest so journals hold no secrets
+    """
+    if (
+        frame[8:10] == LOGIN
+        and frame[Header.LEN : Header.LEN + 1] == LoginRequest.MSG_TYPE
+    ):
+        end = AUTH_TOKEN_OFFSET + AUTH_TOKEN_LEN
+        return frame[:AUTH_TOKEN_OFFSET] + bytes(AUTH_TOKEN_LEN) + frame[end:]
+    return frame
+
+
+class JournalWriter:
+    """
+    Append-only journal of raw frames with nanosecond wall clock timestamps.
+
+    `record` only timestamps and queues the data, a background thread splits
+    it into frames, writes them through a buffered file and fsyncs every
+    `fsync_interval` seconds.
+    """
+
+    def __init__(
+        self, path: str, fsync_interval: float = 1.0, flush_interval: float = 0.01
+    ):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab", buffering=1 << 20)
+        if new:
+            self.file.write(MAGIC)
+        self.fsync_interval = fsync_interval
+        self.flush_interval = flush_interval
+        self.queue: Deque[Tuple[int, int, bytes]] = collections.deque()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record(self, direction: int, data: bytes, timestamp_ns: Optional[int] = None):
+        """
+        Queue `data`, which may hold several consecutive BTP frames
+        """
+        self.queue.append(
+            (time.time_ns() if timestamp_ns is None else timestamp_ns, direction, data)
+        )
+
+    def _run(self):
+        last_sync = time.monotonic()
+        while not self._stop.wait(self.flush_interval):
+            self._write_pending()
+            if time.monotonic() - last_sync >= self.fsync_interval:
+                self._sync()
+                last_sync = time.monotonic()
+        self._write_pending()
+        self._sync()
+
+    def _write_pending(self):
+        queue = self.queue
+        write = self.file.write
+        while queue:
+            timestamp_ns, direction, data = queue.popleft()
+            for frame in self.split(direction, data):
+                write(RECORD_HEADER.pack(timestamp_ns, direction, len(frame)))
+                write(frame)
+
+    @staticmethod
+    def split(direction: int, data: bytes) -> List[bytes]:
+        if direction not in (Direction.BtpIn, Direction.BtpOut):
+            return [data]
+        frames = []
+        offset = 0
+        while offset < len(data):
+            end = offset + Header.LEN + FRAME_HEADER.unpack_from(data, offset)[4]
+            frames.append(redact(bytes(data[offset:end])))
+            offset = end
+        return frames
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.file.close()
+
+
+class JournalRecord(NamedTuple):
+    offset: int
+    timestamp_ns: int
+    direction: int
+    data: memoryview
+
+    @property
+    def sequence_id(self) -> int:
+        return FRAME_HEADER.unpack_from(self.data)[2]
+
+    def message(self) -> Message:
+        return Message.from_btp(bytes(self.data))
+
+
+# Position of order_id and ack_id in order entry bodies, by message type
+ORDER_ID_OFFSETS = {b"O": 1, b"M": 1, b"R": 1, b"A": 9, b"C": 9, b"F": 9}
+ACK_ID_OFFSETS = {b"A": 1, b"C": 1, b"F": 1}
+ORDER_ENTRY = BodyEncoding.OrderEntry.value.encode()
+MARKET_STATE = BodyEncoding.MarketState.value.encode()
+
+
+class JournalReader:
+    """
+    Reads a journal through `mmap`, so records are only paged in when touched.
+
+    `build_index` makes one pass over the record headers and keeps every
+    `stride`th record's timestamp and sequence id, which is enough to bisect
+    to any point and scan forward. Order and ack ids are indexed in full.
+
+    Sequence ids start over with every session, so each `LoginRequest`
+    begins a new session in the index and sequence ids are looked up
+    within one session.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a BTNL journal: {path}")
+        self.view = memoryview(self.map)
+        self.time_index: List[Tuple[int, int]] = []
+        # Offset of the first record of each session
+        self.sessions: List[int] = []
+        # (session, direction) -> [(sequence id, offset)]
+        self.sequence_index: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        self.order_ids: Dict[int, List[int]] = {}
+        self.ack_ids: Dict[int, List[int]] = {}
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+    def __iter__(self) -> Iterator[JournalRecord]:
+        return self.records(len(MAGIC))
+
+    def records(self, offset: int) -> Iterator[JournalRecord]:
+        view = self.view
+        end = len(view)
+        while offset + RECORD_HEADER.size <= end:
+            timestamp_ns, direction, length = RECORD_HEADER.unpack_from(view, offset)
+            start = offset + RECORD_HEADER.size
+            if start + length > end:
+                # Partial record from an interrupted write
+                return
+            yield JournalRecord(
+                offset, timestamp_ns, direction, view[start : start + length]
+            )
+            offset = start + length
+
+    def build_index(self, stride: int = 1024):
+        self.time_index = []
+        self.sessions = [len(MAGIC)]
+        self.sequence_index = {}
+        self.order_ids = {}
+        self.ack_ids = {}
+        # Whether the current session has any BTP records yet, a journal
+        # opening with a login should not start with an empty session
+        session_used = False
+        for i, record in enumerate(self):
+            btp = record.direction in (Direction.BtpIn, Direction.BtpOut)
+            if i % stride == 0:
+                self.time_index.append((record.timestamp_ns, record.offset))
+            if not btp:
+                continue
+            data = record.data
+            if (
+                record.direction == Direction.BtpOut
+                and data[8:10] == LOGIN
+                and data[Header.LEN : Header.LEN + 1] == LoginRequest.MSG_TYPE
+            ):
+                if session_used:
+                    self.sessions.append(record.offset)
+                else:
+                    self.sessions[-1] = record.offset
+            session_used = True
+            sequence_id = record.sequence_id
+            if sequence_id:
+                positions = self.sequence_index.setdefault(
+                    (len(self.sessions) - 1, record.direction), []
+                )
+                if not positions or positions[-1][0] + stride <= sequence_id:
+                    positions.append((sequence_id, record.offset))
+            encoding = bytes(data[8:10])
+            if len(data) <= Header.LEN:
+                continue
+            message_type = bytes(data[Header.LEN : Header.LEN + 1])
+            if encoding == ORDER_ENTRY:
+                offset = ORDER_ID_OFFSETS.get(message_type)
+                if offset is not None:
+                    order_id = U64.unpack_from(data, Header.LEN + offset)[0]
+                    self.order_ids.setdefault(order_id, []).append(record.offset)
+                offset = ACK_ID_OFFSETS.get(message_type)
+            elif encoding == MARKET_STATE:
+                offset = 1
+            else:
+                offset = None
+            if offset is not None:
+                ack_id = U64.unpack_from(data, Header.LEN + offset)[0]
+                self.ack_ids.setdefault(ack_id, []).append(record.offset)
+
+    def record_at(self, offset: int) -> JournalRecord:
+        return next(self.records(offset))
+
+    def since(self, timestamp_ns: int) -> Iterator[JournalRecord]:
+        """
+        Records from the first one at or after `timestamp_ns`
+        """
+        i = bisect.bisect_right(self.time_index, (timestamp_ns, -1)) - 1
+        start = self.time_index[i][1] if i >= 0 else len(MAGIC)
+        for record in self.records(start):
+            if record.timestamp_ns >= timestamp_ns:
+                yield record
+
+    def from_sequence(
+        self, direction: int, sequence_id: int, session: int = -1
+    ) -> Iterator[JournalRecord]:
+        """
+        Records from the frame with `sequence_id` sent in `direction` during
+        `session`, by default the last one, onwards
+        """
+        session = range(len(self.sessions))[session]
+        positions = self.sequence_index.get((session, direction), [])
+        i = bisect.bisect_right(positions, (sequence_id, float("inf"))) - 1
+        start = positions[i][1] if i >= 0 else self.sessions[session]
+        end = (
+            self.sessions[session + 1]
+            if session + 1 < len(self.sessions)
+            else len(self.view)
+        )
+        found = False
+        for record in self.records(start):
+            if not found:
+                if record.offset >= end:
+                    return
+                if record.direction != direction or record.sequence_id != sequence_id:
+                    continue
+                found = True
+            yield record
+
+    def for_order(self, order_id: int) -> List[JournalRecord]:
+        return [self.record_at(offset) for offset in self.order_ids.get(order_id, [])]
+
+    def for_ack(self, ack_id: int) -> List[JournalRecord]:
+        return [self.record_at(offset) for offset in self.ack_ids.get(ack_id, [])]
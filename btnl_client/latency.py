@@ -0,0 +1,405 @@
+import asyncio
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from btnl_client.protocol import Ack, Close, Fill, MessageBody, Modify, Open, Reject
+from btnl_client.websocket import parse_timestamp
+
+DEFAULT_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class Histogram:
+    """
+    HDR-style histogram of non-negative integers, nanoseconds here.
+
+    Values below `2 ** significant_bits` are counted exactly, larger ones in
+    log-linear buckets that keep `significant_bits` bits of precision, so
+    the relative error stays under `2 ** -(significant_bits - 1)`. Recording
+    is an index calculation and one list increment.
+    """
+
+    def __init__(self, significant_bits: int = 8, highest: int = 1 << 40):
+        self.significant_bits = significant_bits
+        self.linear = 1 << significant_bits
+        self.half = self.linear >> 1
+        self.highest = highest
+        self.counts = [0] * (self.index(highest) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def index(self, value: int) -> int:
+        if value < self.linear:
+            return value
+        shift = value.bit_length() - self.significant_bits
+        return self.linear + (shift - 1) * self.half + (value >> shift) - self.half
+
+    def value_at(self, index: int) -> int:
+        """
+        Midpoint of the values counted at `index`
+        """
+        if index < self.linear:
+            return index
+        shift, mantissa = divmod(index - self.linear, self.half)
+        shift += 1
+        return ((mantissa + self.half) << shift) + (1 << (shift - 1))
+
+    def record(self, value: int):
+        if value < 0:
+            value = 0
+        elif value > self.highest:
+            value = self.highest
+        self.counts[self.index(value)] += 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    def percentile(self, percentile: float) -> int:
+        if not self.count:
+            return 0
+        target = max(1, math.ceil(percentile / 100 * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(max(self.value_at(index), self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def merge(self, other: "Histogram"):
+        assert other.significant_bits == self.significant_bits
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        if other.count:
+            self.min = other.min if not self.count else min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def summary(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> dict:
+        summary = {
+            "count": self.count,
+            "min": self.min,
+            "mean": self.mean,
+            "max": self.max,
+        }
+        for percentile in percentiles:
+            summary[f"p{percentile:g}"] = self.percentile(percentile)
+        return summary
+
+
+# Key of a histogram: (stage, message type, product id or None)
+HistogramKey = Tuple[str, str, Optional[int]]
+
+
+class LatencyTracker:
+    """
+    Order round trip latency, split into the time spent in this process and
+    the time on the wire.
+
+    The client stamps `perf_counter_ns` when `send_message` is entered
+    (`start`), when the frame was handed to the transport (`written`), when
+    a frame was read off the socket (`read_ns`) and when its handler is
+    dispatched and has returned. Stamps are correlated by `order_id` and
+    `modify_id` and recorded by stage:
+
+    - `send`: start to written, risk checks, rate limiting and encoding
+    - `wire`: written to read of the Ack, Reject or first Fill
+    - `round_trip`: start to dispatch of the Ack, Reject or first Fill
+    - `decode`: read to dispatch, for every received message
+    - `handler`: dispatch to handler return, for every received message
+
+    Correlated stages are kept per `Open`, `Modify` and `FirstFill` and per
+    product. Orders still waiting for a response are capped at
+    `max_pending`, the oldest being forgotten first.
+    """
+
+    def __init__(self, significant_bits: int = 8, max_pending: int = 100_000):
+        self.significant_bits = significant_bits
+        self.max_pending = max_pending
+        self.histograms: Dict[HistogramKey, Histogram] = {}
+        # (order_id, modify_id) -> (kind, product_id, start, written)
+        self.pending: Dict[Tuple[int, Optional[int]], tuple] = {}
+        # order_id -> [product_id, start and written of the open until its
+        # first fill]
+        self.orders: Dict[int, list] = {}
+        self.read_ns = 0
+        self.dispatch_ns = 0
+        self._dumping: Optional[asyncio.TimerHandle] = None
+
+    def histogram(self, stage: str, kind: str, product_id: Optional[int]) -> Histogram:
+        key = (stage, kind, product_id)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.significant_bits)
+        return histogram
+
+    # Sending
+
+    def on_sent(self, body: MessageBody, start: int, written: int):
+        if isinstance(body, Open):
+            self.on_open(body.order_id, body.product_id, start, written)
+        elif isinstance(body, Modify):
+            self.on_modify(body.order_id, body.modify_id, start, written)
+
+    def on_open(self, order_id: int, product_id: int, start: int, written: int):
+        self.histogram("send", "Open", product_id).record(written - start)
+        self._add_pending((order_id, None), ("Open", product_id, start, written))
+        orders = self.orders
+        orders[order_id] = [product_id, start, written]
+        if len(orders) > self.max_pending:
+            del orders[next(iter(orders))]
+
+    def on_modify(self, order_id: int, modify_id: int, start: int, written: int):
+        order = self.orders.get(order_id)
+        product_id = order[0] if order is not None else None
+        self.histogram("send", "Modify", product_id).record(written - start)
+        self._add_pending((order_id, modify_id), ("Modify", product_id, start, written))
+
+    def _add_pending(self, key, value):
+        pending = self.pending
+        pending[key] = value
+        if len(pending) > self.max_pending:
+            del pending[next(iter(pending))]
+
+    # Receiving
+
+    def on_dispatch(self, body: MessageBody):
+        self.dispatch_ns = now = time.perf_counter_ns()
+        kind = type(body).__name__
+        read_ns = self.read_ns
+        if read_ns:
+            self.histogram("decode", kind, None).record(now - read_ns)
+        if isinstance(body, (Ack, Reject)):
+            sent = self.pending.pop((body.order_id, body.modify_id), None)
+            if sent is not None:
+                self._record_response(sent[0], sent[1], sent[2], sent[3], now)
+            if isinstance(body, Reject) and body.modify_id is None:
+                self.orders.pop(body.order_id, None)
+        elif isinstance(body, Fill):
+            order = self.orders.get(body.order_id)
+            if order is not None and order[1] is not None:
+                self._record_response("FirstFill", order[0], order[1], order[2], now)
+                order[1] = order[2] = None
+        elif isinstance(body, Close):
+            self.orders.pop(body.order_id, None)
+
+    def _record_response(
+        self, kind: str, product_id: Optional[int], start: int, written: int, now: int
+    ):
+        self.histogram("round_trip", kind, product_id).record(now - start)
+        if self.read_ns:
+            self.histogram("wire", kind, product_id).record(self.read_ns - written)
+
+    def on_handled(self, body: MessageBody):
+        self.histogram("handler", type(body).__name__, None).record(
+            time.perf_counter_ns() - self.dispatch_ns
+        )
+        self.read_ns = 0
+
+    # Queries
+
+    def merged(
+        self, stage: str, kind: str, product_id: Optional[int] = None
+    ) -> Histogram:
+        """
+        Histogram of one stage and message type, for one product or merged
+        across all of them when `product_id` is None
+        """
+        if product_id is not None:
+            return self.histograms.get((stage, kind, product_id)) or Histogram(
+                self.significant_bits
+            )
+        merged = Histogram(self.significant_bits)
+        for (s, k, _), histogram in self.histograms.items():
+            if s == stage and k == kind:
+                merged.merge(histogram)
+        return merged
+
+    def percentile(
+        self,
+        stage: str,
+        kind: str,
+        percentile: float,
+        product_id: Optional[int] = None,
+    ) -> int:
+        return self.merged(stage, kind, product_id).percentile(percentile)
+
+    def snapshot(
+        self, percentiles: Iterable[float] = DEFAULT_PERCENTILES
+    ) -> Dict[str, dict]:
+        percentiles = tuple(percentiles)
+        return {
+            ".".join(str(part) for part in key if part is not None): histogram.summary(
+                percentiles
+            )
+            for key, histogram in sorted(
+                self.histograms.items(), key=lambda item: str(item[0])
+            )
+        }
+
+    def format(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> List[str]:
+        lines = []
+        for name, summary in self.snapshot(percentiles).items():
+            values = " ".join(
+                f"{key}={value / 1000:.1f}us"
+                for key, value in summary.items()
+                if key != "count"
+            )
+            lines.append(f"{name:<32} n={summary['count']} {values}")
+        return lines
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+
+    def dump_every(
+        self,
+        interval: float,
+        out: Optional[Callable[[str], None]] = None,
+        reset: bool = False,
+    ):
+        """
+        Write `format()` to `out` every `interval` seconds on the running
+        loop, optionally starting every interval from empty histograms
+        """
+        out = out or print
+        loop = asyncio.get_running_loop()
+
+        def dump():
+            for line in self.format():
+                out(line)
+            if reset:
+                self.reset()
+            self._dumping = loop.call_later(interval, dump)
+
+        self.stop_dumping()
+        self._dumping = loop.call_later(interval, dump)
+
+    def stop_dumping(self):
+        if self._dumping is not None:
+            self._dumping.cancel()
+            self._dumping = None
+
+
+class _SymbolLag:
+    __slots__ = ("last", "average", "current", "previous", "window_start", "lagging")
+
+    def __init__(self, significant_bits: int, now: int):
+        self.last = 0
+        self.average = 0.0
+        self.current = Histogram(significant_bits)
+        self.previous = Histogram(significant_bits)
+        self.window_start = now
+        self.lagging = False
+
+
+class FeedLag:
+    """
+    Exchange to client latency of market data per symbol, the receive
+    timestamp minus the exchange timestamp of every message.
+
+    Each symbol keeps its latest lag, an exponential moving average
+    weighted by `alpha` and histograms of the current and previous
+    `window` seconds, so percentiles cover the last one to two windows.
+    When the average crosses `threshold` seconds `on_lag(symbol, lag_ns)`
+    is called once, and again only after the average has recovered.
+
+    Lag includes any clock offset between the exchange and this host.
+    Negative lags, from a clock running behind, are recorded as zero.
+    """
+
+    def __init__(
+        self,
+        window: float = 60.0,
+        alpha: float = 0.05,
+        threshold: Optional[float] = None,
+        on_lag: Optional[Callable[[str, int], None]] = None,
+        significant_bits: int = 8,
+    ):
+        self.window_ns = int(window * 1e9)
+        self.alpha = alpha
+        self.threshold_ns = int(threshold * 1e9) if threshold is not None else None
+        self.on_lag = on_lag
+        self.significant_bits = significant_bits
+        self.symbols: Dict[str, _SymbolLag] = {}
+
+    def on_ws_message(self, message):
+        """
+        Record a websocket message parsed with a receive timestamp
+        """
+        self.record(
+            message.symbol, parse_timestamp(message.timestamp), message.received_ns
+        )
+
+    def record(self, symbol: str, exchange_ns: int, received_ns: int):
+        lag = received_ns - exchange_ns
+        if lag < 0:
+            lag = 0
+        state = self.symbols.get(symbol)
+        if state is None:
+            state = self.symbols[symbol] = _SymbolLag(
+                self.significant_bits, received_ns
+            )
+            state.average = lag
+        elif received_ns - state.window_start >= self.window_ns:
+            state.previous, state.current = state.current, state.previous
+            state.current.reset()
+            if received_ns - state.window_start >= 2 * self.window_ns:
+                # Nothing arrived in the last window either
+                state.previous.reset()
+            state.window_start = received_ns
+        state.last = lag
+        state.average += self.alpha * (lag - state.average)
+        state.current.record(lag)
+        threshold = self.threshold_ns
+        if threshold is not None:
+            if not state.lagging and state.average > threshold:
+                state.lagging = True
+                if self.on_lag is not None:
+                    self.on_lag(symbol, lag)
+            elif state.lagging and state.average <= threshold:
+                state.lagging = False
+
+    def histogram(self, symbol: str) -> Histogram:
+        """
+        Lags of `symbol` over the last one to two windows
+        """
+        merged = Histogram(self.significant_bits)
+        state = self.symbols.get(symbol)
+        if state is not None:
+            merged.merge(state.previous)
+            merged.merge(state.current)
+        return merged
+
+    def percentile(self, symbol: str, percentile: float) -> int:
+        return self.histogram(symbol).percentile(percentile)
+
+    def snapshot(
+        self, percentiles: Iterable[float] = DEFAULT_PERCENTILES
+    ) -> Dict[str, dict]:
+        percentiles = tuple(percentiles)
+        snapshot = {}
+        for symbol, state in sorted(self.symbols.items()):
+            summary = self.histogram(symbol).summary(percentiles)
+            summary["last"] = state.last
+            summary["average"] = state.average
+            summary["lagging"] = state.lagging
+            snapshot[symbol] = summary
+        return snapshot
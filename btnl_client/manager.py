@@ -0,0 +1,392 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import queue
+import threading
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Dict, List, Optional, Sequence
+
+from btnl_client.bridge import OrderBridge
+from btnl_client.protocol import (
+    Ack,
+    Close,
+    Fill,
+    MarketStateUpdate,
+    MessageBody,
+    Modify,
+    Open,
+    Reject,
+)
+from btnl_client.session import SupervisedOrderEntryClient
+from btnl_client.strategy import Strategy
+from btnl_client.transport import use_uvloop
+
+
+@dataclass
+class SessionConfig:
+    host: str
+    port: int
+    connection_id: int
+    hex_auth_token: str
+    # Core to pin a worker process to, ignored in thread mode
+    cpu: Optional[int] = None
+    # Run a worker process's loop on uvloop when installed, ignored in
+    # thread mode, where the caller's event loop policy applies
+    uvloop: bool = False
+
+
+@dataclass
+class SessionStats:
+    submitted: int = 0
+    acks: int = 0
+    fills: int = 0
+    rejects: int = 0
+    closes: int = 0
+    # Submissions that failed before reaching the exchange
+    failures: int = 0
+
+
+@dataclass
+class SubmitFailed:
+    """
+    A submission from a worker process that failed locally, e.g. a
+    pre-trade reject. Carries the error as text, as exceptions do not all
+    survive pickling.
+    """
+
+    body: MessageBody
+    error: str
+
+
+class ForwardingStrategy(Strategy):
+    """
+    Forwards every order entry event as `(session index, body)` to `emit`.
+    `on_first_start` is called once, when the first session is logged in.
+    """
+
+    def __init__(
+        self,
+        index: int,
+        emit: Callable[[object], None],
+        on_first_start: Optional[Callable[[], None]] = None,
+    ):
+        super().__init__()
+        self.index = index
+        self.emit = emit
+        self.on_first_start = on_first_start
+
+    async def on_start(self):
+        on_first_start, self.on_first_start = self.on_first_start, None
+        if on_first_start is not None:
+            on_first_start()
+
+    async def on_ack(self, ack: Ack):
+        self.emit((self.index, ack))
+
+    async def on_fill(self, fill: Fill):
+        self.emit((self.index, fill))
+
+    async def on_reject(self, reject: Reject):
+        self.emit((self.index, reject))
+
+    async def on_close(self, close: Close):
+        self.emit((self.index, close))
+
+    async def on_market_state(self, update: MarketStateUpdate):
+        self.emit((self.index, update))
+
+
+async def _run_session(config: SessionConfig, index: int, emit, on_ready):
+    strategy = ForwardingStrategy(index, emit)
+    client = SupervisedOrderEntryClient(
+        config.host,
+        config.port,
+        config.connection_id,
+        config.hex_auth_token,
+        strategy=strategy,
+    )
+    bridge = OrderBridge(client, asyncio.get_running_loop())
+    # Orders can only be written once logged in
+    strategy.on_first_start = partial(on_ready, client, bridge)
+    await client.run()
+
+
+def _process_main(config: SessionConfig, index: int, orders, events):
+    if config.cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {config.cpu})
+    if config.uvloop:
+        use_uvloop()
+
+    # Events come from the loop thread, failures possibly from the order
+    # reader, and a pipe is not safe to write from both at once
+    send_lock = threading.Lock()
+
+    def emit(event):
+        with send_lock:
+            events.send(event)
+
+    def report(body, future):
+        if not future.cancelled() and future.exception() is not None:
+            emit((index, SubmitFailed(body, repr(future.exception()))))
+
+    def on_ready(client, bridge):
+        def read_orders():
+            while True:
+                bodies = orders.recv()
+                if bodies is None:
+                    bridge.loop.call_soon_threadsafe(client.stop)
+                    return
+                for body, future in zip(bodies, bridge.submit_many(bodies)):
+                    future.add_done_callback(partial(report, body))
+
+        threading.Thread(target=read_orders, daemon=True).start()
+
+    asyncio.run(_run_session(config, index, emit, on_ready))
+
+
+class SessionManager:
+    """
+    Runs several order entry sessions, each on its own event loop thread or in
+    its own worker process, and routes orders between them.
+
+    Opens are routed by `router`, by default `product_id` modulo the number of
+    sessions, or through `routes` when the product is pinned there. Modifies
+    follow the session their order was opened on. Acks, fills, rejects,
+    closes and market state updates from every session arrive on `events` as
+    `(session index, body)`.
+
+    Orders carry no account on the wire, an order's account is the one its
+    connection trades for. Orders for several accounts must therefore be
+    routed to their accounts' sessions by the caller, through `routes` or
+    `router`.
+    """
+
+    def __init__(
+        self,
+        configs: Sequence[SessionConfig],
+        use_processes: bool = False,
+        routes: Optional[Dict[int, int]] = None,
+        router: Optional[Callable[[Open], int]] = None,
+    ):
+        self.configs = list(configs)
+        self.use_processes = use_processes
+        self.routes = routes or {}
+        self.router = router
+        self.events: queue.SimpleQueue = queue.SimpleQueue()
+        self.stats = [SessionStats() for _ in self.configs]
+        # order_id -> [session index, remaining quantity]
+        self.orders: Dict[int, list] = {}
+        self._orders_lock = threading.Lock()
+        self._bridges: List[Optional[OrderBridge]] = [None] * len(self.configs)
+        self._clients: List[Optional[SupervisedOrderEntryClient]] = [None] * len(
+            self.configs
+        )
+        # Resolved when a thread mode session is logged in, or failed with
+        # the error that ended it first
+        self._ready: List[concurrent.futures.Future] = [
+            concurrent.futures.Future() for _ in self.configs
+        ]
+        self._order_pipes: list = []
+        self._workers: list = []
+
+    def start(self, timeout: Optional[float] = 30.0):
+        """
+        Start every session. In thread mode wait up to `timeout` seconds for
+        all of them to log in, raising the error a session failed with, e.g.
+        `LoginRejected`, or `TimeoutError` while the exchange is unreachable.
+        Sessions already logged in are then stopped.
+        """
+        if self.use_processes:
+            self._start_processes()
+        else:
+            self._start_threads(timeout)
+
+    def _start_threads(self, timeout: Optional[float]):
+        for index, config in enumerate(self.configs):
+
+            def on_ready(client, bridge, index=index):
+                self._clients[index] = client
+                self._bridges[index] = bridge
+                self._ready[index].set_result(None)
+
+            def emit(event):
+                self._track(event)
+                self.events.put(event)
+
+            thread = threading.Thread(
+                target=self._run_thread,
+                args=(index, _run_session(config, index, emit, on_ready)),
+                daemon=True,
+            )
+            thread.start()
+            self._workers.append(thread)
+        done, pending = concurrent.futures.wait(
+            self._ready,
+            timeout,
+            return_when=concurrent.futures.FIRST_EXCEPTION,
+        )
+        failed = [ready for ready in done if ready.exception() is not None]
+        if failed or pending:
+            self._stop_clients()
+            if failed:
+                raise failed[0].exception()
+            raise TimeoutError(
+                f"{len(pending)} of {len(self._ready)} sessions not logged in "
+                f"after {timeout}s"
+            )
+
+    def _run_thread(self, index: int, session):
+        try:
+            asyncio.run(session)
+        except BaseException as e:
+            ready = self._ready[index]
+            if ready.done():
+                raise
+            # Raised to the caller of start instead
+            ready.set_exception(e)
+
+    def _start_processes(self):
+        for index, config in enumerate(self.configs):
+            orders_receiver, orders_sender = multiprocessing.Pipe(duplex=False)
+            events_receiver, events_sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=_process_main,
+                args=(config, index, orders_receiver, events_sender),
+                daemon=True,
+            )
+            process.start()
+            self._workers.append(process)
+            self._order_pipes.append(orders_sender)
+            threading.Thread(
+                target=self._read_events, args=(events_receiver,), daemon=True
+            ).start()
+
+    def _read_events(self, events):
+        try:
+            while True:
+                event = events.recv()
+                self._track(event)
+                self.events.put(event)
+        except EOFError:
+            pass
+
+    def _track(self, event):
+        index, body = event
+        stats = self.stats[index]
+        if isinstance(body, Ack):
+            stats.acks += 1
+        elif isinstance(body, Fill):
+            stats.fills += 1
+            with self._orders_lock:
+                order = self.orders.get(body.order_id)
+                if order is not None:
+                    order[1] -= body.quantity
+                    if order[1] <= 0:
+                        del self.orders[body.order_id]
+        elif isinstance(body, Reject):
+            stats.rejects += 1
+            if body.modify_id is None:
+                with self._orders_lock:
+                    self.orders.pop(body.order_id, None)
+        elif isinstance(body, Close):
+            stats.closes += 1
+            with self._orders_lock:
+                self.orders.pop(body.order_id, None)
+        elif isinstance(body, SubmitFailed):
+            stats.failures += 1
+            if isinstance(body.body, Open):
+                with self._orders_lock:
+                    self.orders.pop(body.body.order_id, None)
+
+    def route(self, body: MessageBody) -> int:
+        if isinstance(body, Open):
+            session = self.routes.get(body.product_id)
+            if session is None:
+                if self.router is not None:
+                    session = self.router(body)
+                else:
+                    session = body.product_id % len(self.configs)
+            with self._orders_lock:
+                self.orders[body.order_id] = [session, body.quantity]
+            return session
+        if isinstance(body, Modify):
+            with self._orders_lock:
+                order = self.orders.get(body.order_id)
+                if order is None:
+                    raise KeyError(f"Unknown order {body.order_id}")
+                order[1] = body.quantity
+                return order[0]
+        raise ValueError(f"Cannot route {body}")
+
+    def submit(self, body: MessageBody) -> Optional[concurrent.futures.Future]:
+        futures = self.submit_many([body])
+        return futures[0] if futures else None
+
+    def submit_many(
+        self, bodies: Sequence[MessageBody]
+    ) -> List[concurrent.futures.Future]:
+        """
+        Route and send `bodies`. In thread mode returns the bridge's futures
+        in the order of `bodies`. Futures cannot leave a worker process, so
+        in process mode nothing is returned and local failures arrive on
+        `events` as `(session index, SubmitFailed)` instead.
+        """
+        batches: Dict[int, List[MessageBody]] = {}
+        positions: Dict[int, List[int]] = {}
+        for position, body in enumerate(bodies):
+            session = self.route(body)
+            batches.setdefault(session, []).append(body)
+            positions.setdefault(session, []).append(position)
+        futures: List[Optional[concurrent.futures.Future]] = [None] * len(bodies)
+        for session, batch in batches.items():
+            self.stats[session].submitted += len(batch)
+            if self.use_processes:
+                self._order_pipes[session].send(batch)
+            else:
+                bridge = self._bridges[session]
+                assert bridge is not None
+                for position, future in zip(
+                    positions[session], bridge.submit_many(batch)
+                ):
+                    future.add_done_callback(
+                        partial(self._on_done, session, bodies[position])
+                    )
+                    futures[position] = future
+        if self.use_processes:
+            return []
+        return futures
+
+    def _on_done(
+        self, session: int, body: MessageBody, future: concurrent.futures.Future
+    ):
+        if not future.cancelled() and future.exception() is not None:
+            self._track((session, SubmitFailed(body, repr(future.exception()))))
+
+    def totals(self) -> SessionStats:
+        total = SessionStats()
+        for stats in self.stats:
+            total.submitted += stats.submitted
+            total.acks += stats.acks
+            total.fills += stats.fills
+            total.rejects += stats.rejects
+            total.closes += stats.closes
+            total.failures += stats.failures
+        return total
+
+    def stop(self):
+        if self.use_processes:
+            for pipe in self._order_pipes:
+                pipe.send(None)
+            for process in self._workers:
+                process.join(timeout=5)
+        else:
+            self._stop_clients()
+            for thread in self._workers:
+                thread.join(timeout=5)
+
+    def _stop_clients(self):
+        for client, bridge in zip(self._clients, self._bridges):
+            if client is not None and bridge is not None:
+                bridge.loop.call_soon_threadsafe(client.stop)
@@ -0,0 +1,154 @@
+from enum import Enum
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+import btnl_client.websocket as ws
+from btnl_client.protocol import (
+    Close,
+    Fill,
+    MarketState,
+    MarketStateUpdate,
+    MessageBody,
+    Modify,
+    Open,
+    Reject,
+    RejectReason,
+)
+from btnl_client.risk import PreTradeReject
+from btnl_client.symbols import SymbolResolver
+
+
+class HaltPolicy(Enum):
+    Reject = "reject"
+    Hold = "hold"
+
+
+class ReleasePolicy(Enum):
+    Send = "send"
+    Drop = "drop"
+
+
+# Called with the product id and the held messages when a product reopens,
+# returns the messages that should still be sent
+ReleaseCallback = Callable[[int, List[MessageBody]], Iterable[MessageBody]]
+
+
+class MarketStateRegistry:
+    """
+    Per-product market state fed from BTP `MarketStateUpdate`s and websocket
+    `MarketStatusUpdate`s, consulted by `OrderEntryClient` before sending.
+
+    While a product is halted or closed its orders are either rejected
+    locally with `PreTradeReject` or held until the product reopens. Products
+    with no known state are treated as open.
+    """
+
+    def __init__(
+        self,
+        halt_policy: HaltPolicy = HaltPolicy.Reject,
+        release_policy: Union[ReleasePolicy, ReleaseCallback] = ReleasePolicy.Send,
+        resolver: Optional[SymbolResolver] = None,
+    ):
+        self.halt_policy = halt_policy
+        self.release_policy = release_policy
+        self.resolver = resolver
+        self.states: Dict[int, MarketState] = {}
+        self.held: Dict[int, List[MessageBody]] = {}
+        # order_id -> [product_id, remaining quantity], needed to route modifies
+        self.orders: Dict[int, list] = {}
+        # Set by OrderEntryClient to send messages released on reopen
+        self.on_release: Optional[Callable[[List[MessageBody]], None]] = None
+
+    def state(self, product_id: int) -> MarketState:
+        return self.states.get(product_id, MarketState.Open)
+
+    def is_open(self, product_id: int) -> bool:
+        return self.states.get(product_id, MarketState.Open) is MarketState.Open
+
+    def product_of(self, body: MessageBody) -> Optional[int]:
+        if isinstance(body, Open):
+            return body.product_id
+        if isinstance(body, Modify):
+            return self.order_product(body.order_id)
+        return None
+
+    def admit(self, body: MessageBody) -> bool:
+        """
+        Return whether `body` can be sent now. A message for a product that is
+        not open is held (returning False) or rejected, depending on policy.
+        Cancels, modifies to quantity 0, always go out.
+        """
+        if isinstance(body, Modify) and body.quantity == 0:
+            return True
+        product_id = self.product_of(body)
+        if product_id is None:
+            return True
+        state = self.states.get(product_id, MarketState.Open)
+        if state is MarketState.Open:
+            return True
+        if self.halt_policy is HaltPolicy.Hold:
+            self.held.setdefault(product_id, []).append(body)
+            return False
+        reason = (
+            RejectReason.MarketHalted
+            if state is MarketState.Halt
+            else RejectReason.MarketClosed
+        )
+        raise PreTradeReject(reason, body)
+
+    def on_sent(self, body: MessageBody):
+        if isinstance(body, Open):
+            self.record_open(body.order_id, body.product_id, body.quantity)
+        elif isinstance(body, Modify):
+            self.record_modify(body.order_id, body.quantity)
+
+    def record_open(self, order_id: int, product_id: int, quantity: int):
+        self.orders[order_id] = [product_id, quantity]
+
+    def record_modify(self, order_id: int, quantity: int):
+        order = self.orders.get(order_id)
+        if order is not None:
+            order[1] = quantity
+
+    def order_product(self, order_id: int) -> Optional[int]:
+        order = self.orders.get(order_id)
+        return order[0] if order is not None else None
+
+    def update(self, product_id: int, state: MarketState):
+        self.states[product_id] = state
+        if state is not MarketState.Open:
+            return
+        held = self.held.pop(product_id, None)
+        if not held:
+            return
+        if self.release_policy is ReleasePolicy.Send:
+            released = held
+        elif self.release_policy is ReleasePolicy.Drop:
+            released = []
+        else:
+            released = list(self.release_policy(product_id, held))
+        if released and self.on_release is not None:
+            self.on_release(released)
+
+    def on_message(self, body: MessageBody):
+        if isinstance(body, MarketStateUpdate):
+            self.update(body.product_id, body.market_state)
+        elif isinstance(body, Fill):
+            order = self.orders.get(body.order_id)
+            if order is not None:
+                order[1] -= body.quantity
+                if order[1] <= 0:
+                    del self.orders[body.order_id]
+        elif isinstance(body, Close):
+            self.orders.pop(body.order_id, None)
+        elif isinstance(body, Reject) and body.modify_id is None:
+            self.orders.pop(body.order_id, None)
+
+    def on_ws_message(self, message: ws.Message):
+        if not isinstance(message, ws.MarketStatusUpdate) or self.resolver is None:
+            return
+        product_id = self.resolver.index.get_product_id(message.symbol)
+        if product_id is None:
+            return
+        # parse_message leaves enum fields as the raw JSON strings
+        status = getattr(message.state, "value", message.state)
+        self.update(product_id, MarketState[status])
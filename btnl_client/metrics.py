@@ -0,0 +1,379 @@
+import asyncio
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from btnl_client.protocol import BodyEncoding, Disconnect, Header, MessageBody, Reject
+from btnl_client.protocol.login import Login
+from btnl_client.protocol.order_entry import OrderEntry
+from btnl_client.protocol.pricefeed import Pricefeed
+
+Labels = Tuple[str, ...]
+# A tracked callback returns either one value or values by label tuple
+Sampler = Callable[[], Union[float, Dict[Labels, float]]]
+
+
+class Metric:
+    """
+    Named set of values keyed by label tuple. Updates are plain dict
+    operations, which need no lock on a single event loop thread.
+    """
+
+    TYPE = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Labels, float] = {}
+        self.samplers: Dict[Labels, Sampler] = {}
+
+    def track(self, labels: Labels, sampler: Sampler):
+        """
+        Read the value for `labels` from `sampler` whenever metrics are
+        collected instead of updating it on the hot path
+        """
+        self.samplers[labels] = sampler
+
+    def untrack(self, labels: Labels):
+        self.samplers.pop(labels, None)
+
+    def samples(self) -> List[Tuple[Labels, float]]:
+        samples = list(self.values.items())
+        for labels, sampler in self.samplers.items():
+            value = sampler()
+            if isinstance(value, dict):
+                samples.extend((labels + extra, v) for extra, v in value.items())
+            else:
+                samples.append((labels, value))
+        return samples
+
+
+class Counter(Metric):
+    TYPE = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        values = self.values
+        values[labels] = values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    TYPE = "gauge"
+
+    def set(self, value: float, labels: Labels = ()):
+        self.values[labels] = value
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        values = self.values
+        values[labels] = values.get(labels, 0) + amount
+
+    def dec(self, labels: Labels = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+    def set_max(self, value: float, labels: Labels = ()):
+        if value > self.values.get(labels, float("-inf")):
+            self.values[labels] = value
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _escape_help(value: str) -> str:
+    # Quotes are only escaped in label values
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    Counters and gauges rendered in the Prometheus text exposition format,
+    either scraped through `serve` or handed to `report_every` callbacks.
+    """
+
+    def __init__(self, prefix: str = "btnl_"):
+        self.prefix = prefix
+        self.metrics: Dict[str, Metric] = {}
+        self._reporting: Optional[asyncio.TimerHandle] = None
+
+    def _get(
+        self, cls, name: str, documentation: str, labelnames: Iterable[str]
+    ) -> Metric:
+        name = self.prefix + name
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(name, documentation, labelnames)
+        elif type(metric) is not cls or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {name} already registered differently")
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> Counter:
+        return self._get(Counter, name, documentation, labelnames)
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Iterable[str] = ()
+    ) -> Gauge:
+        return self._get(Gauge, name, documentation, labelnames)
+
+    def snapshot(self) -> Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]:
+        """
+        Every current value keyed by metric name and `(label, value)` pairs
+        """
+        snapshot = {}
+        for metric in self.metrics.values():
+            for labels, value in metric.samples():
+                snapshot[(metric.name, tuple(zip(metric.labelnames, labels)))] = value
+        return snapshot
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.TYPE}")
+            for labels, value in metric.samples():
+                if labels:
+                    pairs = ",".join(
+                        f'{name}="{_escape(str(label))}"'
+                        for name, label in zip(metric.labelnames, labels)
+                    )
+                    lines.append(f"{metric.name}{{{pairs}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{metric.name} {_format_value(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+    def report_every(self, interval: float, callback: Callable[[Dict], None]):
+        """
+        Call `callback` with a `snapshot()` every `interval` seconds on the
+        running loop, for collectors that do not scrape
+        """
+        loop = asyncio.get_running_loop()
+
+        def report():
+            callback(self.snapshot())
+            self._reporting = loop.call_later(interval, report)
+
+        self.stop_reporting()
+        self._reporting = loop.call_later(interval, report)
+
+    def stop_reporting(self):
+        if self._reporting is not None:
+            self._reporting.cancel()
+            self._reporting = None
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 9100):
+        """
+        Serve `render()` over HTTP at /metrics
+        """
+        return await asyncio.start_server(self._handle_http, host, port)
+
+    async def _handle_http(self, reader, writer):
+        try:
+            request = await reader.readline()
+            # Skip the headers
+            while (await reader.readline()).strip():
+                pass
+            parts = request.decode("latin-1").split()
+            if (
+                len(parts) >= 2
+                and parts[0] == "GET"
+                and parts[1].startswith("/metrics")
+            ):
+                status = "200 OK"
+                body = self.render().encode()
+            else:
+                status = "404 Not Found"
+                body = b"Not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def _type_names() -> Dict[Tuple[bytes, bytes], Tuple[str, str]]:
+    names = {}
+    for body in (Login, OrderEntry, Pricefeed):
+        encoding = body.body_encoding
+        for message_type, parse in body.MESSAGE_TYPES.items():
+            names[(encoding.value.encode(), message_type)] = (
+                encoding.name,
+                parse.__self__.__name__,
+            )
+    return names
+
+
+# (body encoding, message type) bytes of a frame -> label values
+FRAME_TYPES = _type_names()
+ENCODING_NAMES = {encoding.value.encode(): encoding.name for encoding in BodyEncoding}
+SINGLE_TYPE_NAMES = {
+    BodyEncoding.MarketState.name: "MarketStateUpdate",
+    BodyEncoding.Heartbeat.name: "Heartbeat",
+    BodyEncoding.Disconnect.name: "Disconnect",
+}
+
+
+class ClientMetrics:
+    """
+    Metrics of one `OrderEntryClient` or `BitnomialWebSocketClient`, labelled
+    with `client` so many can share a registry.
+
+    Frames are counted from their raw headers as they are written and read,
+    and queue depths, the transport write buffer and reconnects are read
+    from the client only when metrics are collected.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None, client: str = ""):
+        self.registry = registry = registry or MetricsRegistry()
+        self.client = client
+        self.messages = registry.counter(
+            "messages_total",
+            "Messages by direction, body encoding and message type",
+            ("client", "direction", "encoding", "type"),
+        )
+        self.bytes = registry.counter(
+            "bytes_total", "Bytes written and read", ("client", "direction")
+        )
+        self.decode_seconds = registry.counter(
+            "decode_seconds_total",
+            "Time spent decoding received messages",
+            ("client", "feed"),
+        )
+        self.rejects = registry.counter(
+            "rejects_total", "Order entry rejects by reason", ("client", "reason")
+        )
+        self.disconnects = registry.counter(
+            "disconnects_total", "Exchange disconnects by reason", ("client", "reason")
+        )
+        self.heartbeat_lateness = registry.gauge(
+            "heartbeat_lateness_seconds",
+            "How late the last heartbeat went out after it was due",
+            ("client",),
+        )
+        self.heartbeat_lateness_max = registry.gauge(
+            "heartbeat_lateness_max_seconds",
+            "Latest any heartbeat went out after it was due",
+            ("client",),
+        )
+        self.reconnects = registry.counter(
+            "reconnects_total", "Session reconnects", ("client",)
+        )
+        self.write_buffer = registry.gauge(
+            "write_buffer_bytes", "Bytes waiting in the transport", ("client",)
+        )
+        self.queue_depth = registry.gauge(
+            "queue_depth", "Items waiting in client queues", ("client", "queue")
+        )
+        self.feed_lag = registry.gauge(
+            "feed_lag_seconds",
+            "Moving average of exchange to client market data latency",
+            ("client", "symbol"),
+        )
+        self._labels: Dict[Tuple[str, bytes, bytes], Labels] = {}
+        self._in = (client, "in")
+        self._out = (client, "out")
+        self._btp = (client, "btp")
+        self._ws = (client, "ws")
+
+    def attach(self, client):
+        """
+        Track the parts of `client` that are sampled at collection time
+        """
+        label = (self.client,)
+
+        def write_buffer():
+            writer = getattr(client, "writer", None)
+            transport = getattr(writer, "transport", None)
+            if transport is None:
+                return 0
+            return transport.get_write_buffer_size()
+
+        self.write_buffer.track(label, write_buffer)
+        self.reconnects.track(label, lambda: getattr(client, "reconnects", 0))
+        if getattr(client, "pending_acks", None) is not None:
+            self.track_queue("pending_acks", lambda: len(client.pending_acks))
+        governor = getattr(client, "governor", None)
+        if governor is not None:
+            self.track_queue("governor", lambda: governor.queued)
+        registry = getattr(client, "market_states", None)
+        if registry is not None:
+            self.track_queue(
+                "held", lambda: sum(len(held) for held in registry.held.values())
+            )
+        journal = getattr(client, "journal", None)
+        if journal is not None:
+            self.track_queue("journal", lambda: len(journal.queue))
+        feed_lag = getattr(client, "feed_lag", None)
+        if feed_lag is not None:
+            self.feed_lag.track(
+                label,
+                lambda: {
+                    (symbol,): state.average / 1e9
+                    for symbol, state in feed_lag.symbols.items()
+                },
+            )
+
+    def track_queue(self, name: str, depth: Callable[[], int]):
+        self.queue_depth.track((self.client, name), depth)
+
+    def _frame_labels(self, direction: str, encoding: bytes, message_type: bytes):
+        names = FRAME_TYPES.get((encoding, message_type))
+        if names is None:
+            encoding_name = ENCODING_NAMES.get(encoding, encoding.decode("latin-1"))
+            names = (encoding_name, SINGLE_TYPE_NAMES.get(encoding_name, "Unknown"))
+        labels = self._labels[(direction, encoding, message_type)] = (
+            self.client,
+            direction,
+        ) + names
+        return labels
+
+    def _count_frames(self, direction: str, data: bytes):
+        values = self.messages.values
+        cache = self._labels
+        offset = 0
+        end = len(data)
+        while offset < end:
+            (body_length,) = Header.BODY_LENGTH.unpack_from(
+                data, offset + Header.LEN - 2
+            )
+            encoding = bytes(data[offset + 8 : offset + 10])
+            body = offset + Header.LEN
+            message_type = bytes(data[body : body + 1]) if body_length else b""
+            key = (direction, encoding, message_type)
+            labels = cache.get(key) or self._frame_labels(*key)
+            values[labels] = values.get(labels, 0) + 1
+            offset = body + body_length
+
+    def on_write(self, data: bytes):
+        self._count_frames("out", data)
+        self.bytes.inc(self._out, len(data))
+
+    def on_read(self, frame: bytes, body: MessageBody, decode_ns: int):
+        self._count_frames("in", frame)
+        self.bytes.inc(self._in, len(frame))
+        self.decode_seconds.inc(self._btp, decode_ns / 1e9)
+        if isinstance(body, Reject):
+            self.rejects.inc((self.client, body.reject_reason.name))
+        elif isinstance(body, Disconnect):
+            self.disconnects.inc((self.client, body.disconnect_reason.name))
+
+    def on_heartbeat(self, lateness: float):
+        label = (self.client,)
+        self.heartbeat_lateness.set(lateness, label)
+        self.heartbeat_lateness_max.set_max(lateness, label)
+
+    def on_ws_message(self, text: str, message, decode_ns: int):
+        self.messages.inc((self.client, "in", "websocket", type(message).__name__))
+        self.bytes.inc(self._in, len(text))
+        self.decode_seconds.inc(self._ws, decode_ns / 1e9)
@@ -0,0 +1,161 @@
+import time
+from dataclasses import dataclass, fields
+from datetime import datetime, time as dt_time, timezone, tzinfo
+from operator import attrgetter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from btnl_client.product import BitnomialHttpClient, ProductData, ProductSpec
+
+PRODUCT_DATA_FIELDS = tuple(f.name for f in fields(ProductData))
+_product_data_values = attrgetter(*PRODUCT_DATA_FIELDS)
+
+
+@dataclass
+class ProductDataChange:
+    product_id: int
+    # Only the fields whose value differs from the previous poll. A product seen
+    # for the first time carries every field.
+    changes: Dict[str, Any]
+
+
+def _parse_time_of_day(value: Optional[str]) -> Optional[dt_time]:
+    if not value:
+        return None
+    try:
+        return dt_time.fromisoformat(value)
+    except ValueError:
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timetz()
+        except ValueError:
+            return None
+
+
+class TradingHours:
+    """
+    Daily trading windows taken from product specs, used to slow polling down
+    while every tracked product is outside its session. Times carrying a UTC
+    offset are compared at that offset, others in `market_timezone`.
+    """
+
+    def __init__(self, specs: List[ProductSpec], market_timezone: tzinfo):
+        self.market_timezone = market_timezone
+        self.windows: Dict[int, Tuple[dt_time, dt_time, tzinfo]] = {}
+        for spec in specs:
+            open_time = _parse_time_of_day(spec.daily_open_time)
+            settle_time = _parse_time_of_day(spec.daily_settle_time)
+            if open_time is not None and settle_time is not None:
+                zone = open_time.tzinfo or settle_time.tzinfo or market_timezone
+                self.windows[spec.product_id] = (
+                    open_time.replace(tzinfo=None),
+                    settle_time.replace(tzinfo=None),
+                    zone,
+                )
+
+    def is_open(self, product_id: int, now: datetime) -> bool:
+        window = self.windows.get(product_id)
+        if window is None:
+            # Without usable hours assume the product might trade
+            return True
+        open_time, settle_time, zone = window
+        current = now.astimezone(zone).time().replace(tzinfo=None)
+        if open_time <= settle_time:
+            return open_time <= current < settle_time
+        # Sessions that open in the evening and settle the next day
+        return current >= open_time or current < settle_time
+
+    def any_open(self, product_ids, now: datetime) -> bool:
+        return any(self.is_open(product_id, now) for product_id in product_ids)
+
+
+class ProductDataPoller:
+    """
+    Polls `get_product_data` and reports only the products and fields that
+    changed since the previous poll.
+
+    The interval halves towards `min_interval` after a poll that saw changes and
+    grows towards `max_interval` after a quiet one. When specs are supplied and
+    no tracked product is inside its daily session `closed_interval` is used.
+    """
+
+    def __init__(
+        self,
+        client: BitnomialHttpClient,
+        min_interval: float = 1.0,
+        max_interval: float = 30.0,
+        closed_interval: float = 300.0,
+        specs: Optional[List[ProductSpec]] = None,
+        market_timezone: tzinfo = timezone.utc,
+        day=None,
+        active=None,
+        base_symbol=None,
+    ):
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.closed_interval = closed_interval
+        self.trading_hours = (
+            TradingHours(specs, market_timezone) if specs is not None else None
+        )
+        self.day = day
+        self.active = active
+        self.base_symbol = base_symbol
+        self.interval = min_interval
+        self.snapshot: Dict[int, Tuple] = {}
+
+    def poll(self) -> List[ProductDataChange]:
+        data = self.client.get_product_data(
+            day=self.day, active=self.active, base_symbol=self.base_symbol
+        )
+        return self.diff(data)
+
+    def diff(self, data: List[ProductData]) -> List[ProductDataChange]:
+        snapshot = self.snapshot
+        changes = []
+        for datum in data:
+            values = _product_data_values(datum)
+            previous = snapshot.get(datum.product_id)
+            if previous == values:
+                continue
+            if previous is None:
+                changed = dict(zip(PRODUCT_DATA_FIELDS, values))
+            else:
+                changed = {
+                    name: new
+                    for name, old, new in zip(PRODUCT_DATA_FIELDS, previous, values)
+                    if old != new
+                }
+            snapshot[datum.product_id] = values
+            changes.append(ProductDataChange(datum.product_id, changed))
+        return changes
+
+    def next_interval(self, changed: bool, now: Optional[datetime] = None) -> float:
+        if self.trading_hours is not None and self.snapshot:
+            now = now or datetime.now(timezone.utc)
+            if not self.trading_hours.any_open(self.snapshot.keys(), now):
+                self.interval = self.max_interval
+                return self.closed_interval
+        if changed:
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        return self.interval
+
+    def changes(self) -> Iterator[List[ProductDataChange]]:
+        """
+        Poll forever, yielding each non-empty batch of changes
+        """
+        while True:
+            started = time.monotonic()
+            changes = self.poll()
+            if changes:
+                yield changes
+            delay = self.next_interval(bool(changes))
+            time.sleep(max(0.0, delay - (time.monotonic() - started)))
+
+
+# Example use:
+# client = BitnomialHttpClient()
+# poller = ProductDataPoller(client, specs=client.get_product_specs(active=True))
+# for changes in poller.changes():
+#     for change in changes:
+#         print(change.product_id, change.changes)
@@ -1,13 +1,17 @@
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Union, TypeVar, Generic
+from typing import Dict, List, Optional, Tuple, Union, TypeVar, Generic
 from enum import Enum
-from datetime import datetime, date, timezone
+from datetime import datetime, date
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
 import btnl_client.hmac_utils as hmac_utils
 from urllib.parse import urlparse
 import requests
+from requests.adapters import HTTPAdapter
 
 
 BASE_URL = "https://bitnomial.com/exchange/api/v1"
+DEFAULT_MAX_CONCURRENCY = 16
 
 
 class BaseSymbol(Enum):
@@ -221,58 +225,60 @@ class CursorInfo:
     cursor: str
 
 
+def parse_product_spec(spec: Dict) -> ProductSpec:
+    spec_type = ProductSpecType(spec["type"])
+    if spec_type == ProductSpecType.Future:
+        return ProductFutureSpec(**spec)
+    elif spec_type == ProductSpecType.Spread:
+        return ProductSpreadSpec(**spec)
+    elif spec_type == ProductSpecType.Option:
+        return ProductOptionSpec(**spec)
+    else:
+        raise ValueError(f"Unexpected product spec type: {spec['type']}")
+
+
 class BitnomialHttpClient:
     base_url: str
     env: str
+    max_concurrency: int
 
-    def __init__(self, base_url=None, env=None):
+    def __init__(self, base_url=None, env=None, max_concurrency=None):
         self.base_url = base_url or BASE_URL
         self.env = env or "prod"
+        self.max_concurrency = max_concurrency or DEFAULT_MAX_CONCURRENCY
+        # A single session keeps connections alive between requests. The pool is
+        # sized so that every bulk worker can hold a connection at once.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.max_concurrency, pool_maxsize=self.max_concurrency
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._in_flight: Dict[Tuple, Future] = {}
+        self._in_flight_lock = threading.RLock()
 
     def get_product_spec(
         self, product_id, day=None, active=None, base_symbol=None
     ) -> ProductSpec:
         url = self.base_url + f"/{self.env}/product/spec/{product_id}"
         params = {"day": day, "active": active, "base_symbol": base_symbol}
-        response = requests.get(url, params=params)
-        spec = response.json()
-        spec_type = ProductSpecType(spec["type"])
-        product_spec: ProductSpec
-        if spec_type == ProductSpecType.Future:
-            product_spec = ProductFutureSpec(**spec)
-        elif spec_type == ProductSpecType.Spread:
-            product_spec = ProductSpreadSpec(**spec)
-        elif spec_type == ProductSpecType.Option:
-            product_spec = ProductOptionSpec(**spec)
-        else:
-            raise ValueError(f"Unexpected product spec type: {spec['type']}")
-        return product_spec
+        response = self.session.get(url, params=params)
+        return parse_product_spec(response.json())
 
     def get_product_specs(
         self, day=None, active=None, base_symbol=None
     ) -> List[ProductSpec]:
         url = self.base_url + f"/{self.env}/product/specs"
         params = {"day": day, "active": active, "base_symbol": base_symbol}
-        response = requests.get(url, params=params)
-        product_specs: List[ProductSpec] = []
-        for spec in response.json():
-            spec_type = ProductSpecType(spec["type"])
-            if spec_type == ProductSpecType.Future:
-                product_specs.append(ProductFutureSpec(**spec))
-            elif spec_type == ProductSpecType.Spread:
-                product_specs.append(ProductSpreadSpec(**spec))
-            elif spec_type == ProductSpecType.Option:
-                product_specs.append(ProductOptionSpec(**spec))
-            else:
-                raise ValueError(f"Unexpected product spec type: {spec['type']}")
-        return product_specs
+        response = self.session.get(url, params=params)
+        return [parse_product_spec(spec) for spec in response.json()]
 
     def get_product_data(
         self, day=None, active=None, base_symbol=None
     ) -> List[ProductData]:
         url = self.base_url + f"/{self.env}/product/data"
         params = {"day": day, "active": active, "base_symbol": base_symbol}
-        response = requests.get(url, params=params)
+        response = self.session.get(url, params=params)
         return [ProductData(**data) for data in response.json()]
 
     def get_product_datum(
@@ -280,19 +286,75 @@ class BitnomialHttpClient:
     ) -> ProductData:
         url = self.base_url + f"/{self.env}/product/data/{product_id}"
         params = {"day": day, "active": active, "base_symbol": base_symbol}
-        response = requests.get(url, params=params)
+        response = self.session.get(url, params=params)
         product_data = response.json()
         return ProductData(**product_data)
 
+    def get_product_specs_for(
+        self, product_ids, day=None, active=None, base_symbol=None, concurrency=None
+    ) -> List[ProductSpec]:
+        """
+        Fetch the specs for `product_ids` concurrently, returned in input order.
+        `concurrency` is capped at `max_concurrency`, the connection pool size.
+        """
+        return self._fan_out(
+            self.get_product_spec, product_ids, day, active, base_symbol, concurrency
+        )
+
+    def get_product_data_for(
+        self, product_ids, day=None, active=None, base_symbol=None, concurrency=None
+    ) -> List[ProductData]:
+        """
+        Fetch the data for `product_ids` concurrently, returned in input order.
+        `concurrency` is capped at `max_concurrency`, the connection pool size.
+        """
+        return self._fan_out(
+            self.get_product_datum, product_ids, day, active, base_symbol, concurrency
+        )
+
+    def _fan_out(self, fetch, product_ids, day, active, base_symbol, concurrency):
+        product_ids = list(product_ids)
+        # Workers beyond the pool size would open connections the pool then
+        # discards instead of keeping alive
+        concurrency = min(concurrency or self.max_concurrency, self.max_concurrency)
+        workers = min(concurrency, len(product_ids)) or 1
+        futures: Dict[int, Future] = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for product_id in product_ids:
+                if product_id not in futures:
+                    key = (fetch.__name__, product_id, day, active, base_symbol)
+                    futures[product_id] = self._single_flight(
+                        executor, key, fetch, product_id, day, active, base_symbol
+                    )
+            return [futures[product_id].result() for product_id in product_ids]
+
+    def _single_flight(self, executor, key, fetch, *args) -> Future:
+        # Identical requests that are already running, possibly from another
+        # thread's bulk call, share the same future instead of a second request.
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = executor.submit(fetch, *args)
+                self._in_flight[key] = future
+                future.add_done_callback(lambda _: self._forget_in_flight(key))
+            return future
+
+    def _forget_in_flight(self, key):
+        with self._in_flight_lock:
+            self._in_flight.pop(key, None)
+
 
 class AuthBitnomialHttpClient(BitnomialHttpClient):
     connection_id: int
     auth_token: str
 
-    def __init__(self, connection_id, auth_token, base_url=None, env=None):
+    def __init__(
+        self, connection_id, auth_token, base_url=None, env=None, max_concurrency=None
+    ):
         self.connection_id = connection_id
         self.auth_token = auth_token
-        super().__init__(base_url, env)
+        self.signer = hmac_utils.RequestSigner(connection_id, auth_token)
+        super().__init__(base_url, env, max_concurrency)
 
     def get_fills(
         self,
@@ -327,7 +389,7 @@ class AuthBitnomialHttpClient(BitnomialHttpClient):
             "product_id": product_ids,
         }
         headers = self.auth_headers(method, url, params)
-        response = requests.get(url, params=params, headers=headers)
+        response = self.session.get(url, params=params, headers=headers)
         fills = response.json()
         return Pagination(**fills)
 
@@ -364,7 +426,7 @@ class AuthBitnomialHttpClient(BitnomialHttpClient):
             "cursor": cursor,
         }
         headers = self.auth_headers(method, url, params)
-        response = requests.get(url, params=params, headers=headers)
+        response = self.session.get(url, params=params, headers=headers)
         orders = response.json()
         return Pagination(**orders)
 
@@ -403,22 +465,12 @@ class AuthBitnomialHttpClient(BitnomialHttpClient):
             "cursor": cursor,
         }
         headers = self.auth_headers(method, url, params)
-        response = requests.get(url, params=params, headers=headers)
+        response = self.session.get(url, params=params, headers=headers)
         block_trades = response.json()
         return Pagination(**block_trades)
 
     def auth_headers(self, method: str, url: str, params: Dict):
-        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
-        path = urlparse(url).path
-        signature = hmac_utils.signature(
-            method, path, params, timestamp, self.connection_id, self.auth_token
-        )
-
-        return {
-            hmac_utils.CONNECTION_ID_HEADER: str(self.connection_id),
-            hmac_utils.TIMESTAMP_HEADER: timestamp,
-            hmac_utils.SIGNATURE_HEADER: signature,
-        }
+        return self.signer.headers(method, urlparse(url).path, params)
 
 
 # Example use:
@@ -8,7 +8,14 @@ from .login import (
     LogoutRequest,
 )
 from .market_state import MarketState, MarketStateUpdate
-from .message import Disconnect, Header, Heartbeat, Message, new_message
+from .message import (
+    Disconnect,
+    DisconnectReason,
+    Header,
+    Heartbeat,
+    Message,
+    new_message,
+)
 from .order_entry import (
     Ack,
     Close,
@@ -23,3 +30,4 @@ from .order_entry import (
     Side,
     TimeInForce,
 )
+from .template import ModifyTemplate, OpenTemplate
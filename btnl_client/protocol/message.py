@@ -1,5 +1,5 @@
 import struct
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from typing import Optional
 
@@ -43,7 +43,7 @@ class Disconnect(MessageBody):
     def to_btp(self) -> bytes:
         return struct.pack(
             Disconnect.FORMAT_STR,
-            self.disconnect_reason,
+            self.disconnect_reason.value,
             self.expected_sequence_id if self.expected_sequence_id is not None else 0,
             self.actual_sequence_id if self.actual_sequence_id is not None else 0,
         )
@@ -70,6 +70,7 @@ class Header:
     VERSION = 2
     FORMAT_STR = "<2sHI2sH"
     LEN = 12
+    BODY_LENGTH = struct.Struct("<H")
 
     def to_btp(self) -> bytes:
         return struct.pack(
@@ -95,6 +96,8 @@ class Header:
 class Message:
     header: Header
     body: MessageBody
+    # time_ns when the frame was read, if the client stamps them
+    received_ns: Optional[int] = field(default=None, compare=False, repr=False)
 
     def to_btp(self) -> bytes:
         if self.body.body_encoding == BodyEncoding.Heartbeat:
@@ -128,6 +131,17 @@ class Message:
         parsed_body = parse_body(body)
         return Message(header, parsed_body)
 
+    @staticmethod
+    async def read_frame(reader) -> bytes:
+        """
+        Read one undecoded frame, header included
+        """
+        header_data = await reader.readexactly(Header.LEN)
+        (body_length,) = Header.BODY_LENGTH.unpack_from(header_data, Header.LEN - 2)
+        if body_length == 0:
+            return header_data
+        return header_data + await reader.readexactly(body_length)
+
     @staticmethod
     async def read_message(reader) -> "Message":
         header_data = await reader.readexactly(Header.LEN)
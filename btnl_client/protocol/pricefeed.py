@@ -39,7 +39,7 @@ class Trade(MessageBody):
             quantity,
         ) = struct.unpack(Trade.FORMAT_STR, data)
         assert message_type == Trade.MSG_TYPE
-        return Trade(ack_id, product_id, taker_side, price, quantity)
+        return Trade(ack_id, product_id, Side(taker_side.decode()), price, quantity)
 
 
 @dataclass
@@ -60,7 +60,7 @@ class Level(MessageBody):
             Level.MSG_TYPE,
             self.ack_id,
             self.product_id,
-            self.side,
+            self.side.value.encode(),
             self.price,
             self.quantity,
         )
@@ -76,7 +76,7 @@ class Level(MessageBody):
             quantity,
         ) = struct.unpack(Level.FORMAT_STR, data)
         assert message_type == Level.MSG_TYPE
-        return Level(ack_id, product_id, side, price, quantity)
+        return Level(ack_id, product_id, Side(side.decode()), price, quantity)
 
 
 @dataclass
@@ -172,8 +172,6 @@ class Book(MessageBody):
             bids.append(book_level)
 
             bid_data = bid_data[book_level_size:]
-            if len(bid_data) <= book_level_size:
-                break
 
         # calculate asks length
         asks_length_index = fixed_length_size + bid_ask_length_size + bids_length
@@ -197,8 +195,6 @@ class Book(MessageBody):
             asks.append(book_level)
 
             ask_data = ask_data[book_level_size:]
-            if len(ask_data) <= book_level_size:
-                break
 
         return Book(
             last_ack_id,
@@ -0,0 +1,111 @@
+import struct
+
+from .core import Side
+from .message import Header, new_message
+from .order_entry import Modify, Open, TimeInForce
+
+# Offsets into a full frame (header + body), derived from the format strings
+SEQUENCE_ID_OFFSET = struct.calcsize("<2sH")
+SEQUENCE_ID = struct.Struct("<I")
+
+OPEN_ORDER_ID_OFFSET = Header.LEN + struct.calcsize("<c")
+OPEN_ORDER_ID = struct.Struct("<Q")
+OPEN_PRICE_OFFSET = Header.LEN + struct.calcsize("<cQQc")
+OPEN_PRICE_QUANTITY = struct.Struct("<qI")
+
+MODIFY_FIELDS_OFFSET = Header.LEN + struct.calcsize("<c")
+MODIFY_FIELDS = struct.Struct("<QQqI")
+
+
+class OpenTemplate:
+    """
+    Pre-serialized `Open` frame for one product, side and time in force.
+
+    `encode` patches the sequence id, order id, price and quantity into the
+    same buffer in place and returns it, so the result is only valid until
+    the next call.
+    """
+
+    def __init__(self, product_id: int, side: Side, time_in_force: TimeInForce):
+        self.product_id = product_id
+        self.side = side
+        self.time_in_force = time_in_force
+        self.buffer = bytearray(
+            new_message(0, Open(0, product_id, side, 0, 0, time_in_force)).to_btp()
+        )
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def encode(
+        self, sequence_id: int, order_id: int, price: int, quantity: int
+    ) -> bytearray:
+        buffer = self.buffer
+        SEQUENCE_ID.pack_into(buffer, SEQUENCE_ID_OFFSET, sequence_id)
+        OPEN_ORDER_ID.pack_into(buffer, OPEN_ORDER_ID_OFFSET, order_id)
+        OPEN_PRICE_QUANTITY.pack_into(buffer, OPEN_PRICE_OFFSET, price, quantity)
+        return buffer
+
+    def encode_into(
+        self,
+        out: bytearray,
+        offset: int,
+        sequence_id: int,
+        order_id: int,
+        price: int,
+        quantity: int,
+    ):
+        """
+        Write a complete frame into `out` at `offset`
+        """
+        out[offset : offset + len(self.buffer)] = self.buffer
+        SEQUENCE_ID.pack_into(out, offset + SEQUENCE_ID_OFFSET, sequence_id)
+        OPEN_ORDER_ID.pack_into(out, offset + OPEN_ORDER_ID_OFFSET, order_id)
+        OPEN_PRICE_QUANTITY.pack_into(out, offset + OPEN_PRICE_OFFSET, price, quantity)
+
+    def body(self, order_id: int, price: int, quantity: int) -> Open:
+        return Open(
+            order_id, self.product_id, self.side, price, quantity, self.time_in_force
+        )
+
+
+class ModifyTemplate:
+    """
+    Pre-serialized `Modify` frame, see `OpenTemplate`
+    """
+
+    def __init__(self):
+        self.buffer = bytearray(new_message(0, Modify(0, 0, 0, 0)).to_btp())
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def encode(
+        self, sequence_id: int, order_id: int, modify_id: int, price: int, quantity: int
+    ) -> bytearray:
+        buffer = self.buffer
+        SEQUENCE_ID.pack_into(buffer, SEQUENCE_ID_OFFSET, sequence_id)
+        MODIFY_FIELDS.pack_into(
+            buffer, MODIFY_FIELDS_OFFSET, order_id, modify_id, price, quantity
+        )
+        return buffer
+
+    def encode_into(
+        self,
+        out: bytearray,
+        offset: int,
+        sequence_id: int,
+        order_id: int,
+        modify_id: int,
+        price: int,
+        quantity: int,
+    ):
+        out[offset : offset + len(self.buffer)] = self.buffer
+        SEQUENCE_ID.pack_into(out, offset + SEQUENCE_ID_OFFSET, sequence_id)
+        MODIFY_FIELDS.pack_into(
+            out, offset + MODIFY_FIELDS_OFFSET, order_id, modify_id, price, quantity
+        )
+
+    @staticmethod
+    def body(order_id: int, modify_id: int, price: int, quantity: int) -> Modify:
+        return Modify(order_id, modify_id, price, quantity)
@@ -0,0 +1,133 @@
+import asyncio
+import heapq
+import itertools
+import time
+from enum import IntEnum
+from typing import Callable, List, Optional, Tuple
+
+from btnl_client.protocol import MessageBody, Modify
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled at `rate` tokens per second up to `capacity`.
+
+    A take larger than the capacity is allowed once the bucket is full and
+    leaves it in debt, so bulk sends are paced rather than refused forever.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def try_take(self, count: int = 1) -> bool:
+        self._refill()
+        if self._tokens < min(count, self.capacity):
+            return False
+        self._tokens -= count
+        return True
+
+    def wait_time(self, count: int = 1) -> float:
+        self._refill()
+        missing = min(count, self.capacity) - self._tokens
+        return max(0.0, missing / self.rate)
+
+
+class Priority(IntEnum):
+    RiskReducing = 0
+    Modify = 1
+    Open = 2
+
+
+def default_priority(body: MessageBody) -> Priority:
+    if isinstance(body, Modify):
+        return Priority.RiskReducing if body.quantity == 0 else Priority.Modify
+    return Priority.Open
+
+
+class RateGovernor:
+    """
+    Paces outgoing messages to stay under the exchange's messaging rate.
+
+    Messages go straight out while the bucket has tokens. Once it runs dry
+    senders queue by priority and are released as tokens come back, so a
+    burst is smoothed to exactly `rate` messages per second.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        classify: Callable[[MessageBody], Priority] = default_priority,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.bucket = TokenBucket(rate, burst, clock)
+        self.classify = classify
+        self.sent = 0
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def utilization(self) -> float:
+        """
+        Fraction of the burst budget currently spent, 1.0 means at the limit
+        """
+        return 1.0 - max(0.0, self.bucket.tokens) / self.bucket.capacity
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: Priority = Priority.Open, count: int = 1):
+        if not self._waiters and self.bucket.try_take(count):
+            self.sent += count
+            return
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), count, future))
+        self._schedule(loop)
+        await future
+
+    async def acquire_for(self, body: MessageBody, count: int = 1):
+        await self.acquire(self.classify(body), count)
+
+    def _schedule(self, loop: asyncio.AbstractEventLoop):
+        if self._timer is None and self._waiters:
+            delay = self.bucket.wait_time(self._waiters[0][2])
+            self._timer = loop.call_later(delay, self._release, loop)
+
+    def _release(self, loop: asyncio.AbstractEventLoop):
+        self._timer = None
+        waiters = self._waiters
+        while waiters:
+            _, _, count, future = waiters[0]
+            if future.cancelled():
+                heapq.heappop(waiters)
+                continue
+            if not self.bucket.try_take(count):
+                break
+            heapq.heappop(waiters)
+            self.sent += count
+            future.set_result(None)
+        self._schedule(loop)
@@ -0,0 +1,175 @@
+import asyncio
+import time
+from typing import Iterable, List, Optional, Union
+
+from btnl_client.client import OrderEntryClient, SessionDisconnected
+from btnl_client.journal import Direction, JournalReader, JournalRecord
+from btnl_client.protocol import Header, Message
+from btnl_client.timers import VirtualClock
+from btnl_client.websocket import BitnomialWebSocketClient
+
+
+class ReplayWriter:
+    """
+    Stands in for the client's `StreamWriter` and keeps every frame written,
+    so a replayed strategy's orders can be compared against the recording
+    """
+
+    def __init__(self):
+        self.frames: List[bytes] = []
+
+    def write(self, data: bytes):
+        self.frames.append(bytes(data))
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+    def messages(self) -> List[Message]:
+        messages = []
+        for data in self.frames:
+            offset = 0
+            while offset < len(data):
+                end = (
+                    offset
+                    + Header.LEN
+                    + Header.BODY_LENGTH.unpack_from(data, offset + Header.LEN - 2)[0]
+                )
+                messages.append(Message.from_btp(data[offset:end]))
+                offset = end
+        return messages
+
+
+class ReplayEngine:
+    """
+    Feeds a journal back through `OrderEntryClient.handle_btp_message` and
+    `BitnomialWebSocketClient.dispatch`, the same paths live traffic takes.
+
+    Both clients run on a `VirtualClock` that follows the recorded
+    timestamps, so heartbeat and strategy timers fire where they would have
+    during the session. `speed=None` replays as fast as possible, `1.0` in
+    real time and any other value scales the recorded gaps by `1 / speed`.
+
+    Only received traffic is replayed, what the client sends is collected by
+    a `ReplayWriter` on `client.writer`. A disconnect ends one session in the
+    recording and the next frames continue a new one. Clients replayed with
+    a `RateGovernor` should give it `clock=engine.clock.time`. Clients that
+    stamp receive timestamps get the recorded ones.
+    """
+
+    def __init__(
+        self,
+        journal: Union[str, JournalReader, Iterable[JournalRecord]],
+        client: Optional[OrderEntryClient] = None,
+        ws_client: Optional[BitnomialWebSocketClient] = None,
+        speed: Optional[float] = None,
+        heartbeats: bool = True,
+    ):
+        if speed is not None and speed <= 0:
+            raise ValueError(f"Replay speed must be positive, got {speed}")
+        self.journal = JournalReader(journal) if isinstance(journal, str) else journal
+        self.client = client
+        self.ws_client = ws_client
+        self.speed = speed
+        self.heartbeats = heartbeats
+        self.clock = VirtualClock()
+        self.writer = ReplayWriter()
+        self.replayed = 0
+        self.disconnects: List[SessionDisconnected] = []
+        self._start: Optional[float] = None
+        self._wall_start = 0.0
+        if client is not None:
+            client.clock = self.clock
+            client.writer = self.writer
+
+    async def run(self, until_ns: Optional[int] = None) -> int:
+        """
+        Replay every record, or those before `until_ns`, and return how many
+        were replayed
+        """
+        heartbeat = None
+        try:
+            for record in self.journal:
+                if until_ns is not None and record.timestamp_ns >= until_ns:
+                    break
+                now = record.timestamp_ns / 1e9
+                if self._start is None:
+                    heartbeat = await self._begin(now)
+                await self.advance(now)
+                if heartbeat is not None and heartbeat.done():
+                    # Surfaces HeartbeatTimeout like a live session would
+                    heartbeat.result()
+                await self.dispatch(record)
+                self.replayed += 1
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+        return self.replayed
+
+    async def _begin(self, now: float) -> Optional[asyncio.Task]:
+        self._start = now
+        self._wall_start = time.perf_counter()
+        self.clock.now = now
+        client = self.client
+        if client is None:
+            return None
+        client.last_sent_msg_time = now
+        client.last_received_msg_time = now
+        heartbeat = None
+        if self.heartbeats:
+            heartbeat = asyncio.ensure_future(client.heartbeat_loop())
+            # Let it arm its timers before the first record
+            await asyncio.sleep(0)
+        if client.strategy is not None:
+            await client.strategy.on_start()
+        return heartbeat
+
+    async def advance(self, to: float):
+        """
+        Move the virtual clock to `to`, firing due timers one deadline at a
+        time so paced replays also pace them
+        """
+        clock = self.clock
+        while True:
+            deadline = clock.next_deadline()
+            target = to if deadline is None or deadline > to else deadline
+            await self._pace(target)
+            if clock.advance(target):
+                # Timer callbacks may have scheduled tasks, let them run
+                await asyncio.sleep(0)
+            if target >= to:
+                return
+
+    async def _pace(self, target: float):
+        if self.speed is None or self._start is None:
+            return
+        delay = (target - self._start) / self.speed - (
+            time.perf_counter() - self._wall_start
+        )
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def dispatch(self, record: JournalRecord):
+        if record.direction == Direction.BtpIn:
+            if self.client is None:
+                return
+            message = Message.from_btp(bytes(record.data))
+            if self.client.receive_timestamps:
+                message.received_ns = record.timestamp_ns
+            self.client.last_received_msg_time = self.clock.time()
+            try:
+                await self.client.handle_btp_message(message)
+            except SessionDisconnected as e:
+                # Kept without its traceback, which holds this frame and so the
+                # record's view of the journal, stopping the reader closing
+                self.disconnects.append(e.with_traceback(None))
+                self.client.sequence_id = 1
+        elif record.direction == Direction.WsIn:
+            ws_client = self.ws_client
+            if ws_client is not None:
+                received_ns = None
+                if ws_client.receive_timestamps or ws_client.feed_lag is not None:
+                    received_ns = record.timestamp_ns
+                ws_client.dispatch(bytes(record.data).decode(), received_ns)
@@ -0,0 +1,293 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from btnl_client.product import BaseProductSpec
+from btnl_client.protocol import (
+    Ack,
+    Close,
+    Fill,
+    MarketState,
+    MarketStateUpdate,
+    MessageBody,
+    Modify,
+    Open,
+    Reject,
+    RejectReason,
+    Side,
+)
+
+
+class PreTradeReject(ValueError):
+    def __init__(self, reason: RejectReason, body: MessageBody):
+        super().__init__(f"Pre-trade check failed with {reason.name}: {body}")
+        self.reason = reason
+        self.body = body
+
+
+@dataclass(frozen=True)
+class ProductLimits:
+    price_increment: int
+    max_order_quantity: int
+    price_band_variation: int
+    price_limit_percentage: float
+    max_position: Optional[int] = None
+    max_order_notional: Optional[int] = None
+
+    def __post_init__(self):
+        # Prices are checked with `price % price_increment`
+        if self.price_increment <= 0:
+            raise ValueError(f"Bad price increment: {self.price_increment}")
+
+    @staticmethod
+    def from_spec(
+        spec: BaseProductSpec,
+        max_position: Optional[int] = None,
+        max_order_notional: Optional[int] = None,
+    ) -> "ProductLimits":
+        return ProductLimits(
+            spec.price_increment,
+            spec.max_order_quantity,
+            spec.price_band_variation,
+            spec.price_limit_percentage,
+            max_position,
+            max_order_notional,
+        )
+
+
+class WorkingOrder:
+    __slots__ = ("product_id", "side", "price", "quantity", "modifies")
+
+    def __init__(self, product_id: int, side: Side, price: int, quantity: int):
+        self.product_id = product_id
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        # Modifies sent but not acked yet, by modify id, as
+        # (price, quantity, reserved working quantity)
+        self.modifies: Dict[int, Tuple[int, int, int]] = {}
+
+
+class RiskGate:
+    """
+    Client-side pre-trade checks mirroring the exchange's own rejects.
+
+    Limits are precomputed per product from the specs, so each check is a
+    handful of dict lookups and integer comparisons. Reference prices give
+    the price band (`reference +/- price_band_variation`) and, unless set
+    explicitly, the price limits (`reference +/- price_limit_percentage`%).
+    Position limits count the current position plus every working order on
+    the same side, so an order is only let through if it could fill in full.
+    """
+
+    def __init__(
+        self,
+        specs: Iterable[BaseProductSpec] = (),
+        max_position: Optional[int] = None,
+        max_order_notional: Optional[int] = None,
+    ):
+        self.limits: Dict[int, ProductLimits] = {
+            spec.product_id: ProductLimits.from_spec(
+                spec, max_position, max_order_notional
+            )
+            for spec in specs
+        }
+        self.bands: Dict[int, Tuple[int, int]] = {}
+        self.price_limits: Dict[int, Tuple[int, int]] = {}
+        self.market_states: Dict[int, MarketState] = {}
+        self.positions: Dict[int, int] = {}
+        # Per product [working bid quantity, working ask quantity]
+        self.working: Dict[int, list] = {}
+        self.orders: Dict[int, WorkingOrder] = {}
+
+    def set_limits(self, product_id: int, limits: ProductLimits):
+        self.limits[product_id] = limits
+
+    def set_reference_price(self, product_id: int, price: int):
+        limits = self.limits[product_id]
+        band = limits.price_band_variation
+        self.bands[product_id] = (price - band, price + band)
+        if product_id not in self.price_limits:
+            offset = int(abs(price) * limits.price_limit_percentage / 100)
+            self.price_limits[product_id] = (price - offset, price + offset)
+
+    def set_price_limits(self, product_id: int, lower: int, upper: int):
+        self.price_limits[product_id] = (lower, upper)
+
+    def set_market_state(self, product_id: int, state: MarketState):
+        self.market_states[product_id] = state
+
+    def _check_price_quantity(
+        self, product_id: int, limits: ProductLimits, price: int, quantity: int
+    ) -> Optional[RejectReason]:
+        state = self.market_states.get(product_id)
+        if state is MarketState.Halt:
+            return RejectReason.MarketHalted
+        if state is MarketState.Closed:
+            return RejectReason.MarketClosed
+        if quantity > limits.max_order_quantity:
+            return RejectReason.QuantityGreaterThanMaxOrderSize
+        if quantity <= 0:
+            return RejectReason.QuantityLessThanMinOrderSize
+        if price % limits.price_increment:
+            return RejectReason.PriceNotTickAligned
+        price_limits = self.price_limits.get(product_id)
+        if price_limits is not None and not (
+            price_limits[0] <= price <= price_limits[1]
+        ):
+            return RejectReason.PriceOutsidePriceLimits
+        band = self.bands.get(product_id)
+        if band is not None and not (band[0] <= price <= band[1]):
+            return RejectReason.PriceOutsidePriceBands
+        if (
+            limits.max_order_notional is not None
+            and abs(price) * quantity > limits.max_order_notional
+        ):
+            return RejectReason.PositionLimitExceeded
+        return None
+
+    def _exceeds_position(
+        self, product_id: int, limits: ProductLimits, side: Side, added: int
+    ) -> bool:
+        if limits.max_position is None:
+            return False
+        position = self.positions.get(product_id, 0)
+        working = self.working.get(product_id)
+        if side is Side.Bid:
+            exposure = position + (working[0] if working else 0) + added
+        else:
+            exposure = -position + (working[1] if working else 0) + added
+        return exposure > limits.max_position
+
+    def check_open(
+        self, order_id: int, product_id: int, side: Side, price: int, quantity: int
+    ) -> Optional[RejectReason]:
+        """
+        Check an order and, if it passes, reserve its quantity as working
+        """
+        limits = self.limits.get(product_id)
+        if limits is None:
+            return RejectReason.ProductNotFound
+        if order_id in self.orders:
+            return RejectReason.OrderAlreadyExists
+        reason = self._check_price_quantity(product_id, limits, price, quantity)
+        if reason is not None:
+            return reason
+        if self._exceeds_position(product_id, limits, side, quantity):
+            return RejectReason.PositionLimitExceeded
+        self.orders[order_id] = WorkingOrder(product_id, side, price, quantity)
+        self._add_working(product_id, side, quantity)
+        return None
+
+    def check_modify(
+        self, order_id: int, modify_id: int, price: int, quantity: int
+    ) -> Optional[RejectReason]:
+        """
+        Check a modify and, if it passes, stage it until its Ack. Only an
+        increase in quantity is reserved as working meanwhile.
+        """
+        order = self.orders.get(order_id)
+        if order is None:
+            return RejectReason.OrderNotFound
+        if quantity == 0:
+            # A cancel only ever reduces risk
+            order.modifies[modify_id] = (price, quantity, 0)
+            return None
+        limits = self.limits[order.product_id]
+        reason = self._check_price_quantity(order.product_id, limits, price, quantity)
+        if reason is not None:
+            return reason
+        added = quantity - order.quantity
+        if added > 0 and self._exceeds_position(
+            order.product_id, limits, order.side, added
+        ):
+            return RejectReason.PositionLimitExceeded
+        reserved = max(added, 0)
+        self._add_working(order.product_id, order.side, reserved)
+        order.modifies[modify_id] = (price, quantity, reserved)
+        return None
+
+    def check(self, body: MessageBody) -> Optional[RejectReason]:
+        if isinstance(body, Open):
+            return self.check_open(
+                body.order_id, body.product_id, body.side, body.price, body.quantity
+            )
+        if isinstance(body, Modify):
+            return self.check_modify(
+                body.order_id, body.modify_id, body.price, body.quantity
+            )
+        return None
+
+    def release(self, body: MessageBody):
+        """
+        Undo what a passed `check` reserved, for a body that was not sent
+        after all
+        """
+        if isinstance(body, Open):
+            self._remove_order(body.order_id)
+        elif isinstance(body, Modify):
+            self._unstage(body.order_id, body.modify_id)
+
+    def _unstage(self, order_id: int, modify_id: int) -> Optional[Tuple[int, int]]:
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+        staged = order.modifies.pop(modify_id, None)
+        if staged is None:
+            return None
+        price, quantity, reserved = staged
+        self._add_working(order.product_id, order.side, -reserved)
+        return price, quantity
+
+    def _add_working(self, product_id: int, side: Side, quantity: int):
+        working = self.working.get(product_id)
+        if working is None:
+            working = self.working[product_id] = [0, 0]
+        working[0 if side is Side.Bid else 1] += quantity
+
+    def _remove_order(self, order_id: int):
+        order = self.orders.pop(order_id, None)
+        if order is not None:
+            reserved = sum(staged[2] for staged in order.modifies.values())
+            self._add_working(order.product_id, order.side, -order.quantity - reserved)
+
+    def on_message(self, body: MessageBody):
+        """
+        Track fills, acks, closes, rejects and market state from incoming messages
+        """
+        if isinstance(body, Fill):
+            order = self.orders.get(body.order_id)
+            if order is None:
+                return
+            signed = body.quantity if order.side is Side.Bid else -body.quantity
+            self.positions[order.product_id] = (
+                self.positions.get(order.product_id, 0) + signed
+            )
+            filled = min(body.quantity, order.quantity)
+            order.quantity -= filled
+            self._add_working(order.product_id, order.side, -filled)
+            if order.quantity == 0:
+                del self.orders[body.order_id]
+        elif isinstance(body, Ack):
+            if body.modify_id is None:
+                return
+            order = self.orders.get(body.order_id)
+            modified = self._unstage(body.order_id, body.modify_id)
+            if modified is not None:
+                order.price, quantity = modified
+                self._add_working(
+                    order.product_id, order.side, quantity - order.quantity
+                )
+                order.quantity = quantity
+        elif isinstance(body, Close):
+            self._remove_order(body.order_id)
+        elif isinstance(body, Reject):
+            # A rejected modify leaves the original order working
+            if body.modify_id is None or body.reject_reason in (
+                RejectReason.OrderNotFound,
+                RejectReason.OrderAlreadyClosed,
+            ):
+                self._remove_order(body.order_id)
+            else:
+                self._unstage(body.order_id, body.modify_id)
+        elif isinstance(body, MarketStateUpdate):
+            self.market_states[body.product_id] = body.market_state
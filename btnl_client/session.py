@@ -0,0 +1,170 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+from btnl_client.client import LoginRejected, OrderEntryClient, SessionDisconnected
+from btnl_client.product import AuthBitnomialHttpClient, OrderStatus, Pagination
+from btnl_client.protocol import (
+    Ack,
+    Close,
+    Fill,
+    Liquidity,
+    LoginRejectReason,
+    new_message,
+)
+from btnl_client.store import page_cursor
+
+LIQUIDITY = {
+    "Add": Liquidity.Add,
+    "Remove": Liquidity.Remove,
+    "SpreadLeg": Liquidity.SpreadLegMatch,
+}
+
+
+class SupervisedOrderEntryClient(OrderEntryClient):
+    """
+    Order entry client that reconnects with exponential backoff when the
+    session drops and reconciles order state over HTTP afterwards.
+
+    Fills missed while disconnected are replayed through `handle_btp_message`
+    as if they had arrived on the wire, so the risk gate, the market state
+    registry and `app_message` all see them. Working orders are handed to
+    `on_reconcile`. An unauthorized login is not retried. Futures waiting on
+    an Ack when the session drops fail with the error that ended it.
+    """
+
+    def __init__(
+        self,
+        host,
+        port,
+        connection_id,
+        hex_auth_token,
+        http_client: Optional[AuthBitnomialHttpClient] = None,
+        initial_backoff: float = 0.05,
+        max_backoff: float = 5.0,
+        already_logged_in_backoff: float = 1.0,
+        **kwargs,
+    ):
+        super().__init__(host, port, connection_id, hex_auth_token, **kwargs)
+        self.http_client = http_client
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.already_logged_in_backoff = already_logged_in_backoff
+        self.last_ack_id = 0
+        self.reconnects = 0
+        self.disconnected_at: Optional[datetime] = None
+        # When the last message before the drop arrived. Missed fills are
+        # fetched from here, the drop itself is only noticed up to a receive
+        # timeout later.
+        self.last_received_at: Optional[datetime] = None
+        self.stopped = False
+
+    async def handle_btp_message(self, message):
+        if isinstance(message.body, (Ack, Fill, Close)):
+            self.last_ack_id = max(self.last_ack_id, message.body.ack_id)
+        await super().handle_btp_message(message)
+
+    async def run(self):
+        backoff = self.initial_backoff
+        while not self.stopped:
+            try:
+                await self.connect()
+                backoff = self.initial_backoff
+                if self.disconnected_at is not None:
+                    self.reconnects += 1
+                    await self.reconcile()
+                await self.run_loops()
+            except LoginRejected as e:
+                if e.reason == LoginRejectReason.Unauthorized:
+                    raise
+                print(f"Login rejected, retrying: {e}")
+                if e.reason == LoginRejectReason.AlreadyLoggedIn:
+                    # The exchange has not dropped the previous session yet
+                    backoff = max(backoff, self.already_logged_in_backoff)
+            except (SessionDisconnected, asyncio.IncompleteReadError, OSError) as e:
+                print(f"Session lost, reconnecting: {e!r}")
+                self.fail_pending(e)
+            if self.disconnected_at is None:
+                self.disconnected_at = datetime.now(timezone.utc)
+                if self.last_received_msg_time:
+                    silent = self.clock.time() - self.last_received_msg_time
+                    self.last_received_at = self.disconnected_at - timedelta(
+                        seconds=silent
+                    )
+            self.close_writer()
+            if self.stopped:
+                break
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def close_writer(self):
+        writer = getattr(self, "writer", None)
+        if writer is not None:
+            writer.close()
+
+    async def reconcile(self):
+        if self.http_client is None:
+            self.disconnected_at = None
+            return
+        loop = asyncio.get_running_loop()
+        orders = await loop.run_in_executor(
+            None,
+            partial(
+                fetch_all,
+                self.http_client.get_orders,
+                connection_ids=[self.connection_id],
+            ),
+        )
+        fills = await loop.run_in_executor(
+            None,
+            partial(
+                fetch_all,
+                self.http_client.get_fills,
+                connection_ids=[self.connection_id],
+                begin_time=self.last_received_at,
+            ),
+        )
+        self.disconnected_at = None
+        self.last_received_at = None
+        # The window starts at the last message received, anything already
+        # seen is told apart by its ack id
+        missed_fills = sorted(
+            (f for f in fills if f["ack_id"] > self.last_ack_id),
+            key=lambda f: f["ack_id"],
+        )
+        for fill in missed_fills:
+            body = Fill(
+                fill["ack_id"],
+                fill["order_id"],
+                fill["price"],
+                fill["quantity_filled"],
+                LIQUIDITY[fill["liquidity"]],
+            )
+            await self.handle_btp_message(new_message(0, body))
+        working = [o for o in orders if o["status"] == OrderStatus.Working.value]
+        await self.on_reconcile(working, missed_fills)
+
+    async def on_reconcile(self, working_orders: List[Dict], missed_fills: List[Dict]):
+        # Implement rebuilding of local order state here
+        print(f"Reconciled {len(working_orders)} working orders")
+        print(f"Replayed {len(missed_fills)} missed fills")
+
+    def stop(self):
+        self.stopped = True
+        super().stop()
+
+
+def fetch_all(fetch: Callable[..., Pagination], **filters) -> List[Dict]:
+    """
+    Every row of a paginated HTTP feed, following the cursor until it ends
+    """
+    rows: List[Dict] = []
+    cursor = None
+    while True:
+        page = fetch(cursor=cursor, **filters)
+        rows.extend(page.data)
+        next_cursor = page_cursor(page)
+        if not page.data or not next_cursor or next_cursor == cursor:
+            return rows
+        cursor = next_cursor
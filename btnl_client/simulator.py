@@ -0,0 +1,571 @@
+import asyncio
+import bisect
+import collections
+import random
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from btnl_client.protocol import (
+    Ack,
+    BodyEncoding,
+    Close,
+    CloseReason,
+    Disconnect,
+    DisconnectReason,
+    Fill,
+    Heartbeat,
+    Liquidity,
+    LoginAck,
+    LoginReject,
+    LoginRejectReason,
+    LoginRequest,
+    LogoutRequest,
+    MarketState,
+    MarketStateUpdate,
+    Message,
+    MessageBody,
+    Modify,
+    Open,
+    Reject,
+    RejectReason,
+    Side,
+    TimeInForce,
+    new_message,
+)
+from btnl_client.rate_limit import TokenBucket
+
+
+@dataclass
+class SimOrder:
+    connection_id: int
+    order_id: int
+    product_id: int
+    side: Side
+    price: int
+    quantity: int
+    time_in_force: TimeInForce
+
+
+class OrderBook:
+    """
+    Price-time priority book for one product. Each price level is a FIFO
+    queue and the prices of each side are kept sorted ascending.
+    """
+
+    def __init__(self, product_id: int):
+        self.product_id = product_id
+        self.levels: Dict[Side, Dict[int, Deque[SimOrder]]] = {
+            Side.Bid: {},
+            Side.Ask: {},
+        }
+        self.prices: Dict[Side, List[int]] = {Side.Bid: [], Side.Ask: []}
+
+    def best(self, side: Side) -> Optional[int]:
+        prices = self.prices[side]
+        if not prices:
+            return None
+        return prices[-1] if side == Side.Bid else prices[0]
+
+    def depth(self, side: Side, levels: int) -> List[Tuple[int, int]]:
+        """
+        `(price, total quantity)` of the best `levels` levels of `side`
+        """
+        prices = self.prices[side]
+        prices = prices[::-1] if side == Side.Bid else prices
+        return [
+            (price, sum(order.quantity for order in self.levels[side][price]))
+            for price in prices[:levels]
+        ]
+
+    def add(self, order: SimOrder):
+        level = self.levels[order.side].get(order.price)
+        if level is None:
+            level = self.levels[order.side][order.price] = collections.deque()
+            bisect.insort(self.prices[order.side], order.price)
+        level.append(order)
+
+    def remove(self, order: SimOrder):
+        level = self.levels[order.side][order.price]
+        level.remove(order)
+        if not level:
+            self._drop_level(order.side, order.price)
+
+    def _drop_level(self, side: Side, price: int):
+        del self.levels[side][price]
+        prices = self.prices[side]
+        del prices[bisect.bisect_left(prices, price)]
+
+    def match(self, order: SimOrder) -> List[Tuple[SimOrder, int, int]]:
+        """
+        Match `order` against the opposite side, returning the
+        `(resting order, price, quantity)` of every fill. Resting orders of
+        the same connection are cancelled rather than traded against and
+        come back with a quantity of 0.
+        """
+        side = Side.Ask if order.side == Side.Bid else Side.Bid
+        fills = []
+        while order.quantity > 0:
+            price = self.best(side)
+            if price is None:
+                break
+            if order.side == Side.Bid and price > order.price:
+                break
+            if order.side == Side.Ask and price < order.price:
+                break
+            level = self.levels[side][price]
+            while level and order.quantity > 0:
+                resting = level[0]
+                if resting.connection_id == order.connection_id:
+                    level.popleft()
+                    resting.quantity = 0
+                    fills.append((resting, price, 0))
+                    continue
+                quantity = min(resting.quantity, order.quantity)
+                resting.quantity -= quantity
+                order.quantity -= quantity
+                fills.append((resting, price, quantity))
+                if resting.quantity == 0:
+                    level.popleft()
+            if not level:
+                self._drop_level(side, price)
+        return fills
+
+
+class SimSession:
+    """
+    One logged in connection. Outgoing frames are buffered while a message
+    is handled and written in one go, after `latency` if one is injected.
+    """
+
+    def __init__(self, simulator: "ExchangeSimulator", connection_id: int, writer):
+        self.simulator = simulator
+        self.connection_id = connection_id
+        self.writer = writer
+        self.heartbeat_interval = 0
+        self.expected_sequence_id = 1
+        self.sequence_id = 1
+        loop = asyncio.get_running_loop()
+        self.last_received = loop.time()
+        self.last_sent = loop.time()
+        self.buffer = bytearray()
+        self.bucket = (
+            TokenBucket(simulator.rate, simulator.burst)
+            if simulator.rate is not None
+            else None
+        )
+        self.delayed: Optional[asyncio.Queue] = None
+        self._last_due = 0.0
+
+    def send(self, body: MessageBody):
+        if body.body_encoding == BodyEncoding.Heartbeat:
+            sequence_id = 0
+        else:
+            sequence_id = self.sequence_id
+            self.sequence_id += 1
+        self.buffer += new_message(sequence_id, body).to_btp()
+        self.simulator.messages_out += 1
+
+    def flush(self):
+        if not self.buffer:
+            return
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        loop = asyncio.get_running_loop()
+        self.last_sent = loop.time()
+        simulator = self.simulator
+        if not simulator.latency and not simulator.latency_jitter:
+            self.writer.write(data)
+            return
+        if self.delayed is None:
+            self.delayed = asyncio.Queue()
+            loop.create_task(self._write_delayed())
+        delay = simulator.latency + random.uniform(0, simulator.latency_jitter)
+        # Jitter never reorders frames
+        self._last_due = max(self._last_due, self.last_sent + delay)
+        self.delayed.put_nowait((self._last_due, data))
+
+    async def _write_delayed(self):
+        loop = asyncio.get_running_loop()
+        assert self.delayed is not None
+        while True:
+            due, data = await self.delayed.get()
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if data is None or self.writer.is_closing():
+                self.writer.close()
+                return
+            self.writer.write(data)
+
+    def close(self):
+        """
+        Close the connection once everything sent so far is written
+        """
+        if self.delayed is None:
+            self.writer.close()
+        else:
+            self.delayed.put_nowait((self._last_due, None))
+
+
+class ExchangeSimulator:
+    """
+    Local stand-in for the BTP order entry gateway, for running clients
+    and load tests without the real exchange.
+
+    It answers logins, checks sequence ids and heartbeats and disconnects
+    on faults the way the exchange does, and runs a price-time priority
+    matching engine per product. `products` limits which product ids are
+    accepted, `credentials` maps connection ids to their auth tokens, `rate`
+    and `burst` set the per connection messaging rate limit and `latency`
+    plus up to `latency_jitter` seconds are added to every response.
+    """
+
+    def __init__(
+        self,
+        products: Optional[Iterable[int]] = None,
+        credentials: Optional[Dict[int, bytes]] = None,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        disconnect_on_rate_limit: bool = False,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        heartbeat_timeout_factor: float = 1.5,
+    ):
+        self.products = set(products) if products is not None else None
+        self.credentials = credentials
+        self.rate = rate
+        self.burst = burst
+        self.disconnect_on_rate_limit = disconnect_on_rate_limit
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.heartbeat_timeout_factor = heartbeat_timeout_factor
+        self.books: Dict[int, OrderBook] = {}
+        self.market_states: Dict[int, MarketState] = {}
+        self.sessions: Dict[int, SimSession] = {}
+        self.orders: Dict[Tuple[int, int], SimOrder] = {}
+        self.modify_ids: Set[Tuple[int, int]] = set()
+        self.next_ack_id = 1
+        self.messages_in = 0
+        self.messages_out = 0
+        self.fills = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+    @property
+    def port(self) -> int:
+        assert self.server is not None
+        return self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 11000):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for session in list(self.sessions.values()):
+            session.writer.close()
+
+    def ack_id(self) -> int:
+        ack_id = self.next_ack_id
+        self.next_ack_id += 1
+        return ack_id
+
+    def book(self, product_id: int) -> OrderBook:
+        book = self.books.get(product_id)
+        if book is None:
+            book = self.books[product_id] = OrderBook(product_id)
+        return book
+
+    def set_market_state(self, product_id: int, state: MarketState):
+        """
+        Change a product's state and tell every session. Closing the market
+        cancels its resting orders.
+        """
+        self.market_states[product_id] = state
+        update = MarketStateUpdate(state, self.ack_id(), product_id)
+        for session in self.sessions.values():
+            session.send(update)
+        if state == MarketState.Closed:
+            book = self.book(product_id)
+            for side in (Side.Bid, Side.Ask):
+                for level in list(book.levels[side].values()):
+                    for order in list(level):
+                        self._close(order, CloseReason.NonConnectionCancel)
+        for session in self.sessions.values():
+            session.flush()
+
+    # Connections
+
+    async def handle_connection(self, reader, writer):
+        session = None
+        try:
+            session = await self.login(reader, writer)
+            if session is None:
+                return
+            heartbeat = asyncio.ensure_future(self.heartbeat_loop(session))
+            try:
+                while True:
+                    frame = await Message.read_frame(reader)
+                    session.last_received = asyncio.get_running_loop().time()
+                    self.messages_in += 1
+                    try:
+                        message = Message.from_btp(frame)
+                    except (ValueError, AssertionError):
+                        self.disconnect(session, DisconnectReason.ParseFailure)
+                        return
+                    if not self.handle_message(session, message):
+                        return
+                    session.flush()
+            finally:
+                heartbeat.cancel()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if session is None:
+                writer.close()
+            else:
+                if self.sessions.get(session.connection_id) is session:
+                    self.logout(session)
+                session.close()
+
+    async def login(self, reader, writer) -> Optional[SimSession]:
+        message = Message.from_btp(await Message.read_frame(reader))
+        self.messages_in += 1
+        request = message.body
+        reason = None
+        if not isinstance(request, LoginRequest):
+            reason = LoginRejectReason.NoReqReceived
+        elif self.credentials is not None and (
+            self.credentials.get(request.connection_id) != request.auth_token
+        ):
+            reason = LoginRejectReason.Unauthorized
+        elif request.connection_id in self.sessions:
+            reason = LoginRejectReason.AlreadyLoggedIn
+        if reason is not None:
+            writer.write(new_message(1, LoginReject(reason)).to_btp())
+            self.messages_out += 1
+            await writer.drain()
+            return None
+        assert isinstance(request, LoginRequest)
+        if request.heartbeat_interval <= 0:
+            # Heartbeat deadlines would all be due at once. No login reject
+            # reason covers a bad field, so it is treated as unparseable.
+            disconnect = Disconnect(DisconnectReason.ParseFailure, None, None)
+            writer.write(new_message(1, disconnect).to_btp())
+            self.messages_out += 1
+            await writer.drain()
+            return None
+        session = SimSession(self, request.connection_id, writer)
+        session.heartbeat_interval = request.heartbeat_interval
+        session.expected_sequence_id = message.header.sequence_id + 1
+        session.send(LoginAck())
+        session.flush()
+        self.sessions[session.connection_id] = session
+        return session
+
+    def logout(self, session: SimSession, persist_orders: bool = False):
+        # Orders do not outlive their session unless asked to
+        del self.sessions[session.connection_id]
+        if persist_orders:
+            return
+        for key, order in list(self.orders.items()):
+            if key[0] == session.connection_id:
+                self.book(order.product_id).remove(order)
+                del self.orders[key]
+
+    def disconnect(self, session: SimSession, reason: DisconnectReason, actual=None):
+        expected = None
+        if reason == DisconnectReason.SequenceIdFault:
+            expected = session.expected_sequence_id
+        session.send(Disconnect(reason, expected, actual))
+        session.flush()
+        session.close()
+
+    async def heartbeat_loop(self, session: SimSession):
+        loop = asyncio.get_running_loop()
+        interval = session.heartbeat_interval
+        timeout = interval * self.heartbeat_timeout_factor
+        while True:
+            now = loop.time()
+            if now >= session.last_received + timeout:
+                self.disconnect(session, DisconnectReason.HeartbeatFault)
+                return
+            if now >= session.last_sent + interval:
+                session.send(Heartbeat())
+                session.flush()
+            await asyncio.sleep(
+                min(session.last_sent + interval, session.last_received + timeout)
+                - loop.time()
+            )
+
+    def handle_message(self, session: SimSession, message: Message) -> bool:
+        """
+        Handle one message from `session`, returning False once it has been
+        disconnected
+        """
+        body = message.body
+        if isinstance(body, Heartbeat):
+            return True
+        sequence_id = message.header.sequence_id
+        if sequence_id != session.expected_sequence_id:
+            self.disconnect(session, DisconnectReason.SequenceIdFault, sequence_id)
+            return False
+        session.expected_sequence_id += 1
+        if session.bucket is not None and not session.bucket.try_take():
+            if self.disconnect_on_rate_limit:
+                self.disconnect(session, DisconnectReason.MessagingRateExceeded)
+                return False
+            if isinstance(body, (Open, Modify)):
+                session.send(
+                    Reject(
+                        body.order_id,
+                        getattr(body, "modify_id", None),
+                        RejectReason.MessagingRateExceeded,
+                    )
+                )
+            return True
+        if isinstance(body, Open):
+            self.open(session, body)
+        elif isinstance(body, Modify):
+            self.modify(session, body)
+        elif isinstance(body, LogoutRequest):
+            # BTP has no logout response, the request is acknowledged by
+            # writing out everything before it and closing without a
+            # Disconnect
+            self.logout(session, body.persist_orders == "Y")
+            session.flush()
+            session.close()
+            return False
+        else:
+            self.disconnect(session, DisconnectReason.ParseFailure)
+            return False
+        return True
+
+    # Matching
+
+    def _reject_market(self, product_id: int) -> Optional[RejectReason]:
+        state = self.market_states.get(product_id, MarketState.Open)
+        if state == MarketState.Halt:
+            return RejectReason.MarketHalted
+        if state == MarketState.Closed:
+            return RejectReason.MarketClosed
+        return None
+
+    def open(self, session: SimSession, body: Open):
+        key = (session.connection_id, body.order_id)
+        reason = None
+        if self.products is not None and body.product_id not in self.products:
+            reason = RejectReason.ProductNotFound
+        elif key in self.orders:
+            reason = RejectReason.OrderAlreadyExists
+        elif body.quantity <= 0:
+            reason = RejectReason.QuantityLessThanMinOrderSize
+        else:
+            reason = self._reject_market(body.product_id)
+        if reason is not None:
+            session.send(Reject(body.order_id, None, reason))
+            return
+        order = SimOrder(
+            session.connection_id,
+            body.order_id,
+            body.product_id,
+            body.side,
+            body.price,
+            body.quantity,
+            body.time_in_force,
+        )
+        session.send(Ack(self.ack_id(), body.order_id, None))
+        self._execute(order)
+
+    def modify(self, session: SimSession, body: Modify):
+        key = (session.connection_id, body.order_id)
+        order = self.orders.get(key)
+        reason = None
+        if order is None:
+            reason = RejectReason.OrderNotFound
+        elif (session.connection_id, body.modify_id) in self.modify_ids:
+            reason = RejectReason.OrderAlreadyExists
+        elif body.price == order.price and body.quantity == order.quantity:
+            reason = RejectReason.OrderNotChangedByModify
+        elif body.quantity != 0:
+            # Cancels are accepted whatever the market state
+            reason = self._reject_market(order.product_id)
+        if reason is not None:
+            session.send(Reject(body.order_id, body.modify_id, reason))
+            return
+        assert order is not None
+        self.modify_ids.add((session.connection_id, body.modify_id))
+        session.send(Ack(self.ack_id(), body.order_id, body.modify_id))
+        book = self.book(order.product_id)
+        if body.quantity == 0:
+            # There is no close reason for a cancel by the order's own
+            # connection, the generic cancel reason is used
+            self._close(order, CloseReason.NonConnectionCancel)
+        elif body.price == order.price and body.quantity < order.quantity:
+            # Reducing quantity keeps time priority
+            order.quantity = body.quantity
+        else:
+            book.remove(order)
+            del self.orders[key]
+            order.price = body.price
+            order.quantity = body.quantity
+            self._execute(order)
+
+    def _execute(self, order: SimOrder):
+        book = self.book(order.product_id)
+        session = self.sessions[order.connection_id]
+        for resting, price, quantity in book.match(order):
+            owner = self.sessions.get(resting.connection_id)
+            if quantity == 0:
+                del self.orders[(resting.connection_id, resting.order_id)]
+                if owner is not None:
+                    owner.send(
+                        Close(
+                            self.ack_id(),
+                            resting.order_id,
+                            CloseReason.SelfMatchPreventionCanceled,
+                        )
+                    )
+                continue
+            self.fills += 1
+            session.send(
+                Fill(self.ack_id(), order.order_id, price, quantity, Liquidity.Remove)
+            )
+            if owner is not None:
+                owner.send(
+                    Fill(
+                        self.ack_id(),
+                        resting.order_id,
+                        price,
+                        quantity,
+                        Liquidity.Add,
+                    )
+                )
+                if owner is not session:
+                    owner.flush()
+            if resting.quantity == 0:
+                del self.orders[(resting.connection_id, resting.order_id)]
+        if order.quantity == 0:
+            return
+        if order.time_in_force == TimeInForce.IOC:
+            session.send(Close(self.ack_id(), order.order_id, CloseReason.IOCFinished))
+            return
+        book.add(order)
+        self.orders[(order.connection_id, order.order_id)] = order
+
+    def _close(self, order: SimOrder, reason: CloseReason):
+        self.book(order.product_id).remove(order)
+        del self.orders[(order.connection_id, order.order_id)]
+        session = self.sessions.get(order.connection_id)
+        if session is not None:
+            session.send(Close(self.ack_id(), order.order_id, reason))
+
+
+if __name__ == "__main__":
+    asyncio.run(ExchangeSimulator().serve_forever())
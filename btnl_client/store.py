@@ -0,0 +1,309 @@
+import json
+import sqlite3
+from typing import Callable, Dict, List, Optional
+
+from btnl_client.product import AuthBitnomialHttpClient, Ordering, Pagination
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fills (
+    ack_id INTEGER NOT NULL,
+    order_id INTEGER NOT NULL,
+    symbol TEXT,
+    account_id TEXT,
+    product_id INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (ack_id, order_id)
+);
+CREATE INDEX IF NOT EXISTS fills_order_id ON fills (order_id);
+CREATE INDEX IF NOT EXISTS fills_symbol ON fills (symbol);
+CREATE INDEX IF NOT EXISTS fills_account_id ON fills (account_id);
+
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    open_ack_id INTEGER,
+    symbol TEXT,
+    account_id TEXT,
+    status TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS orders_open_ack_id ON orders (open_ack_id);
+CREATE INDEX IF NOT EXISTS orders_symbol ON orders (symbol);
+CREATE INDEX IF NOT EXISTS orders_account_id ON orders (account_id);
+
+CREATE TABLE IF NOT EXISTS block_trades (
+    block_trade_id INTEGER PRIMARY KEY,
+    ack_id INTEGER,
+    symbol TEXT,
+    account_id TEXT,
+    status TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS block_trades_symbol ON block_trades (symbol);
+CREATE INDEX IF NOT EXISTS block_trades_account_id ON block_trades (account_id);
+
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name TEXT PRIMARY KEY,
+    cursor TEXT,
+    ack_id INTEGER
+);
+"""
+
+
+def page_cursor(page: Pagination) -> Optional[str]:
+    pagination = page.pagination
+    if isinstance(pagination, dict):
+        return pagination.get("cursor")
+    return getattr(pagination, "cursor", None)
+
+
+class LocalStore:
+    """
+    SQLite store of fills, orders and block trades as returned by the HTTP API.
+
+    Rows keep the original JSON alongside the indexed columns, so queries
+    return the same dicts `AuthBitnomialHttpClient` would.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def upsert_fills(self, fills: List[Dict]):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO fills VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    fill["ack_id"],
+                    fill["order_id"],
+                    fill.get("symbol"),
+                    fill.get("account_id"),
+                    fill.get("product_id"),
+                    json.dumps(fill, default=str),
+                )
+                for fill in fills
+            ],
+        )
+
+    def upsert_orders(self, orders: List[Dict]):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO orders VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    order["id"],
+                    order.get("open_ack_id"),
+                    order.get("symbol"),
+                    order.get("account_id"),
+                    order.get("status"),
+                    json.dumps(order, default=str),
+                )
+                for order in orders
+            ],
+        )
+
+    def upsert_block_trades(self, block_trades: List[Dict]):
+        self.db.executemany(
+            "INSERT OR REPLACE INTO block_trades VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    block_trade["block_trade_id"],
+                    block_trade.get("ack_id"),
+                    block_trade.get("symbol"),
+                    block_trade.get("account_id"),
+                    block_trade.get("status"),
+                    json.dumps(block_trade, default=str),
+                )
+                for block_trade in block_trades
+            ],
+        )
+
+    def checkpoint(self, name: str):
+        row = self.db.execute(
+            "SELECT cursor, ack_id FROM checkpoints WHERE name = ?", (name,)
+        ).fetchone()
+        return row if row is not None else (None, None)
+
+    def save_checkpoint(self, name: str, cursor: Optional[str], ack_id: Optional[int]):
+        self.db.execute(
+            "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)",
+            (name, cursor, ack_id),
+        )
+
+    def commit(self):
+        self.db.commit()
+
+    def _select(self, table: str, filters: Dict[str, object], order_by: str):
+        clauses = [f"{column} = ?" for column, v in filters.items() if v is not None]
+        args = [v for v in filters.values() if v is not None]
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        rows = self.db.execute(
+            f"SELECT data FROM {table}{where} ORDER BY {order_by}", args
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    def fills(
+        self, order_id=None, ack_id=None, symbol=None, account_id=None
+    ) -> List[Dict]:
+        return self._select(
+            "fills",
+            {
+                "order_id": order_id,
+                "ack_id": ack_id,
+                "symbol": symbol,
+                "account_id": account_id,
+            },
+            "ack_id",
+        )
+
+    def orders(
+        self, order_id=None, open_ack_id=None, symbol=None, account_id=None, status=None
+    ) -> List[Dict]:
+        return self._select(
+            "orders",
+            {
+                "id": order_id,
+                "open_ack_id": open_ack_id,
+                "symbol": symbol,
+                "account_id": account_id,
+                "status": status,
+            },
+            "id",
+        )
+
+    def order(self, order_id) -> Optional[Dict]:
+        orders = self.orders(order_id=order_id)
+        return orders[0] if orders else None
+
+    def block_trades(
+        self, block_trade_id=None, symbol=None, account_id=None, status=None
+    ) -> List[Dict]:
+        return self._select(
+            "block_trades",
+            {
+                "block_trade_id": block_trade_id,
+                "symbol": symbol,
+                "account_id": account_id,
+                "status": status,
+            },
+            "block_trade_id",
+        )
+
+
+def checkpoint_name(name: str, filters: Dict) -> str:
+    """
+    Checkpoint key of one feed synced with `filters`, so differently
+    filtered syncs keep separate cursors
+    """
+    if not filters:
+        return name
+    return name + json.dumps(filters, sort_keys=True, default=str)
+
+
+def order_working(order: Dict) -> bool:
+    return order.get("status") == "Working"
+
+
+class SyncEngine:
+    """
+    Pulls fills, orders and block trades into a `LocalStore`, resuming each
+    feed from the cursor checkpointed by the previous sync with the same
+    filters.
+
+    Orders still change after they are first synced, so the orders
+    checkpoint stays at the first page holding a Working order and later
+    syncs read it again until the order has closed.
+    """
+
+    def __init__(
+        self, client: AuthBitnomialHttpClient, store: LocalStore, page_limit=1000
+    ):
+        self.client = client
+        self.store = store
+        self.page_limit = page_limit
+
+    def sync_fills(self, **filters) -> int:
+        return self._sync(
+            "fills", self.client.get_fills, self.store.upsert_fills, filters, "ack_id"
+        )
+
+    def sync_orders(self, **filters) -> int:
+        return self._sync(
+            "orders",
+            self.client.get_orders,
+            self.store.upsert_orders,
+            filters,
+            "open_ack_id",
+            order_working,
+        )
+
+    def sync_block_trades(self, **filters) -> int:
+        # Block trades carry no ack id, only the cursor is checkpointed
+        return self._sync(
+            "block_trades",
+            self.client.get_block_trades,
+            self.store.upsert_block_trades,
+            filters,
+        )
+
+    def sync(self, **filters) -> Dict[str, int]:
+        return {
+            "fills": self.sync_fills(**filters),
+            "orders": self.sync_orders(**filters),
+            "block_trades": self.sync_block_trades(**filters),
+        }
+
+    def _sync(
+        self,
+        name: str,
+        fetch: Callable[..., Pagination],
+        upsert: Callable[[List[Dict]], None],
+        filters: Dict,
+        ack_key: Optional[str] = None,
+        unsettled: Optional[Callable[[Dict], bool]] = None,
+    ) -> int:
+        """
+        Page through one feed from its checkpoint and return the number of
+        rows fetched. Rows for which `unsettled` is true hold the checkpoint
+        at the page they were read from.
+        """
+        name = checkpoint_name(name, filters)
+        cursor, last_ack_id = self.store.checkpoint(name)
+        held = False
+        held_cursor = None
+        synced = 0
+        while True:
+            page = fetch(
+                order=Ordering.Asc, limit=self.page_limit, cursor=cursor, **filters
+            )
+            rows = page.data
+            if rows:
+                upsert(rows)
+                synced += len(rows)
+                if ack_key is not None:
+                    ack_ids = [r[ack_key] for r in rows if r.get(ack_key) is not None]
+                    if ack_ids:
+                        last_ack_id = max(ack_ids + [last_ack_id or 0])
+                if not held and unsettled is not None and any(map(unsettled, rows)):
+                    held = True
+                    held_cursor = cursor
+            next_cursor = page_cursor(page)
+            # Each page is committed with its checkpoint so an interrupted sync
+            # resumes from the last complete page
+            self.store.save_checkpoint(
+                name, held_cursor if held else next_cursor or cursor, last_ack_id
+            )
+            self.store.commit()
+            # The server may cap `limit`, so only an empty page or the end of
+            # the cursors ends the sync
+            if not rows or not next_cursor or next_cursor == cursor:
+                return synced
+            cursor = next_cursor
+
+
+# Example use:
+# client = AuthBitnomialHttpClient(connection_id, auth_token)
+# store = LocalStore("btnl.sqlite")
+# SyncEngine(client, store).sync()
+# print(store.fills(symbol="BUIH4"))
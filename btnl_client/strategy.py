@@ -0,0 +1,134 @@
+import asyncio
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Set, Type, Union
+
+from btnl_client.protocol import (
+    Ack,
+    Close,
+    Fill,
+    MarketStateUpdate,
+    MessageBody,
+    Reject,
+)
+from btnl_client.protocol.pricefeed import Block, Book, Level, Trade
+from btnl_client.timers import DeadlineTimer
+
+Handler = Callable[[Any], Awaitable[None]]
+
+# Message body type -> name of the Strategy callback that handles it
+CALLBACKS: Dict[Type[MessageBody], str] = {
+    Ack: "on_ack",
+    Fill: "on_fill",
+    Reject: "on_reject",
+    Close: "on_close",
+    MarketStateUpdate: "on_market_state",
+    Book: "on_book_update",
+    Level: "on_book_update",
+    Trade: "on_trade",
+    Block: "on_block",
+}
+
+
+class Strategy:
+    """
+    Event-driven alternative to overriding `OrderEntryClient.trade`.
+
+    Override the callbacks you need. Incoming messages are dispatched through
+    a table from body type to bound method, built once when the strategy is
+    attached and limited to the callbacks that are actually overridden.
+    """
+
+    def __init__(self):
+        self.client = None
+        # Tasks started by timers, referenced until they finish
+        self.tasks: Set[asyncio.Task] = set()
+
+    def attach(self, client) -> Dict[Type[MessageBody], Handler]:
+        self.client = client
+        handlers = {}
+        for body_type, name in CALLBACKS.items():
+            if getattr(type(self), name) is not getattr(Strategy, name):
+                handlers[body_type] = getattr(self, name)
+        return handlers
+
+    async def send(self, body: MessageBody):
+        await self.client.send_message(body)
+
+    def call_at(self, deadline: float, callback: Callable[[], Any]) -> DeadlineTimer:
+        """
+        Run `callback` at `deadline` on the client's clock, coroutine functions
+        are scheduled as tasks whose failures go to `on_error`
+        """
+        if inspect.iscoroutinefunction(callback):
+            coroutine_function = callback
+
+            def callback():
+                task = asyncio.get_running_loop().create_task(coroutine_function())
+                self.tasks.add(task)
+                task.add_done_callback(self._task_done)
+
+        timer = DeadlineTimer(self.client.clock, callback)
+        timer.arm(deadline)
+        return timer
+
+    def call_later(self, delay: float, callback: Callable[[], Any]) -> DeadlineTimer:
+        return self.call_at(self.client.clock.time() + delay, callback)
+
+    def _task_done(self, task: asyncio.Task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.on_error(task.exception())
+
+    def on_error(self, exc: BaseException):
+        """
+        Called with what a timer's coroutine raised. Hands it to the event
+        loop's exception handler unless overridden.
+        """
+        asyncio.get_running_loop().call_exception_handler(
+            {"message": "Strategy timer callback failed", "exception": exc}
+        )
+
+    async def on_start(self):
+        pass
+
+    async def on_ack(self, ack: Ack):
+        pass
+
+    async def on_fill(self, fill: Fill):
+        pass
+
+    async def on_reject(self, reject: Reject):
+        pass
+
+    async def on_close(self, close: Close):
+        pass
+
+    async def on_market_state(self, update: MarketStateUpdate):
+        pass
+
+    async def on_book_update(self, update: Union[Book, Level]):
+        pass
+
+    async def on_trade(self, trade: Trade):
+        pass
+
+    async def on_block(self, block: Block):
+        pass
+
+
+# Example use:
+# class QuoteOnFill(Strategy):
+#     order_id = 0
+#
+#     async def on_start(self):
+#         self.call_later(1.0, self.requote)
+#
+#     async def on_fill(self, fill):
+#         await self.requote()
+#
+#     async def requote(self):
+#         self.order_id += 1
+#         await self.send(Open(self.order_id, 3668, Side.Bid, 10000, 10, TimeInForce.Day))
+#
+# client = OrderEntryClient("localhost", 11000, 1, hex_auth_token, strategy=QuoteOnFill())
+# asyncio.run(client.run())
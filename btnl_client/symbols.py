@@ -0,0 +1,124 @@
+import sys
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from btnl_client.product import (
+    BitnomialHttpClient,
+    ProductOptionSpec,
+    ProductSpec,
+    ProductSpreadSpec,
+)
+
+
+def _leg_product_id(leg) -> int:
+    # Specs parsed from JSON keep their legs as dicts
+    return leg["product_id"] if isinstance(leg, dict) else leg.product_id
+
+
+class SymbolIndex:
+    """
+    Immutable symbol <-> product_id index built from product specs.
+
+    Symbols are interned so that symbols parsed off the websocket feed can be
+    compared by identity after the first lookup. Spread legs and option
+    underlyings are linked in both directions.
+    """
+
+    def __init__(self, specs: Iterable[ProductSpec]):
+        by_id: Dict[int, ProductSpec] = {}
+        id_by_symbol: Dict[str, int] = {}
+        symbol_by_id: Dict[int, str] = {}
+        legs: Dict[int, Tuple[int, ...]] = {}
+        spreads_by_leg: Dict[int, List[int]] = {}
+        underlying: Dict[int, int] = {}
+        options_by_underlying: Dict[int, List[int]] = {}
+
+        for spec in specs:
+            symbol = sys.intern(spec.symbol)
+            by_id[spec.product_id] = spec
+            id_by_symbol[symbol] = spec.product_id
+            symbol_by_id[spec.product_id] = symbol
+            if isinstance(spec, ProductSpreadSpec):
+                leg_ids = tuple(_leg_product_id(leg) for leg in spec.legs)
+                legs[spec.product_id] = leg_ids
+                for leg_id in leg_ids:
+                    spreads_by_leg.setdefault(leg_id, []).append(spec.product_id)
+            elif isinstance(spec, ProductOptionSpec):
+                underlying[spec.product_id] = spec.underlying_product
+                options_by_underlying.setdefault(spec.underlying_product, []).append(
+                    spec.product_id
+                )
+
+        self.specs: Mapping[int, ProductSpec] = MappingProxyType(by_id)
+        self.product_ids: Mapping[str, int] = MappingProxyType(id_by_symbol)
+        self.symbols: Mapping[int, str] = MappingProxyType(symbol_by_id)
+        self._legs = legs
+        self._spreads_by_leg = {k: tuple(v) for k, v in spreads_by_leg.items()}
+        self._underlying = underlying
+        self._options_by_underlying = {
+            k: tuple(v) for k, v in options_by_underlying.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.specs)
+
+    def product_id(self, symbol: str) -> int:
+        return self.product_ids[symbol]
+
+    def symbol(self, product_id: int) -> str:
+        return self.symbols[product_id]
+
+    def get_product_id(self, symbol: str) -> Optional[int]:
+        return self.product_ids.get(symbol)
+
+    def get_symbol(self, product_id: int) -> Optional[str]:
+        return self.symbols.get(product_id)
+
+    def spec(self, product_id: int) -> ProductSpec:
+        return self.specs[product_id]
+
+    def legs(self, product_id: int) -> Tuple[int, ...]:
+        return self._legs.get(product_id, ())
+
+    def spreads_with_leg(self, product_id: int) -> Tuple[int, ...]:
+        return self._spreads_by_leg.get(product_id, ())
+
+    def underlying(self, product_id: int) -> Optional[int]:
+        return self._underlying.get(product_id)
+
+    def options_on(self, product_id: int) -> Tuple[int, ...]:
+        return self._options_by_underlying.get(product_id, ())
+
+
+class SymbolResolver:
+    """
+    Holds the current `SymbolIndex`. A refresh builds a complete new index and
+    swaps it in with a single reference assignment, so readers never need a
+    lock and never see a half-built index. Readers that translate many ids in
+    a row should grab `resolver.index` once and use that.
+    """
+
+    def __init__(self, specs: Iterable[ProductSpec] = ()):
+        self.index = SymbolIndex(specs)
+
+    @classmethod
+    def from_client(cls, client: BitnomialHttpClient, **kwargs) -> "SymbolResolver":
+        return cls(client.get_product_specs(**kwargs))
+
+    def refresh(self, specs: Iterable[ProductSpec]) -> SymbolIndex:
+        index = SymbolIndex(specs)
+        self.index = index
+        return index
+
+    def product_id(self, symbol: str) -> int:
+        return self.index.product_ids[symbol]
+
+    def symbol(self, product_id: int) -> str:
+        return self.index.symbols[product_id]
+
+
+# Example use:
+# client = BitnomialHttpClient()
+# resolver = SymbolResolver.from_client(client, active=True)
+# product_id = resolver.product_id("BUIH4")
+# print(resolver.symbol(product_id), resolver.index.options_on(product_id))
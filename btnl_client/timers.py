@@ -0,0 +1,119 @@
+import asyncio
+import heapq
+import itertools
+from typing import Callable, List, Optional, Protocol, Tuple
+
+
+class TimerHandle(Protocol):
+    def cancel(self) -> None:
+        ...
+
+
+class Clock(Protocol):
+    """
+    Monotonic time source that can schedule callbacks at absolute deadlines.
+    `LoopClock` is backed by the running event loop, replays substitute a
+    virtual clock.
+    """
+
+    def time(self) -> float:
+        ...
+
+    def call_at(self, when: float, callback: Callable, *args) -> TimerHandle:
+        ...
+
+
+class LoopClock:
+    def time(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    def call_at(self, when: float, callback: Callable, *args) -> TimerHandle:
+        return asyncio.get_running_loop().call_at(when, callback, *args)
+
+
+class DeadlineTimer:
+    """
+    Calls `callback` once when `deadline` passes. Re-arming replaces the
+    previous deadline.
+    """
+
+    def __init__(self, clock: Clock, callback: Callable[[], None]):
+        self.clock = clock
+        self.callback = callback
+        self.deadline: Optional[float] = None
+        self._handle: Optional[TimerHandle] = None
+
+    def arm(self, deadline: float):
+        if self._handle is not None:
+            self._handle.cancel()
+        self.deadline = deadline
+        self._handle = self.clock.call_at(deadline, self._fire)
+
+    def cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self.deadline = None
+
+    @property
+    def armed(self) -> bool:
+        return self._handle is not None
+
+    def _fire(self):
+        self._handle = None
+        self.deadline = None
+        self.callback()
+
+
+class VirtualTimerHandle:
+    __slots__ = ("cancelled",)
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class VirtualClock:
+    """
+    Clock that only moves when `advance` is called, firing the callbacks that
+    fall due on the way in deadline order. Used to replay recorded sessions
+    faster or slower than real time.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+        self._timers: List[Tuple[float, int, VirtualTimerHandle, Callable, tuple]] = []
+        self._counter = itertools.count()
+
+    def time(self) -> float:
+        return self.now
+
+    def call_at(self, when: float, callback: Callable, *args) -> VirtualTimerHandle:
+        handle = VirtualTimerHandle()
+        heapq.heappush(
+            self._timers, (when, next(self._counter), handle, callback, args)
+        )
+        return handle
+
+    def next_deadline(self) -> Optional[float]:
+        while self._timers and self._timers[0][2].cancelled:
+            heapq.heappop(self._timers)
+        return self._timers[0][0] if self._timers else None
+
+    def advance(self, to: float) -> int:
+        """
+        Move time forward to `to`, returning how many callbacks fired
+        """
+        fired = 0
+        timers = self._timers
+        while timers and timers[0][0] <= to:
+            when, _, handle, callback, args = heapq.heappop(timers)
+            if handle.cancelled:
+                continue
+            self.now = max(self.now, when)
+            callback(*args)
+            fired += 1
+        self.now = max(self.now, to)
+        return fired
@@ -0,0 +1,163 @@
+import asyncio
+import heapq
+import itertools
+import signal
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, List, Optional, Tuple
+
+# (stage name, nanoseconds spent in it)
+Stages = Tuple[Tuple[str, int], ...]
+
+
+@dataclass
+class TraceRecord:
+    """
+    Timings of one message through one hook site. `start_ns` is the
+    `perf_counter_ns` the site was entered at and `stages` splits the time
+    spent there.
+    """
+
+    site: str
+    kind: str
+    start_ns: int
+    stages: Stages
+
+    @property
+    def total_ns(self) -> int:
+        return sum(ns for _, ns in self.stages)
+
+    def format(self) -> str:
+        stages = " ".join(f"{name}={ns / 1000:.1f}us" for name, ns in self.stages)
+        return f"{self.site:<20} {self.kind:<20} {self.total_ns / 1000:.1f}us {stages}"
+
+
+Tracer = Callable[[TraceRecord], None]
+
+# Registered tracers. Hook sites check this list before taking any
+# timestamps, so with nothing registered tracing costs one truth test.
+TRACERS: List[Tracer] = []
+
+# Sites and their stages:
+# - read_message: record (journal and latency stamps, once the frame is
+#   off the socket), then decode
+# - handle_btp_message: state (market state, risk and pending acks), then
+#   handler
+# - send_message: checks (market state and risk), governor, write
+# - ws_receive_message: parse, handle
+READ_MESSAGE = "read_message"
+HANDLE_BTP_MESSAGE = "handle_btp_message"
+SEND_MESSAGE = "send_message"
+WS_RECEIVE = "ws_receive_message"
+
+
+def register(tracer: Tracer):
+    """
+    Call `tracer` with a `TraceRecord` for every message passing a hook
+    site, from the event loop thread
+    """
+    if tracer not in TRACERS:
+        TRACERS.append(tracer)
+
+
+def unregister(tracer: Tracer):
+    if tracer in TRACERS:
+        TRACERS.remove(tracer)
+
+
+def emit(site: str, kind: str, start_ns: int, stages: Stages):
+    record = TraceRecord(site, kind, start_ns, stages)
+    for tracer in TRACERS:
+        tracer(record)
+
+
+class RingBuffer:
+    """
+    Keeps the last `size` records
+    """
+
+    def __init__(self, size: int = 10_000):
+        self.records: Deque[TraceRecord] = deque(maxlen=size)
+
+    def __call__(self, record: TraceRecord):
+        self.records.append(record)
+
+
+class Sampler:
+    """
+    Forwards every `every`th record to `tracer`, optionally only those of
+    one site
+    """
+
+    def __init__(self, tracer: Tracer, every: int = 100, site: Optional[str] = None):
+        self.tracer = tracer
+        self.every = every
+        self.site = site
+        self.seen = 0
+
+    def __call__(self, record: TraceRecord):
+        if self.site is not None and record.site != self.site:
+            return
+        self.seen += 1
+        if self.seen % self.every == 0:
+            self.tracer(record)
+
+
+class SlowestSampler:
+    """
+    Keeps the `n` slowest records with their stage breakdowns for post
+    mortem analysis. Records at or under the current cutoff are dropped
+    after one comparison.
+    """
+
+    def __init__(self, n: int = 100, site: Optional[str] = None):
+        self.n = n
+        self.site = site
+        self._heap: List[Tuple[int, int, TraceRecord]] = []
+        self._counter = itertools.count()
+
+    def __call__(self, record: TraceRecord):
+        if self.site is not None and record.site != self.site:
+            return
+        total = record.total_ns
+        heap = self._heap
+        if len(heap) < self.n:
+            heapq.heappush(heap, (total, next(self._counter), record))
+        elif total > heap[0][0]:
+            heapq.heapreplace(heap, (total, next(self._counter), record))
+
+    def slowest(self) -> List[TraceRecord]:
+        return [record for _, _, record in sorted(self._heap, reverse=True)]
+
+    def format(self) -> List[str]:
+        return [record.format() for record in self.slowest()]
+
+    def reset(self):
+        self._heap = []
+
+
+def toggle_on_signal(
+    sampler: SlowestSampler,
+    signum: Optional[int] = None,
+    out: Optional[Callable[[str], None]] = None,
+):
+    """
+    Register `sampler` when `signum` arrives and unregister it, writing
+    the slowest records to `out`, when it arrives again, so a running
+    process can be traced without a restart. `signum` defaults to SIGUSR1.
+    Unix only.
+    """
+    if signum is None:
+        signum = signal.SIGUSR1
+    out = out or print
+
+    def toggle():
+        if sampler in TRACERS:
+            unregister(sampler)
+            for line in sampler.format():
+                out(line)
+            sampler.reset()
+        else:
+            register(sampler)
+
+    asyncio.get_running_loop().add_signal_handler(signum, toggle)
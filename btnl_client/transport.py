@@ -0,0 +1,137 @@
+import asyncio
+import socket
+import sys
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+# Linux values the socket module does not export everywhere
+TCP_QUICKACK = getattr(socket, "TCP_QUICKACK", 12)
+SO_BUSY_POLL = getattr(socket, "SO_BUSY_POLL", 46)
+
+
+@dataclass(frozen=True)
+class TransportProfile:
+    """
+    Socket options for an order entry connection. `None` leaves the
+    option as asyncio and the OS set it.
+
+    - `nodelay`: `TCP_NODELAY`, sending small frames without waiting on
+      Nagle's algorithm. asyncio already enables it on TCP streams, so
+      `False` is only useful to measure what it saves.
+    - `rcvbuf`, `sndbuf`: `SO_RCVBUF` and `SO_SNDBUF` in bytes
+    - `quickack`: `TCP_QUICKACK`, acking received data at once. Linux
+      clears it again as it sees fit, so the client re-arms it after
+      every read.
+    - `busy_poll`: `SO_BUSY_POLL` in microseconds, spinning on the device
+      queue before sleeping. Linux only and usually needs `CAP_NET_ADMIN`.
+    - `read_chunk`: most bytes the event loop reads from the socket at once
+    """
+
+    nodelay: Optional[bool] = None
+    rcvbuf: Optional[int] = None
+    sndbuf: Optional[int] = None
+    quickack: bool = False
+    busy_poll: Optional[int] = None
+    read_chunk: Optional[int] = None
+
+    def apply(self, sock: socket.socket) -> Dict[str, str]:
+        """
+        Set the profile's options on `sock` and return the ones that could
+        not be set, with the reason
+        """
+        skipped = {}
+        options = []
+        if self.nodelay is not None:
+            options.append(
+                ("nodelay", socket.IPPROTO_TCP, socket.TCP_NODELAY, int(self.nodelay))
+            )
+        if self.rcvbuf is not None:
+            options.append(("rcvbuf", socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf))
+        if self.sndbuf is not None:
+            options.append(("sndbuf", socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf))
+        if self.quickack:
+            options.append(("quickack", socket.IPPROTO_TCP, TCP_QUICKACK, 1))
+        if self.busy_poll is not None:
+            options.append(
+                ("busy_poll", socket.SOL_SOCKET, SO_BUSY_POLL, self.busy_poll)
+            )
+        for name, level, option, value in options:
+            if name in ("quickack", "busy_poll") and not sys.platform.startswith(
+                "linux"
+            ):
+                skipped[name] = "Linux only"
+                continue
+            try:
+                sock.setsockopt(level, option, value)
+            except OSError as e:
+                skipped[name] = e.strerror or str(e)
+        return skipped
+
+
+PROFILES: Dict[str, TransportProfile] = {
+    # Whatever asyncio and the OS do
+    "default": TransportProfile(),
+    # Nagle's algorithm back on, to see what TCP_NODELAY saves
+    "nagle": TransportProfile(nodelay=False),
+    "low_latency": TransportProfile(
+        nodelay=True,
+        rcvbuf=1 << 20,
+        sndbuf=1 << 20,
+        quickack=True,
+        read_chunk=1 << 16,
+    ),
+    "busy_poll": TransportProfile(
+        nodelay=True,
+        rcvbuf=1 << 20,
+        sndbuf=1 << 20,
+        quickack=True,
+        busy_poll=50,
+        read_chunk=1 << 16,
+    ),
+}
+
+
+def quickack_rearm(writer: asyncio.StreamWriter) -> Callable[[], None]:
+    """
+    A callable setting `TCP_QUICKACK` on `writer`'s socket again, to be
+    called after each read
+    """
+    sock = writer.get_extra_info("socket")
+
+    def rearm():
+        sock.setsockopt(socket.IPPROTO_TCP, TCP_QUICKACK, 1)
+
+    return rearm
+
+
+async def open_connection(
+    host: str, port: int, profile: TransportProfile
+) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, Dict[str, str]]:
+    """
+    `asyncio.open_connection` with `profile` applied to the socket. Also
+    returns the options that could not be set.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    skipped = profile.apply(writer.get_extra_info("socket"))
+    if profile.read_chunk is not None:
+        transport = writer.transport
+        # The selector loops read up to `max_size` bytes per recv. Other
+        # loops, uvloop included, choose their own read size.
+        if hasattr(transport, "max_size"):
+            transport.max_size = profile.read_chunk
+        else:
+            skipped["read_chunk"] = "Not supported by the event loop"
+    return reader, writer, skipped
+
+
+def use_uvloop() -> bool:
+    """
+    Make uvloop the event loop policy if it is installed, returning whether
+    it is. Call before the loop is created, e.g. before `asyncio.run`.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
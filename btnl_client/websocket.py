@@ -1,11 +1,18 @@
 import asyncio
+import calendar
+import functools
 import json
-from dataclasses import dataclass
+import re
+import time
+from dataclasses import dataclass, field
 import dataclasses
-from typing import List, Tuple, Union
+from typing import List, Optional, Tuple, Union
 from enum import Enum
 import websockets
 
+from btnl_client import tracing
+from btnl_client.journal import Direction
+
 
 WEBSOCKET_URI = "wss://bitnomial.com/exchange/ws"
 
@@ -58,6 +65,8 @@ class Trade:
     symbol: str
     taker_side: str
     timestamp: str
+    # time_ns when the message was read, if the client stamps them
+    received_ns: Optional[int] = field(default=None, compare=False, repr=False)
 
 
 @dataclass
@@ -69,6 +78,7 @@ class Level:
     side: str
     symbol: str
     timestamp: str
+    received_ns: Optional[int] = field(default=None, compare=False, repr=False)
 
 
 @dataclass
@@ -79,6 +89,7 @@ class Book:
     bids: List[Tuple[int, int]]
     symbol: str
     timestamp: str
+    received_ns: Optional[int] = field(default=None, compare=False, repr=False)
 
 
 class Side(Enum):
@@ -95,6 +106,7 @@ class BlockTrade:
     quantity: int
     symbol: str
     timestamp: str
+    received_ns: Optional[int] = field(default=None, compare=False, repr=False)
 
 
 class MarketStatus(Enum):
@@ -110,10 +122,42 @@ class MarketStatusUpdate:
     state: MarketStatus
     symbol: str
     timestamp: str
+    received_ns: Optional[int] = field(default=None, compare=False, repr=False)
 
 
 Message = Union[Trade, Level, Book, BlockTrade, MarketStatusUpdate]
 
+_TIMESTAMP = re.compile(
+    r"(\d{4}-\d\d-\d\d[T ]\d\d:\d\d:\d\d)(?:\.(\d+))?(Z|[+-]\d\d:?\d\d)?$"
+)
+
+
+@functools.lru_cache(maxsize=64)
+def _epoch_seconds(prefix: str, zone: Optional[str] = None) -> int:
+    seconds = calendar.timegm(
+        time.strptime(prefix[:10] + prefix[11:], "%Y-%m-%d%H:%M:%S")
+    )
+    if zone and zone != "Z":
+        offset = int(zone[1:3]) * 3600 + int(zone[-2:]) * 60
+        seconds -= offset if zone[0] == "+" else -offset
+    return seconds
+
+
+def parse_timestamp(timestamp: str) -> int:
+    """
+    Epoch nanoseconds of an RFC 3339 exchange timestamp. Only the
+    fraction is parsed per message, whole seconds are cached.
+    """
+    if len(timestamp) == 30 and timestamp[29] == "Z" and timestamp[19] == ".":
+        # The exchange's own form, nanoseconds in UTC
+        return _epoch_seconds(timestamp[:19]) * 1_000_000_000 + int(timestamp[20:29])
+    match = _TIMESTAMP.match(timestamp)
+    if match is None:
+        raise ValueError(f"Invalid timestamp: {timestamp}")
+    prefix, fraction, zone = match.groups()
+    nanos = int(fraction[:9].ljust(9, "0")) if fraction else 0
+    return _epoch_seconds(prefix, zone) * 1_000_000_000 + nanos
+
 
 class DataclassEnumEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -144,8 +188,29 @@ def parse_message(message: str):
 class BitnomialWebSocketClient:
     uri: str = WEBSOCKET_URI
 
-    def __init__(self, uri=WEBSOCKET_URI):
+    def __init__(
+        self,
+        uri=WEBSOCKET_URI,
+        market_states=None,
+        journal=None,
+        metrics=None,
+        receive_timestamps=False,
+        feed_lag=None,
+    ):
         self.uri = uri
+        # Stamp every message with the time_ns it was read at
+        self.receive_timestamps = receive_timestamps
+        # Optional FeedLag measuring exchange to client latency per symbol,
+        # which needs receive timestamps
+        self.feed_lag = feed_lag
+        # Optional MarketStateRegistry fed with status updates
+        self.market_states = market_states
+        # Optional JournalWriter recording the raw feed for replay
+        self.journal = journal
+        # Optional ClientMetrics counting messages and parse time
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.attach(self)
 
     async def connect(self, message: SubscribeMessage):
         async with websockets.connect(self.uri) as ws:
@@ -157,8 +222,40 @@ class BitnomialWebSocketClient:
 
     async def receive_message(self, ws):
         async for message in ws:
+            received_ns = None
+            if self.receive_timestamps or self.feed_lag is not None:
+                received_ns = time.time_ns()
+            if self.journal is not None:
+                self.journal.record(Direction.WsIn, message.encode())
+            self.dispatch(message, received_ns)
+
+    def dispatch(self, message: str, received_ns: Optional[int] = None):
+        traced = bool(tracing.TRACERS)
+        if self.metrics is None and not traced:
+            parsed_message = parse_message(message)
+        else:
+            start = time.perf_counter_ns()
             parsed_message = parse_message(message)
-            self.handle_message(parsed_message)
+            parsed = time.perf_counter_ns()
+            if self.metrics is not None:
+                self.metrics.on_ws_message(message, parsed_message, parsed - start)
+        if received_ns is not None:
+            parsed_message.received_ns = received_ns
+            if self.feed_lag is not None:
+                self.feed_lag.on_ws_message(parsed_message)
+        if self.market_states is not None:
+            self.market_states.on_ws_message(parsed_message)
+        self.handle_message(parsed_message)
+        if traced:
+            tracing.emit(
+                tracing.WS_RECEIVE,
+                type(parsed_message).__name__,
+                start,
+                (
+                    ("parse", parsed - start),
+                    ("handle", time.perf_counter_ns() - parsed),
+                ),
+            )
 
     def run(self, message: SubscribeMessage):
         asyncio.run(self.connect(message))
@@ -0,0 +1,16 @@
+from btnl_client.bench import BTP_SAMPLES
+from btnl_client.protocol import Message, new_message
+
+
+def test_btp_samples_cover_every_message_type():
+    expected = set()
+    for parse_body in Message.BODY_ENCODINGS.values():
+        body_type = parse_body.__self__
+        message_types = getattr(body_type, "MESSAGE_TYPES", None)
+        if message_types is None:
+            expected.add(body_type)
+        else:
+            expected.update(parse.__self__ for parse in message_types.values())
+    assert expected - {type(body) for body in BTP_SAMPLES.values()} == set()
+    for body in BTP_SAMPLES.values():
+        assert Message.from_btp(new_message(1, body).to_btp()).body == body
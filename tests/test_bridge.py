@@ -0,0 +1,141 @@
+import asyncio
+import threading
+
+from btnl_client.bridge import OrderBridge
+from btnl_client.client import OrderEntryClient, SendResult
+from btnl_client.protocol import Ack, Open, Side, TimeInForce
+from btnl_client.simulator import ExchangeSimulator
+
+
+class QuietClient(OrderEntryClient):
+    async def app_message(self, message):
+        pass
+
+
+class LoopThread:
+    """
+    An event loop on its own thread running the simulator and a connected
+    client, as a trading application would run it
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.simulator = ExchangeSimulator()
+        self.run(self.simulator.start())
+        self.client = QuietClient("127.0.0.1", self.simulator.port, 1, "00" * 32)
+        self.run(self.client.connect())
+        asyncio.run_coroutine_threadsafe(self.client.receive_messages_loop(), self.loop)
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(5)
+
+    def block(self) -> threading.Event:
+        """
+        Keep the loop busy until the returned event is set
+        """
+        release = threading.Event()
+        started = threading.Event()
+
+        def busy():
+            started.set()
+            release.wait(5)
+
+        self.loop.call_soon_threadsafe(busy)
+        started.wait(5)
+        return release
+
+    def close(self):
+        async def shut_down():
+            self.client.stop()
+            await asyncio.sleep(0.01)
+            await self.simulator.close()
+
+        self.run(shut_down())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+
+def counting_wakeups(bridge):
+    wakeups = []
+    on_wakeup = bridge._on_wakeup
+
+    def counted():
+        wakeups.append(len(bridge.queue))
+        on_wakeup()
+
+    bridge._on_wakeup = counted
+    return wakeups
+
+
+def submit_from_threads(count, submit):
+    threads = [threading.Thread(target=submit, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_submissions_while_the_loop_is_busy_share_one_wakeup():
+    loop_thread = LoopThread()
+    try:
+        bridge = OrderBridge(loop_thread.client, loop_thread.loop)
+        wakeups = counting_wakeups(bridge)
+        futures = [[] for _ in range(4)]
+
+        def submit(thread):
+            for i in range(10):
+                order_id = thread * 100 + i + 1
+                body = Open(order_id, 1, Side.Bid, 100 - i, 1, TimeInForce.Day)
+                futures[thread].append(bridge.submit(body, wait_ack=thread % 2 == 0))
+
+        release = loop_thread.block()
+        submit_from_threads(4, submit)
+        release.set()
+        for thread, batch in enumerate(futures):
+            results = [future.result(5) for future in batch]
+            if thread % 2 == 0:
+                assert all(isinstance(ack, Ack) for ack in results)
+            else:
+                assert results == [SendResult.Sent] * 10
+        # Everything queued up behind a single wakeup
+        assert wakeups == [40]
+        assert not bridge.queue
+    finally:
+        loop_thread.close()
+
+
+def test_each_batch_wakes_the_loop_at_most_once():
+    loop_thread = LoopThread()
+    try:
+        bridge = OrderBridge(loop_thread.client, loop_thread.loop)
+        wakeups = counting_wakeups(bridge)
+        results = {}
+
+        def submit(thread):
+            for batch in range(5):
+                bodies = [
+                    Open(
+                        thread * 1000 + batch * 10 + i + 1,
+                        1,
+                        Side.Ask,
+                        200 + i,
+                        1,
+                        TimeInForce.Day,
+                    )
+                    for i in range(3)
+                ]
+                futures = bridge.submit_many(bodies, wait_ack=True)
+                results[(thread, batch)] = [f.result(5) for f in futures]
+
+        submit_from_threads(4, submit)
+        assert len(results) == 20
+        for (thread, batch), acks in results.items():
+            assert [ack.order_id for ack in acks] == [
+                thread * 1000 + batch * 10 + i + 1 for i in range(3)
+            ]
+        assert 1 <= len(wakeups) <= 20
+        assert not bridge.queue
+    finally:
+        loop_thread.close()
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from btnl_client.client import OrderEntryClient, OrderRejected, SendResult
+from btnl_client.market_registry import HaltPolicy, MarketStateRegistry
+from btnl_client.protocol import (
+    Ack,
+    MarketState,
+    Open,
+    OpenTemplate,
+    Side,
+    TimeInForce,
+)
+from btnl_client.risk import PreTradeReject, ProductLimits, RiskGate
+from btnl_client.simulator import ExchangeSimulator
+
+
+class QuietClient(OrderEntryClient):
+    async def app_message(self, message):
+        pass
+
+
+async def connected(simulator, **kwargs):
+    await simulator.start()
+    client = QuietClient("127.0.0.1", simulator.port, 1, "00" * 32, **kwargs)
+    await client.connect()
+    receiving = asyncio.ensure_future(client.receive_messages_loop())
+    return client, receiving
+
+
+async def shut_down(simulator, client, receiving):
+    receiving.cancel()
+    client.stop()
+    await asyncio.sleep(0.01)
+    await simulator.close()
+
+
+def test_ladder_and_modify_many_resolve_per_order():
+    async def run():
+        risk = RiskGate()
+        risk.set_limits(1, ProductLimits(5, 100, 1000, 50.0))
+        simulator = ExchangeSimulator()
+        client, receiving = await connected(simulator, risk_gate=risk)
+        try:
+            template = OpenTemplate(1, Side.Bid, TimeInForce.Day)
+            # 101 is off tick and stopped by the risk gate
+            futures = await client.place_ladder(template, [100, 101, 95], [1, 1, 1])
+            with pytest.raises(PreTradeReject):
+                await futures[1]
+            acks = [await futures[0], await futures[2]]
+            assert all(isinstance(ack, Ack) for ack in acks)
+            futures = await client.modify_many(
+                [(acks[0].order_id, 90, 2), (acks[1].order_id, 85, 0), (1, 90, 1)]
+            )
+            assert isinstance(await futures[0], Ack)
+            assert isinstance(await futures[1], Ack)
+            with pytest.raises(PreTradeReject):
+                await futures[2]
+            assert risk.orders[acks[0].order_id].quantity == 2
+        finally:
+            await shut_down(simulator, client, receiving)
+
+    asyncio.run(run())
+
+
+def test_held_messages_are_sent_on_reopen():
+    async def run():
+        simulator = ExchangeSimulator()
+        registry = MarketStateRegistry(HaltPolicy.Hold)
+        client, receiving = await connected(simulator, market_states=registry)
+        try:
+            simulator.set_market_state(1, MarketState.Halt)
+            await asyncio.sleep(0.02)
+            body = Open(1, 1, Side.Bid, 100, 1, TimeInForce.Day)
+            assert await client.send_message(body) == SendResult.Held
+            template = OpenTemplate(1, Side.Ask, TimeInForce.Day)
+            futures = await client.place_ladder(template, [110, 115], [1, 1])
+            assert not any(future.done() for future in futures)
+            simulator.set_market_state(1, MarketState.Open)
+            for future in futures:
+                assert isinstance(await asyncio.wait_for(future, 1), Ack)
+        finally:
+            await shut_down(simulator, client, receiving)
+
+    asyncio.run(run())
+
+
+def test_exchange_reject_fails_the_future():
+    async def run():
+        simulator = ExchangeSimulator()
+        client, receiving = await connected(simulator)
+        try:
+            template = OpenTemplate(1, Side.Bid, TimeInForce.Day)
+            first = await client.place_ladder(template, [100], [1])
+            order_id = (await first[0]).order_id
+            futures = await client.modify_many([(order_id + 100, 100, 1)])
+            with pytest.raises(OrderRejected):
+                await asyncio.wait_for(futures[0], 1)
+        finally:
+            await shut_down(simulator, client, receiving)
+
+    asyncio.run(run())
+
+
+def test_cancel_goes_out_while_halted():
+    async def run():
+        risk = RiskGate()
+        risk.set_limits(1, ProductLimits(5, 100, 1000, 50.0))
+        simulator = ExchangeSimulator()
+        registry = MarketStateRegistry(HaltPolicy.Reject)
+        client, receiving = await connected(
+            simulator, risk_gate=risk, market_states=registry
+        )
+        try:
+            template = OpenTemplate(1, Side.Bid, TimeInForce.Day)
+            futures = await client.place_ladder(template, [100, 95], [1, 1])
+            acks = [await future for future in futures]
+            simulator.set_market_state(1, MarketState.Halt)
+            await asyncio.sleep(0.02)
+            assert registry.state(1) is MarketState.Halt
+            futures = await client.modify_many(
+                [(acks[0].order_id, 100, 0), (acks[1].order_id, 90, 1)]
+            )
+            assert isinstance(await asyncio.wait_for(futures[0], 1), Ack)
+            with pytest.raises(PreTradeReject):
+                await futures[1]
+        finally:
+            await shut_down(simulator, client, receiving)
+
+    asyncio.run(run())
@@ -0,0 +1,44 @@
+from btnl_client.journal import Direction, JournalReader, JournalWriter
+from btnl_client.protocol import (
+    Ack,
+    LoginRequest,
+    Open,
+    Side,
+    TimeInForce,
+    new_message,
+)
+
+
+def write_session(writer, first_order_id, timestamp_ns):
+    login = LoginRequest(1, bytes(range(32)), 30)
+    writer.record(Direction.BtpOut, new_message(1, login).to_btp(), timestamp_ns)
+    for i in range(3):
+        order_id = first_order_id + i
+        body = Open(order_id, 1, Side.Bid, 100, 1, TimeInForce.Day)
+        frame = new_message(2 + i, body).to_btp()
+        writer.record(Direction.BtpOut, frame, timestamp_ns + i + 1)
+        ack = new_message(2 + i, Ack(order_id, order_id, None)).to_btp()
+        writer.record(Direction.BtpIn, ack, timestamp_ns + i + 1)
+
+
+def test_sequence_ids_are_looked_up_per_session(tmp_path):
+    path = str(tmp_path / "journal")
+    writer = JournalWriter(path)
+    write_session(writer, 10, 1000)
+    write_session(writer, 20, 2000)
+    writer.close()
+    reader = JournalReader(path)
+    try:
+        reader.build_index(stride=1)
+        assert len(reader.sessions) == 2
+        first = next(reader.from_sequence(Direction.BtpOut, 3)).message()
+        assert first.body.order_id == 21
+        first = next(reader.from_sequence(Direction.BtpOut, 3, session=0)).message()
+        assert first.body.order_id == 11
+        assert list(reader.from_sequence(Direction.BtpOut, 9, session=0)) == []
+        # Logins are redacted on the way in
+        login = next(iter(reader)).message().body
+        assert login.auth_token == bytes(32)
+        assert [r.message().body.order_id for r in reader.for_order(20)] == [20, 20]
+    finally:
+        reader.close()
@@ -0,0 +1,133 @@
+import random
+
+import pytest
+
+from btnl_client.latency import FeedLag, Histogram, LatencyTracker
+from btnl_client.protocol import Ack, Fill, Liquidity, Reject, RejectReason
+
+
+@pytest.mark.parametrize("bits", [4, 8, 11])
+def test_index_and_value_at_round_trip(bits):
+    histogram = Histogram(bits)
+    rng = random.Random(bits)
+    values = list(range(3 * histogram.linear))
+    values += [rng.randrange(1 << 40) for _ in range(10_000)]
+    values += [(1 << shift) + delta for shift in range(bits, 40) for delta in (-1, 0)]
+    last_index = -1
+    for value in sorted(values):
+        index = histogram.index(value)
+        assert index >= last_index
+        last_index = index
+        representative = histogram.value_at(index)
+        assert histogram.index(representative) == index
+        if value < histogram.linear:
+            assert representative == value
+        else:
+            assert abs(representative - value) <= value / (1 << (bits - 1))
+    assert histogram.index(histogram.highest) == len(histogram.counts) - 1
+
+
+def test_percentiles_stay_within_recorded_bounds():
+    histogram = Histogram(8)
+    values = [1_000 + 37 * i for i in range(10_000)]
+    for value in values:
+        histogram.record(value)
+    # Exact up to the bucket precision of 1 / 2 ** 7
+    for percentile, expected in ((0, values[0]), (50, values[4999]), (100, values[-1])):
+        assert abs(histogram.percentile(percentile) - expected) <= expected / 128
+    previous = 0
+    for percentile in (1, 10, 50, 90, 99, 99.9):
+        value = histogram.percentile(percentile)
+        assert min(values) <= value <= max(values)
+        assert value >= previous
+        previous = value
+
+
+def test_merge_and_empty():
+    assert Histogram().percentile(99) == 0
+    a, b = Histogram(), Histogram()
+    a.record(5)
+    b.record(500)
+    a.merge(b)
+    assert (a.count, a.min, a.max) == (2, 5, 500)
+
+
+def test_tracker_correlates_responses_with_sends():
+    tracker = LatencyTracker()
+    tracker.on_open(1, 7, start=1_000, written=1_500)
+    tracker.on_open(2, 7, start=2_000, written=2_100)
+    tracker.on_modify(1, 11, start=3_000, written=3_200)
+    tracker.read_ns = 4_000
+    tracker.on_dispatch(Ack(1, 1, None))
+    tracker.on_handled(Ack(1, 1, None))
+    tracker.read_ns = 5_000
+    tracker.on_dispatch(Ack(2, 1, 11))
+    tracker.read_ns = 6_000
+    tracker.on_dispatch(Reject(2, None, RejectReason.PriceOutsidePriceBands))
+    assert tracker.histogram("send", "Open", 7).count == 2
+    assert tracker.histogram("send", "Modify", 7).count == 1
+    wire = tracker.histogram("wire", "Open", 7)
+    assert (wire.count, wire.min, wire.max) == (2, 4_000 - 1_500, 6_000 - 2_100)
+    assert tracker.histogram("wire", "Modify", 7).max == 5_000 - 3_200
+    assert tracker.pending == {}
+    # A rejected open is forgotten, its fills cannot be correlated
+    assert 2 not in tracker.orders
+
+
+def test_tracker_records_only_the_first_fill():
+    tracker = LatencyTracker()
+    tracker.on_open(1, 7, start=1_000, written=1_500)
+    for ack_id in (1, 2):
+        tracker.read_ns = 9_000
+        tracker.on_dispatch(Fill(ack_id, 1, 100, 1, Liquidity.Add))
+    first_fill = tracker.histogram("wire", "FirstFill", 7)
+    assert (first_fill.count, first_fill.max) == (1, 9_000 - 1_500)
+    assert tracker.merged("round_trip", "FirstFill").count == 1
+
+
+def test_tracker_caps_pending():
+    tracker = LatencyTracker(max_pending=2)
+    for order_id in range(3):
+        tracker.on_open(order_id, 7, start=0, written=1)
+    assert list(tracker.pending) == [(1, None), (2, None)]
+    assert list(tracker.orders) == [1, 2]
+
+
+def test_feed_lag_windows_rotate():
+    lag = FeedLag(window=1.0)
+    lag.record("BUI", 0, 10)
+    lag.record("BUI", 0, 500_000_000)
+    assert lag.histogram("BUI").count == 2
+    # The first window moves to previous and is still counted
+    lag.record("BUI", 1_000_000_000, 1_000_000_010)
+    assert lag.histogram("BUI").count == 3
+    lag.record("BUI", 2_000_000_000, 2_000_000_010)
+    assert lag.histogram("BUI").count == 2
+    # After a silent window only the new record is left
+    lag.record("BUI", 5_000_000_000, 5_000_000_010)
+    assert lag.histogram("BUI").count == 1
+    assert lag.histogram("BUI").max == 10
+    assert lag.histogram("other").count == 0
+
+
+def test_feed_lag_calls_on_lag_once_per_episode():
+    calls = []
+    lag = FeedLag(alpha=0.5, threshold=1e-6, on_lag=lambda *call: calls.append(call))
+    lag.record("BUI", 0, 100)
+    assert calls == []
+    for received in range(1, 5):
+        lag.record("BUI", 0, received * 10_000)
+    assert calls == [("BUI", 10_000)]
+    assert lag.snapshot()["BUI"]["lagging"]
+    # Recovering and lagging again calls it again
+    for _ in range(10):
+        lag.record("BUI", 0, 0)
+    assert not lag.symbols["BUI"].lagging
+    lag.record("BUI", 0, 100_000)
+    assert calls == [("BUI", 10_000), ("BUI", 100_000)]
+
+
+def test_negative_lag_is_recorded_as_zero():
+    lag = FeedLag()
+    lag.record("BUI", 1_000, 0)
+    assert lag.symbols["BUI"].last == 0
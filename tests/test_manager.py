@@ -0,0 +1,75 @@
+import asyncio
+import socket
+import threading
+
+import pytest
+
+from btnl_client.client import LoginRejected, SendResult
+from btnl_client.manager import SessionConfig, SessionManager
+from btnl_client.protocol import Ack, LoginRejectReason, Open, Side, TimeInForce
+from btnl_client.simulator import ExchangeSimulator
+
+
+def simulator_thread(**kwargs):
+    started = threading.Event()
+    state = {}
+
+    async def serve():
+        simulator = ExchangeSimulator(**kwargs)
+        await simulator.start()
+        state["port"] = simulator.port
+        started.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    started.wait()
+    return state["port"]
+
+
+def test_submit_many_returns_futures_in_order():
+    port = simulator_thread()
+    configs = [SessionConfig("127.0.0.1", port, i, "00" * 32) for i in (1, 2)]
+    manager = SessionManager(configs)
+    manager.start()
+    try:
+        bodies = [
+            Open(order_id, order_id, Side.Bid, 100, 1, TimeInForce.Day)
+            for order_id in range(1, 5)
+        ]
+        futures = manager.submit_many(bodies)
+        assert [f.result(1) for f in futures] == [SendResult.Sent] * 4
+        acks = [manager.events.get(timeout=1) for _ in bodies]
+        # Product ids alternate between the two sessions
+        assert sorted((index, ack.order_id) for index, ack in acks) == [
+            (0, 2),
+            (0, 4),
+            (1, 1),
+            (1, 3),
+        ]
+        assert all(isinstance(ack, Ack) for _, ack in acks)
+        assert manager.totals().failures == 0
+    finally:
+        manager.stop()
+
+
+def test_start_raises_a_rejected_login():
+    port = simulator_thread(credentials={1: bytes(32)})
+    configs = [
+        SessionConfig("127.0.0.1", port, 1, "00" * 32),
+        SessionConfig("127.0.0.1", port, 2, "00" * 32),
+    ]
+    manager = SessionManager(configs)
+    with pytest.raises(LoginRejected) as rejected:
+        manager.start(timeout=5)
+    assert rejected.value.reason == LoginRejectReason.Unauthorized
+    manager.stop()
+
+
+def test_start_times_out_while_unreachable():
+    # A port nothing listens on
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    manager = SessionManager([SessionConfig("127.0.0.1", port, 1, "00" * 32)])
+    with pytest.raises(TimeoutError):
+        manager.start(timeout=0.2)
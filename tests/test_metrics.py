@@ -0,0 +1,63 @@
+from btnl_client.metrics import ClientMetrics, MetricsRegistry
+from btnl_client.protocol import (
+    Ack,
+    Heartbeat,
+    Open,
+    Reject,
+    RejectReason,
+    Side,
+    TimeInForce,
+    new_message,
+)
+
+
+def test_render_escapes_labels_and_help():
+    registry = MetricsRegistry()
+    counter = registry.counter(
+        "odd_total", 'Help with \\ and\nnewline "quoted"', ("x",)
+    )
+    counter.inc(('back\\slash "quote"\nnewline',), 2)
+    registry.gauge("plain", "No labels").set(0.5)
+    assert registry.render() == (
+        '# HELP btnl_odd_total Help with \\\\ and\\nnewline "quoted"\n'
+        "# TYPE btnl_odd_total counter\n"
+        'btnl_odd_total{x="back\\\\slash \\"quote\\"\\nnewline"} 2\n'
+        "# HELP btnl_plain No labels\n"
+        "# TYPE btnl_plain gauge\n"
+        "btnl_plain 0.5\n"
+    )
+
+
+def test_tracked_samplers_render_at_collection():
+    registry = MetricsRegistry()
+    depth = registry.gauge("depth", "Depth", ("queue", "part"))
+    sizes = {"a": 1}
+    depth.track(("q",), lambda: {(part,): size for part, size in sizes.items()})
+    sizes["b"] = 3
+    assert registry.snapshot() == {
+        ("btnl_depth", (("queue", "q"), ("part", "a"))): 1,
+        ("btnl_depth", (("queue", "q"), ("part", "b"))): 3,
+    }
+
+
+def test_count_frames_splits_batched_writes():
+    metrics = ClientMetrics(client="c1")
+    frames = b"".join(
+        [
+            new_message(1, Open(1, 2, Side.Bid, 100, 1, TimeInForce.Day)).to_btp(),
+            new_message(2, Open(2, 2, Side.Ask, 101, 1, TimeInForce.Day)).to_btp(),
+            new_message(0, Heartbeat()).to_btp(),
+        ]
+    )
+    metrics.on_write(frames)
+    reject = Reject(1, None, RejectReason.OrderNotFound)
+    metrics.on_read(new_message(3, reject).to_btp(), reject, 1_000)
+    metrics.on_read(new_message(4, Ack(1, 2, None)).to_btp(), Ack(1, 2, None), 1_000)
+    assert metrics.messages.values == {
+        ("c1", "out", "OrderEntry", "Open"): 2,
+        ("c1", "out", "Heartbeat", "Heartbeat"): 1,
+        ("c1", "in", "OrderEntry", "Reject"): 1,
+        ("c1", "in", "OrderEntry", "Ack"): 1,
+    }
+    assert metrics.bytes.values[("c1", "out")] == len(frames)
+    assert metrics.rejects.values == {("c1", "OrderNotFound"): 1}
@@ -0,0 +1,102 @@
+from dataclasses import fields, replace
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from btnl_client.poller import (
+    PRODUCT_DATA_FIELDS,
+    ProductDataChange,
+    ProductDataPoller,
+    TradingHours,
+)
+from btnl_client.product import ProductData
+
+CHICAGO = timezone(timedelta(hours=-5))
+
+
+def datum(product_id, **values):
+    data = {f.name: None for f in fields(ProductData)}
+    data.update(product_id=product_id, price_limit_upper=110.0, price_limit_lower=90.0)
+    data.update(values)
+    return ProductData(**data)
+
+
+def spec(product_id, open_time, settle_time):
+    return SimpleNamespace(
+        product_id=product_id,
+        daily_open_time=open_time,
+        daily_settle_time=settle_time,
+    )
+
+
+def test_diff_reports_only_changed_fields():
+    poller = ProductDataPoller(None)
+    first = [datum(1, last_price=100.0), datum(2, volume=5.0)]
+    changes = poller.diff(first)
+    assert [change.product_id for change in changes] == [1, 2]
+    assert set(changes[0].changes) == set(PRODUCT_DATA_FIELDS)
+    assert poller.diff(first) == []
+    second = [replace(first[0], last_price=101.0, volume=3.0), first[1]]
+    assert poller.diff(second) == [
+        ProductDataChange(1, {"last_price": 101.0, "volume": 3.0})
+    ]
+
+
+def test_next_interval_backs_off_and_recovers():
+    poller = ProductDataPoller(None, min_interval=1.0, max_interval=4.0)
+    assert poller.next_interval(False) == 1.5
+    assert poller.next_interval(False) == 2.25
+    assert poller.next_interval(False) == 3.375
+    assert poller.next_interval(False) == 4.0
+    assert poller.next_interval(True) == 2.0
+    assert poller.next_interval(True) == 1.0
+    assert poller.next_interval(True) == 1.0
+
+
+def test_next_interval_slows_down_outside_trading_hours():
+    poller = ProductDataPoller(
+        None,
+        min_interval=1.0,
+        max_interval=4.0,
+        closed_interval=60.0,
+        specs=[spec(1, "08:30:00", "15:00:00")],
+    )
+    poller.diff([datum(1)])
+    inside = datetime(2024, 3, 1, 9, 0, tzinfo=timezone.utc)
+    outside = datetime(2024, 3, 1, 16, 0, tzinfo=timezone.utc)
+    assert poller.next_interval(True, inside) == 1.0
+    assert poller.next_interval(True, outside) == 60.0
+    # Polling picks up from the slowest regular interval
+    assert poller.next_interval(True, inside) == 2.0
+
+
+def test_trading_hours_use_the_specs_offset():
+    hours = TradingHours(
+        [
+            spec(1, "08:30:00-05:00", "15:00:00-05:00"),
+            spec(2, "2024-01-01T13:30:00Z", "2024-01-01T20:00:00Z"),
+            spec(3, "08:30:00", "15:00:00"),
+            # Opens in the evening and settles the next day
+            spec(4, "17:00:00-05:00", "16:00:00-05:00"),
+        ],
+        market_timezone=CHICAGO,
+    )
+    # 09:00 in Chicago
+    now = datetime(2024, 3, 1, 14, 0, tzinfo=timezone.utc)
+    assert hours.is_open(1, now)
+    assert hours.is_open(2, now)
+    assert hours.is_open(3, now)
+    assert hours.is_open(4, now)
+    # 16:30 in Chicago
+    now = datetime(2024, 3, 1, 21, 30, tzinfo=timezone.utc)
+    assert not hours.is_open(1, now)
+    assert not hours.is_open(2, now)
+    assert not hours.is_open(3, now)
+    assert not hours.is_open(4, now)
+    assert hours.is_open(5, now)
+    assert hours.any_open([1, 5], now)
+
+
+def test_offset_times_ignore_the_market_timezone():
+    hours = TradingHours([spec(1, "08:30:00-05:00", "15:00:00-05:00")], timezone.utc)
+    assert hours.is_open(1, datetime(2024, 3, 1, 14, 0, tzinfo=timezone.utc))
+    assert not hours.is_open(1, datetime(2024, 3, 1, 9, 0, tzinfo=timezone.utc))
@@ -0,0 +1,42 @@
+import pytest
+
+import btnl_client.websocket as ws
+from btnl_client.feed_simulator import SyntheticMarket
+from btnl_client.protocol import Message, Side, new_message
+from btnl_client.protocol.pricefeed import Block, Book, BookLevel, Level, Trade
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        Trade(7, 42, Side.Ask, -150, 3),
+        Level(8, 42, Side.Bid, 10000, 0),
+        Block(9, 42, 10001, 500),
+        Book(
+            10,
+            42,
+            [BookLevel(100, 5), BookLevel(99, 1), BookLevel(98, 7)],
+            [BookLevel(101, 2), BookLevel(102, 4)],
+        ),
+        Book(11, 42, [BookLevel(100, 5)], []),
+        Book(12, 42, [], []),
+    ],
+)
+def test_round_trip(body):
+    assert type(body).from_btp(body.to_btp()) == body
+    frame = new_message(3, body).to_btp()
+    assert Message.from_btp(frame).body == body
+
+
+def test_book_keeps_the_last_level_of_each_side():
+    bids = [BookLevel(100 - i, i + 1) for i in range(10)]
+    asks = [BookLevel(101 + i, i + 1) for i in range(10)]
+    decoded = Book.from_btp(Book(1, 2, bids, asks).to_btp())
+    assert decoded.bids[-1] == BookLevel(91, 10)
+    assert decoded.asks[-1] == BookLevel(110, 10)
+
+
+def test_default_mix_includes_status():
+    market = SyntheticMarket({"BUIH4": 1}, seed=1)
+    kinds = {event.type for event in market.events(20_000)}
+    assert ws.MessageType.Status in kinds
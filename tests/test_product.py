@@ -0,0 +1,65 @@
+import threading
+import time
+
+from btnl_client.product import BitnomialHttpClient
+
+
+class FakeHttpClient(BitnomialHttpClient):
+    """
+    Answers spec lookups with `(product_id, day)`, counting requests and
+    how many run at once
+    """
+
+    def __init__(self, max_concurrency=2, delay=0.01):
+        super().__init__(max_concurrency=max_concurrency)
+        self.delay = delay
+        self.requests = []
+        self.running = 0
+        self.most_running = 0
+        self.lock = threading.Lock()
+
+    def get_product_spec(self, product_id, day=None, active=None, base_symbol=None):
+        with self.lock:
+            self.requests.append(product_id)
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        return (product_id, day)
+
+
+def test_results_follow_input_order_and_duplicates_are_fetched_once():
+    client = FakeHttpClient()
+    specs = client.get_product_specs_for([3, 1, 2, 1, 3], day="2024-01-02")
+    assert specs == [(i, "2024-01-02") for i in (3, 1, 2, 1, 3)]
+    assert sorted(client.requests) == [1, 2, 3]
+    assert client._in_flight == {}
+
+
+def test_concurrency_is_capped_at_the_pool_size():
+    client = FakeHttpClient(max_concurrency=2)
+    client.get_product_specs_for(range(8), concurrency=8)
+    assert client.most_running == 2
+
+
+def test_concurrent_calls_share_in_flight_requests():
+    client = FakeHttpClient(max_concurrency=4, delay=0.1)
+    results = {}
+
+    def fetch(name, product_ids):
+        results[name] = client.get_product_specs_for(product_ids)
+
+    threads = [
+        threading.Thread(target=fetch, args=("a", [1, 2])),
+        threading.Thread(target=fetch, args=("b", [2, 1])),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {"a": [(1, None), (2, None)], "b": [(2, None), (1, None)]}
+    assert sorted(client.requests) == [1, 2]
+    # Different arguments are different requests
+    client.get_product_specs_for([1], day="2024-01-02")
+    assert sorted(client.requests) == [1, 1, 2]
@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+
+from btnl_client.protocol import Modify, Open, Side, TimeInForce
+from btnl_client.rate_limit import Priority, RateGovernor, TokenBucket, default_priority
+
+# Powers of two keep the refilled token counts exact
+RATE = 64
+TICK = 1 / RATE
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def tick(clock, ticks=1):
+    """
+    Move the bucket's clock on and give the governor's timer, which runs on
+    the real loop, time to fire
+    """
+    for _ in range(ticks):
+        clock.now += TICK
+        await asyncio.sleep(TICK * 2)
+
+
+def test_bucket_refills_up_to_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(RATE, 4, clock)
+    assert all(bucket.try_take() for _ in range(4))
+    assert not bucket.try_take()
+    assert bucket.wait_time() == TICK
+    clock.now += 2 * TICK
+    assert bucket.tokens == 2
+    clock.now += 10.0
+    assert bucket.tokens == 4
+
+
+def test_oversize_take_waits_for_a_full_bucket_and_leaves_debt():
+    clock = FakeClock()
+    bucket = TokenBucket(RATE, 4, clock)
+    assert bucket.try_take(1)
+    assert not bucket.try_take(10)
+    assert bucket.wait_time(10) == TICK
+    clock.now += TICK
+    assert bucket.try_take(10)
+    assert bucket.tokens == -6
+    # The debt is paid back before anything else goes out
+    assert bucket.wait_time() == 7 * TICK
+
+
+def test_default_priority():
+    assert default_priority(Modify(1, 2, 100, 0)) == Priority.RiskReducing
+    assert default_priority(Modify(1, 2, 100, 1)) == Priority.Modify
+    assert default_priority(Open(1, 1, Side.Bid, 100, 1, TimeInForce.Day)) == (
+        Priority.Open
+    )
+
+
+def run_queued(test):
+    async def run():
+        clock = FakeClock()
+        governor = RateGovernor(RATE, 1, clock=clock)
+        released = []
+
+        def queue(name, priority=Priority.Open):
+            async def acquire():
+                await governor.acquire(priority)
+                released.append(name)
+
+            return asyncio.ensure_future(acquire())
+
+        # Spend the burst so everything after queues
+        await governor.acquire()
+        await test(clock, governor, queue, released)
+
+    asyncio.run(run())
+
+
+def test_queued_senders_are_released_by_priority():
+    async def test(clock, governor, queue, released):
+        queue("open 1")
+        queue("open 2")
+        queue("modify", Priority.Modify)
+        queue("cancel", Priority.RiskReducing)
+        await asyncio.sleep(0)
+        assert governor.queued == 4
+        await tick(clock, 4)
+        assert released == ["cancel", "modify", "open 1", "open 2"]
+        assert governor.queued == 0
+
+    run_queued(test)
+
+
+def test_queued_senders_are_paced_to_rate():
+    async def test(clock, governor, queue, released):
+        for i in range(5):
+            queue(i)
+        await asyncio.sleep(TICK * 2)
+        # Nothing goes out until the clock moves
+        assert released == []
+        for sent in range(1, 6):
+            await tick(clock)
+            assert released == list(range(sent))
+            assert governor.sent == sent + 1
+        # A sender arriving at a full bucket skips the queue
+        clock.now += 1.0
+        await governor.acquire()
+        assert governor.sent == 7
+
+    run_queued(test)
+
+
+def test_cancelled_waiters_are_skipped():
+    async def test(clock, governor, queue, released):
+        first = queue("first")
+        queue("second")
+        await asyncio.sleep(0)
+        first.cancel()
+        await tick(clock)
+        assert released == ["second"]
+        assert governor.queued == 0
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    run_queued(test)
+
+
+def test_utilization():
+    async def run():
+        clock = FakeClock()
+        governor = RateGovernor(RATE, 4, clock=clock)
+        assert governor.utilization == 0.0
+        await governor.acquire(count=2)
+        assert governor.utilization == 0.5
+        await governor.acquire(count=2)
+        assert governor.utilization == 1.0
+        clock.now += 4 * TICK
+        await governor.acquire(count=8)
+        # In debt still counts as at the limit
+        assert governor.utilization == 1.0
+        # Paying back the 4 tokens of debt, then refilling 2 of 4
+        clock.now += 6 * TICK
+        assert governor.utilization == 0.5
+
+    asyncio.run(run())
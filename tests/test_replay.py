@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import pytest
+
+import btnl_client.websocket as ws
+from btnl_client.client import OrderEntryClient
+from btnl_client.feed_simulator import MarketEvent
+from btnl_client.journal import Direction, JournalReader, JournalWriter
+from btnl_client.protocol import (
+    Ack,
+    Disconnect,
+    DisconnectReason,
+    Fill,
+    Heartbeat,
+    Liquidity,
+    new_message,
+)
+from btnl_client.replay import ReplayEngine
+
+SECOND = 1_000_000_000
+START = 1_000 * SECOND
+
+
+class RecordingClient(OrderEntryClient):
+    def __init__(self):
+        super().__init__("127.0.0.1", 0, 1, "00" * 32)
+        self.received = []
+
+    async def app_message(self, message):
+        self.received.append((self.clock.time(), message.body))
+
+
+class RecordingWebSocketClient(ws.BitnomialWebSocketClient):
+    def __init__(self):
+        super().__init__(receive_timestamps=True)
+        self.received = []
+
+    def handle_message(self, message):
+        self.received.append(message)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    path = str(tmp_path / "journal")
+    writer = JournalWriter(path)
+    frames = [
+        (0, Ack(1, 10, None)),
+        (10, Fill(2, 10, 100, 1, Liquidity.Add)),
+        (46, Disconnect(DisconnectReason.HeartbeatFault, None, None)),
+    ]
+    for sequence_id, (offset, body) in enumerate(frames, 1):
+        frame = new_message(sequence_id, body).to_btp()
+        writer.record(Direction.BtpIn, frame, START + offset * SECOND)
+    trade = MarketEvent(
+        ws.MessageType.Trade, 3, "BUIZ6", 1, START, price=100, quantity=2
+    ).to_json()
+    writer.record(Direction.WsIn, trade.encode(), START + 47 * SECOND)
+    writer.close()
+    reader = JournalReader(path)
+    yield reader
+    reader.close()
+
+
+def test_replay_dispatches_with_heartbeats_and_resets_on_disconnect(journal):
+    client = RecordingClient()
+    client.sequence_id = 7
+    ws_client = RecordingWebSocketClient()
+    engine = ReplayEngine(journal, client, ws_client)
+    assert asyncio.run(engine.run()) == 4
+    # Handlers see the recorded times on the virtual clock
+    assert client.received == [
+        (1000.0, Ack(1, 10, None)),
+        (1010.0, Fill(2, 10, 100, 1, Liquidity.Add)),
+    ]
+    [trade] = ws_client.received
+    assert (trade.symbol, trade.received_ns) == ("BUIZ6", START + 47 * SECOND)
+    # Nothing was written between 1000 and 1030, so one heartbeat went out
+    assert engine.writer.messages() == [new_message(0, Heartbeat())]
+    assert [e.disconnect.disconnect_reason for e in engine.disconnects] == [
+        DisconnectReason.HeartbeatFault
+    ]
+    assert client.sequence_id == 1
+
+
+def test_replay_stops_at_until(journal):
+    client = RecordingClient()
+    engine = ReplayEngine(journal, client, heartbeats=False)
+    assert asyncio.run(engine.run(until_ns=START + 20 * SECOND)) == 2
+    assert engine.writer.frames == []
+    assert engine.disconnects == []
+
+
+def test_replay_is_paced_by_speed(journal):
+    engine = ReplayEngine(journal, RecordingClient(), speed=100.0)
+    started = time.perf_counter()
+    asyncio.run(engine.run())
+    # 47 recorded seconds at 100 times real time
+    assert 0.47 <= time.perf_counter() - started < 2.0
+
+
+def test_speed_must_be_positive(journal):
+    with pytest.raises(ValueError):
+        ReplayEngine(journal, speed=0)
@@ -0,0 +1,81 @@
+import pytest
+
+from btnl_client.protocol import (
+    Ack,
+    MarketState,
+    Modify,
+    Open,
+    Reject,
+    RejectReason,
+    Side,
+    TimeInForce,
+)
+from btnl_client.risk import ProductLimits, RiskGate
+
+
+def gate():
+    gate = RiskGate()
+    gate.set_limits(1, ProductLimits(5, 100, 1000, 50.0, max_position=10))
+    return gate
+
+
+def test_zero_price_increment_is_refused():
+    with pytest.raises(ValueError):
+        ProductLimits(0, 100, 1000, 50.0)
+
+
+def test_release_gives_back_an_unsent_open():
+    risk = gate()
+    body = Open(1, 1, Side.Bid, 100, 10, TimeInForce.Day)
+    assert risk.check(body) is None
+    assert risk.working[1] == [10, 0]
+    risk.release(body)
+    assert risk.working[1] == [0, 0]
+    assert risk.check(body) is None
+
+
+def test_modify_is_applied_on_ack():
+    risk = gate()
+    risk.check(Open(1, 1, Side.Bid, 100, 4, TimeInForce.Day))
+    assert risk.check(Modify(1, 7, 105, 6)) is None
+    # The increase is reserved but the order is unchanged until the Ack
+    assert risk.working[1] == [6, 0]
+    assert (risk.orders[1].price, risk.orders[1].quantity) == (100, 4)
+    risk.on_message(Ack(1, 1, 7))
+    assert (risk.orders[1].price, risk.orders[1].quantity) == (105, 6)
+    assert risk.working[1] == [6, 0]
+
+
+def test_rejected_modify_leaves_the_order_working():
+    risk = gate()
+    risk.check(Open(1, 1, Side.Bid, 100, 4, TimeInForce.Day))
+    risk.check(Modify(1, 7, 105, 10))
+    # No room for another 6 while the modify's reservation is held
+    assert (
+        risk.check(Open(2, 1, Side.Bid, 100, 6, TimeInForce.Day))
+        == RejectReason.PositionLimitExceeded
+    )
+    risk.on_message(Reject(1, 7, RejectReason.PriceOutsidePriceBands))
+    assert (risk.orders[1].price, risk.orders[1].quantity) == (100, 4)
+    assert risk.working[1] == [4, 0]
+    assert risk.check(Open(2, 1, Side.Bid, 100, 6, TimeInForce.Day)) is None
+
+
+def test_released_modify_gives_back_its_reservation():
+    risk = gate()
+    risk.check(Open(1, 1, Side.Ask, 100, 4, TimeInForce.Day))
+    body = Modify(1, 7, 100, 9)
+    risk.check(body)
+    assert risk.working[1] == [0, 9]
+    risk.release(body)
+    assert risk.working[1] == [0, 4]
+    assert risk.orders[1].quantity == 4
+
+
+def test_cancel_passes_even_when_halted():
+    risk = gate()
+    risk.check(Open(1, 1, Side.Bid, 100, 4, TimeInForce.Day))
+    risk.set_market_state(1, MarketState.Halt)
+    assert risk.check(Modify(1, 7, 100, 0)) is None
+    risk.on_message(Ack(1, 1, 7))
+    assert risk.working[1] == [0, 0]
@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from btnl_client.client import HeartbeatTimeout
+from btnl_client.metrics import ClientMetrics
+from btnl_client.product import Pagination
+from btnl_client.session import SupervisedOrderEntryClient
+
+
+class FakeFeed:
+    def __init__(self, rows, cap=2):
+        self.rows = rows
+        self.cap = cap
+        self.calls = []
+
+    def __call__(self, cursor=None, **filters):
+        self.calls.append(filters)
+        start = int(cursor or 0)
+        page = self.rows[start : start + self.cap]
+        return Pagination(page, {"cursor": str(start + len(page)) if page else None})
+
+
+class FakeHttpClient:
+    def __init__(self, fills, orders):
+        self.get_fills = FakeFeed(fills)
+        self.get_orders = FakeFeed(orders)
+
+
+class RecordingClient(SupervisedOrderEntryClient):
+    def __init__(self, http_client):
+        super().__init__("127.0.0.1", 0, 7, "00" * 32, http_client=http_client)
+        self.replayed = []
+        self.reconciled = None
+
+    async def app_message(self, message):
+        self.replayed.append(message.body.ack_id)
+
+    async def on_reconcile(self, working_orders, missed_fills):
+        self.reconciled = working_orders, missed_fills
+
+
+def fill(ack_id):
+    return {
+        "ack_id": ack_id,
+        "order_id": 1,
+        "price": 100,
+        "quantity_filled": 1,
+        "liquidity": "Add",
+    }
+
+
+def test_reconcile_pages_and_replays_unseen_fills():
+    orders = [{"id": i, "status": "Working" if i % 2 else "Closed"} for i in range(5)]
+    http = FakeHttpClient([fill(i) for i in range(1, 6)], orders)
+    client = RecordingClient(http)
+    client.last_ack_id = 2
+    client.last_received_at = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    asyncio.run(client.reconcile())
+    assert client.replayed == [3, 4, 5]
+    assert [o["id"] for o in client.reconciled[0]] == [1, 3]
+    assert http.get_fills.calls[0]["begin_time"] == datetime(
+        2024, 1, 2, tzinfo=timezone.utc
+    )
+    assert len(http.get_fills.calls) == 4
+
+
+def test_fail_pending():
+    async def run():
+        client = RecordingClient(None)
+        future = asyncio.get_running_loop().create_future()
+        client.pending_acks[(1, None)] = future
+        client.fail_pending(HeartbeatTimeout("gone"))
+        assert client.pending_acks == {}
+        with pytest.raises(HeartbeatTimeout):
+            await future
+
+    asyncio.run(run())
+
+
+def test_pending_ack_depth_survives_fail_pending():
+    async def run():
+        metrics = ClientMetrics(client="c1")
+        client = SupervisedOrderEntryClient(
+            "127.0.0.1", 0, 7, "00" * 32, http_client=None, metrics=metrics
+        )
+        loop = asyncio.get_running_loop()
+        client.pending_acks[(1, None)] = loop.create_future()
+        client.fail_pending(HeartbeatTimeout("gone"))
+        client.pending_acks[(2, None)] = loop.create_future()
+        assert dict(metrics.queue_depth.samples())[("c1", "pending_acks")] == 1
+
+    asyncio.run(run())
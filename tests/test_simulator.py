@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+
+from btnl_client.protocol import (
+    Ack,
+    Close,
+    CloseReason,
+    Disconnect,
+    DisconnectReason,
+    Fill,
+    Heartbeat,
+    Liquidity,
+    LoginAck,
+    LoginRequest,
+    LogoutRequest,
+    Message,
+    Modify,
+    Open,
+    Side,
+    TimeInForce,
+    new_message,
+)
+from btnl_client.simulator import ExchangeSimulator
+
+
+class RawConnection:
+    """
+    A bare BTP connection to the simulator, writing bodies with consecutive
+    sequence ids
+    """
+
+    connections = []
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.sequence_id = 1
+
+    @classmethod
+    async def login(cls, simulator, connection_id=1, heartbeat_interval=30):
+        reader, writer = await asyncio.open_connection("127.0.0.1", simulator.port)
+        connection = cls(reader, writer)
+        cls.connections.append(connection)
+        connection.send(LoginRequest(connection_id, bytes(32), heartbeat_interval))
+        return connection
+
+    def send(self, body, sequence_id=None):
+        if sequence_id is None:
+            sequence_id = self.sequence_id
+            self.sequence_id += 1
+        self.writer.write(new_message(sequence_id, body).to_btp())
+
+    async def receive(self):
+        while True:
+            message = Message.from_btp(await Message.read_frame(self.reader))
+            if not isinstance(message.body, Heartbeat):
+                return message.body
+
+    async def receive_many(self, count):
+        return [await self.receive() for _ in range(count)]
+
+
+def run_with_simulator(test):
+    async def run():
+        simulator = ExchangeSimulator()
+        await simulator.start()
+        try:
+            await asyncio.wait_for(test(simulator), 5)
+        finally:
+            while RawConnection.connections:
+                RawConnection.connections.pop().writer.close()
+            # Let the simulator see the connections go before closing it
+            await asyncio.sleep(0.01)
+            await simulator.close()
+
+    asyncio.run(run())
+
+
+def test_disconnect_round_trips():
+    disconnect = Disconnect(DisconnectReason.SequenceIdFault, 4, 7)
+    assert Disconnect.from_btp(disconnect.to_btp()) == disconnect
+    heartbeat = Disconnect(DisconnectReason.HeartbeatFault, None, None)
+    assert Disconnect.from_btp(heartbeat.to_btp()) == heartbeat
+
+
+def test_zero_heartbeat_interval_is_refused():
+    async def test(simulator):
+        connection = await RawConnection.login(simulator, heartbeat_interval=0)
+        body = await connection.receive()
+        assert body == Disconnect(DisconnectReason.ParseFailure, None, None)
+        assert simulator.sessions == {}
+
+    run_with_simulator(test)
+
+
+def test_crossing_orders_fill_both_sides():
+    async def test(simulator):
+        maker = await RawConnection.login(simulator, 1)
+        taker = await RawConnection.login(simulator, 2)
+        assert await maker.receive() == LoginAck()
+        assert await taker.receive() == LoginAck()
+        maker.send(Open(1, 5, Side.Ask, 100, 3, TimeInForce.Day))
+        assert isinstance(await maker.receive(), Ack)
+        taker.send(Open(2, 5, Side.Bid, 101, 2, TimeInForce.IOC))
+        ack, fill = await taker.receive_many(2)
+        assert isinstance(ack, Ack)
+        assert (fill.order_id, fill.price, fill.quantity) == (2, 100, 2)
+        assert fill.liquidity == Liquidity.Remove
+        resting = await maker.receive()
+        assert isinstance(resting, Fill) and resting.liquidity == Liquidity.Add
+        assert simulator.book(5).depth(Side.Ask, 1) == [(100, 1)]
+        # The unfilled rest of an IOC order is closed
+        taker.send(Open(3, 5, Side.Bid, 100, 2, TimeInForce.IOC))
+        ack, fill, close = await taker.receive_many(3)
+        assert fill.quantity == 1
+        assert close.close_reason == CloseReason.IOCFinished
+
+    run_with_simulator(test)
+
+
+def test_cancel_by_modify_closes_the_order():
+    async def test(simulator):
+        connection = await RawConnection.login(simulator)
+        assert await connection.receive() == LoginAck()
+        connection.send(Open(1, 5, Side.Bid, 100, 3, TimeInForce.Day))
+        assert isinstance(await connection.receive(), Ack)
+        connection.send(Modify(1, 1, 100, 0))
+        ack, close = await connection.receive_many(2)
+        assert (ack.order_id, ack.modify_id) == (1, 1)
+        assert isinstance(close, Close) and close.order_id == 1
+        assert simulator.orders == {}
+        assert simulator.book(5).depth(Side.Bid, 1) == []
+
+    run_with_simulator(test)
+
+
+def test_sequence_gap_disconnects():
+    async def test(simulator):
+        connection = await RawConnection.login(simulator)
+        assert await connection.receive() == LoginAck()
+        connection.send(Open(1, 5, Side.Bid, 100, 1, TimeInForce.Day), sequence_id=5)
+        body = await connection.receive()
+        assert body == Disconnect(DisconnectReason.SequenceIdFault, 2, 5)
+
+    run_with_simulator(test)
+
+
+@pytest.mark.parametrize("persist_orders", ["N", "Y"])
+def test_logout_closes_cleanly(persist_orders):
+    async def test(simulator):
+        connection = await RawConnection.login(simulator)
+        assert await connection.receive() == LoginAck()
+        connection.send(Open(1, 5, Side.Bid, 100, 3, TimeInForce.Day))
+        connection.send(LogoutRequest(persist_orders))
+        assert isinstance(await connection.receive(), Ack)
+        # The connection is closed without a Disconnect
+        with pytest.raises(asyncio.IncompleteReadError):
+            await connection.receive()
+        assert simulator.sessions == {}
+        resting = [(100, 3)] if persist_orders == "Y" else []
+        assert simulator.book(5).depth(Side.Bid, 1) == resting
+
+    run_with_simulator(test)
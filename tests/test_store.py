@@ -0,0 +1,78 @@
+from btnl_client.product import Pagination
+from btnl_client.store import LocalStore, SyncEngine, checkpoint_name
+
+
+class FakeFeed:
+    """
+    Serves `rows` in pages of at most `cap` rows, whatever limit is asked
+    for, with the row offset as the cursor
+    """
+
+    def __init__(self, rows, cap=2):
+        self.rows = rows
+        self.cap = cap
+        self.calls = []
+
+    def __call__(self, order=None, limit=None, cursor=None, **filters):
+        self.calls.append((cursor, filters))
+        start = int(cursor or 0)
+        page = self.rows[start : start + min(limit, self.cap)]
+        end = start + len(page)
+        return Pagination(page, {"cursor": str(end) if page else None})
+
+
+class FakeClient:
+    def __init__(self, fills=(), orders=(), block_trades=()):
+        self.get_fills = FakeFeed(list(fills))
+        self.get_orders = FakeFeed(list(orders))
+        self.get_block_trades = FakeFeed(list(block_trades))
+
+
+def fill(ack_id):
+    return {"ack_id": ack_id, "order_id": ack_id, "symbol": "BUIH4"}
+
+
+def order(order_id, status):
+    return {"id": order_id, "open_ack_id": order_id * 10, "status": status}
+
+
+def test_pages_past_a_server_capped_limit():
+    client = FakeClient(fills=[fill(i) for i in range(1, 6)])
+    store = LocalStore()
+    assert SyncEngine(client, store).sync_fills() == 5
+    assert [f["ack_id"] for f in store.fills()] == [1, 2, 3, 4, 5]
+    assert store.checkpoint("fills") == ("5", 5)
+
+
+def test_checkpoints_are_kept_per_filter():
+    client = FakeClient(fills=[fill(i) for i in range(1, 4)])
+    store = LocalStore()
+    engine = SyncEngine(client, store)
+    engine.sync_fills(symbols=["BUIH4"])
+    client.get_fills.calls.clear()
+    engine.sync_fills(symbols=["BUIM4"])
+    # A different filter starts from the beginning, not the other's cursor
+    assert client.get_fills.calls[0] == (None, {"symbols": ["BUIM4"]})
+    assert store.checkpoint(checkpoint_name("fills", {"symbols": ["BUIH4"]}))[0] == "3"
+
+
+def test_working_orders_are_synced_again_until_closed():
+    orders = [order(1, "Closed"), order(2, "Closed"), order(3, "Working")]
+    orders += [order(4, "Closed")]
+    client = FakeClient(orders=orders)
+    store = LocalStore()
+    engine = SyncEngine(client, store)
+    engine.sync_orders()
+    # Held at the page with the Working order
+    assert store.checkpoint("orders") == ("2", 40)
+    client.get_orders.rows[2] = order(3, "Closed")
+    engine.sync_orders()
+    assert store.order(3)["status"] == "Closed"
+    assert store.checkpoint("orders")[0] == "4"
+
+
+def test_block_trades_checkpoint_only_the_cursor():
+    trades = [{"block_trade_id": i, "status": "Accepted"} for i in range(3)]
+    store = LocalStore()
+    assert SyncEngine(FakeClient(block_trades=trades), store).sync_block_trades() == 3
+    assert store.checkpoint("block_trades") == ("3", None)
@@ -0,0 +1,36 @@
+import asyncio
+
+from btnl_client.strategy import Strategy
+from btnl_client.timers import VirtualClock
+
+
+class FakeClient:
+    def __init__(self):
+        self.clock = VirtualClock()
+
+
+class FailingTimer(Strategy):
+    def __init__(self):
+        super().__init__()
+        self.errors = []
+
+    async def tick(self):
+        raise RuntimeError("boom")
+
+    def on_error(self, exc):
+        self.errors.append(exc)
+
+
+def test_timer_task_failures_reach_on_error():
+    async def run():
+        strategy = FailingTimer()
+        strategy.attach(FakeClient())
+        strategy.call_later(1.0, strategy.tick)
+        strategy.client.clock.advance(1.0)
+        assert len(strategy.tasks) == 1
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert strategy.tasks == set()
+        assert [str(e) for e in strategy.errors] == ["boom"]
+
+    asyncio.run(run())
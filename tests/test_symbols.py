@@ -0,0 +1,118 @@
+import pytest
+
+from btnl_client.product import SpreadSpecLeg, parse_product_spec
+from btnl_client.symbols import SymbolIndex, SymbolResolver
+
+
+def spec(product_id, symbol, spec_type="future", **fields):
+    data = {
+        "type": spec_type,
+        "product_id": product_id,
+        "product_name": symbol,
+        "max_order_quantity": 100,
+        "min_block_size": 10,
+        "price_band_variation": 50,
+        "price_limit_percentage": 10.0,
+        "price_increment": 5,
+        "first_trading_day": "2024-01-02",
+        "final_settle_time": "2024-12-27T21:00:00Z",
+        "daily_open_time": "23:00:00Z",
+        "daily_settle_time": "21:00:00Z",
+        "symbol": symbol,
+        "cqg_symbol": symbol,
+        "product_status": "active",
+        "base_symbol": "BUI",
+    }
+    if spec_type == "future":
+        data.update(
+            margin_unit="USD",
+            settlement_method="physical",
+            contract_size=0.1,
+            contract_size_unit="BTC",
+            price_quotation_unit="USD",
+            month=6,
+            year=2024,
+        )
+    data.update(fields)
+    return parse_product_spec(data)
+
+
+def specs():
+    return [
+        spec(1, "BUIM4"),
+        spec(2, "BUIU4"),
+        spec(
+            3,
+            "BUIM4-BUIU4",
+            "spread",
+            legs=[{"product_id": 1, "weight": 1}, {"product_id": 2, "weight": -1}],
+        ),
+        # Legs built in code rather than parsed from JSON
+        spec(
+            4, "BUIM4:BUIU4", "spread", legs=[SpreadSpecLeg(1, 1), SpreadSpecLeg(2, -1)]
+        ),
+        spec(
+            5,
+            "BUIM4 C70000",
+            "option",
+            underlying_product=1,
+            strike_price=70000.0,
+            option_type="call",
+        ),
+    ]
+
+
+def test_lookup_in_both_directions():
+    index = SymbolIndex(specs())
+    assert len(index) == 5
+    assert index.product_id("BUIU4") == 2
+    assert index.symbol(2) == "BUIU4"
+    assert index.spec(2).symbol == "BUIU4"
+    assert index.get_product_id("BUIZ4") is None
+    assert index.get_symbol(9) is None
+    with pytest.raises(KeyError):
+        index.product_id("BUIZ4")
+    # Symbols are interned, so one parsed elsewhere resolves to the same object
+    parsed = "".join(["BUI", "U4"])
+    assert index.symbol(index.product_id(parsed)) is index.symbol(2)
+    with pytest.raises(TypeError):
+        index.product_ids["BUIZ4"] = 9
+
+
+def test_spread_legs_and_options_are_linked():
+    index = SymbolIndex(specs())
+    assert index.legs(3) == (1, 2)
+    assert index.legs(4) == (1, 2)
+    assert index.spreads_with_leg(1) == (3, 4)
+    assert index.spreads_with_leg(2) == (3, 4)
+    assert index.legs(1) == ()
+    assert index.spreads_with_leg(3) == ()
+    assert index.underlying(5) == 1
+    assert index.options_on(1) == (5,)
+    assert index.underlying(1) is None
+    assert index.options_on(2) == ()
+
+
+def test_refresh_swaps_in_a_new_index():
+    resolver = SymbolResolver(specs()[:2])
+    before = resolver.index
+    assert resolver.product_id("BUIM4") == 1
+    after = resolver.refresh([spec(1, "BUIM4"), spec(6, "BUIZ4")])
+    assert resolver.index is after
+    assert resolver.product_id("BUIZ4") == 6
+    assert resolver.symbol(6) == "BUIZ4"
+    with pytest.raises(KeyError):
+        resolver.product_id("BUIU4")
+    # Readers holding the old index keep a consistent view
+    assert before.product_id("BUIU4") == 2
+    assert before.get_product_id("BUIZ4") is None
+
+
+def test_from_client():
+    class FakeHttpClient:
+        def get_product_specs(self, **kwargs):
+            assert kwargs == {"active": True}
+            return specs()
+
+    resolver = SymbolResolver.from_client(FakeHttpClient(), active=True)
+    assert resolver.symbol(5) == "BUIM4 C70000"
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from btnl_client.client import HeartbeatTimeout, OrderEntryClient
+from btnl_client.protocol import Heartbeat, Message
+from btnl_client.timers import DeadlineTimer, VirtualClock
+
+
+class FakeWriter:
+    def __init__(self):
+        self.frames = []
+
+    def write(self, frame):
+        self.frames.append(Message.from_btp(frame).body)
+
+    def close(self):
+        pass
+
+
+class QuietClient(OrderEntryClient):
+    HEARTBEAT_INTERVAL = 10
+
+    async def app_message(self, message):
+        pass
+
+
+def virtual_client(**kwargs):
+    client = QuietClient("127.0.0.1", 0, 1, "00" * 32, clock=VirtualClock(), **kwargs)
+    client.writer = FakeWriter()
+    return client
+
+
+async def advance(client, to):
+    client.clock.advance(to)
+    # Let the heartbeat loop see a failed future
+    await asyncio.sleep(0)
+
+
+def test_deadline_timer_fires_once_at_the_latest_deadline():
+    clock = VirtualClock()
+    fired = []
+    timer = DeadlineTimer(clock, lambda: fired.append(clock.time()))
+    timer.arm(5.0)
+    timer.arm(3.0)
+    assert timer.armed and timer.deadline == 3.0
+    clock.advance(10.0)
+    assert fired == [3.0]
+    assert not timer.armed and timer.deadline is None
+    timer.arm(12.0)
+    timer.cancel()
+    clock.advance(20.0)
+    assert fired == [3.0]
+
+
+def test_heartbeats_are_sent_only_when_nothing_else_was():
+    async def run():
+        client = virtual_client()
+        # Out of the way of the receive timeout
+        client.RECEIVE_TIMEOUT_FACTOR = 10
+        loop = asyncio.ensure_future(client.heartbeat_loop())
+        await asyncio.sleep(0)
+        await advance(client, 9.0)
+        assert client.writer.frames == []
+        await advance(client, 10.0)
+        assert client.writer.frames == [Heartbeat()]
+        # Any write pushes the next heartbeat back
+        await advance(client, 15.0)
+        client.reset_heartbeat_timer()
+        await advance(client, 24.0)
+        assert client.writer.frames == [Heartbeat()]
+        await advance(client, 25.0)
+        assert client.writer.frames == [Heartbeat(), Heartbeat()]
+        assert not loop.done()
+        loop.cancel()
+
+    asyncio.run(run())
+
+
+def test_silence_fails_the_heartbeat_loop():
+    async def run():
+        client = virtual_client()
+        loop = asyncio.ensure_future(client.heartbeat_loop())
+        await asyncio.sleep(0)
+        # Received at 10, so the 15s timeout runs to 25
+        client.last_received_msg_time = 10.0
+        await advance(client, 20.0)
+        assert not loop.done()
+        await advance(client, 25.0)
+        with pytest.raises(HeartbeatTimeout):
+            await loop
+
+    asyncio.run(run())
+
+
+def test_receive_timeout_callback_replaces_the_failure():
+    async def run():
+        timeouts = []
+        client = virtual_client(on_receive_timeout=lambda: timeouts.append(1))
+        loop = asyncio.ensure_future(client.heartbeat_loop())
+        await asyncio.sleep(0)
+        await advance(client, 15.0)
+        assert timeouts == [1]
+        assert not loop.done()
+        # Re-armed for another full timeout
+        await advance(client, 29.0)
+        assert timeouts == [1]
+        await advance(client, 30.0)
+        assert timeouts == [1, 1]
+        loop.cancel()
+
+    asyncio.run(run())
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import signal
+
+import pytest
+
+from btnl_client import tracing
+from btnl_client.client import OrderEntryClient
+from btnl_client.protocol import LoginAck, new_message
+
+
+class QuietClient(OrderEntryClient):
+    async def app_message(self, message):
+        pass
+
+
+def test_client_read_path_is_traced():
+    async def run():
+        client = QuietClient("127.0.0.1", 0, 1, "00" * 32)
+        client.reader = asyncio.StreamReader()
+        client.reader.feed_data(new_message(1, LoginAck()).to_btp() * 2)
+        ring = tracing.RingBuffer()
+        tracing.register(ring)
+        try:
+            assert (await client.read_message()).body == LoginAck()
+        finally:
+            tracing.unregister(ring)
+        # Nothing is recorded once the tracer is gone
+        assert (await client.read_message()).body == LoginAck()
+        [record] = ring.records
+        assert (record.site, record.kind) == (tracing.READ_MESSAGE, "LoginAck")
+        assert [name for name, _ in record.stages] == ["record", "decode"]
+
+    asyncio.run(run())
+
+
+async def wait_for(condition):
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("Timed out")
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGUSR1"), reason="Unix only")
+def test_sigusr1_toggles_the_slowest_sampler():
+    async def run():
+        sampler = tracing.SlowestSampler(n=2)
+        lines = []
+        tracing.toggle_on_signal(sampler, out=lines.append)
+        try:
+            os.kill(os.getpid(), signal.SIGUSR1)
+            await wait_for(lambda: sampler in tracing.TRACERS)
+            for kind, ns in (("Open", 5_000), ("Modify", 9_000), ("Ack", 1_000)):
+                tracing.emit(tracing.SEND_MESSAGE, kind, 0, (("write", ns),))
+            os.kill(os.getpid(), signal.SIGUSR1)
+            await wait_for(lambda: sampler not in tracing.TRACERS)
+        finally:
+            tracing.unregister(sampler)
+        assert [line.split()[:3] for line in lines] == [
+            ["send_message", "Modify", "9.0us"],
+            ["send_message", "Open", "5.0us"],
+        ]
+        # Started afresh for the next time it is switched on
+        assert sampler.slowest() == []
+
+    asyncio.run(run())
@@ -0,0 +1,79 @@
+import asyncio
+import socket
+import sys
+
+import pytest
+
+from btnl_client.transport import (
+    PROFILES,
+    TCP_QUICKACK,
+    TransportProfile,
+    open_connection,
+    use_uvloop,
+)
+
+
+@pytest.fixture
+def sock():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        yield sock
+
+
+def test_default_profile_sets_nothing(sock):
+    nodelay = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+    assert TransportProfile().apply(sock) == {}
+    assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY) == nodelay
+
+
+def test_options_are_set(sock):
+    profile = TransportProfile(nodelay=True, rcvbuf=1 << 16, sndbuf=1 << 16)
+    assert profile.apply(sock) == {}
+    assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+    # Linux doubles the requested sizes for its bookkeeping
+    assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) >= 1 << 16
+    assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF) >= 1 << 16
+    TransportProfile(nodelay=False).apply(sock)
+    assert not sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+
+
+def test_unsettable_options_are_skipped_with_a_reason(sock):
+    skipped = PROFILES["busy_poll"].apply(sock)
+    assert set(skipped) <= {"quickack", "busy_poll"}
+    if not sys.platform.startswith("linux"):
+        assert skipped == {"quickack": "Linux only", "busy_poll": "Linux only"}
+    assert all(reason for reason in skipped.values())
+    if "quickack" not in skipped:
+        assert sock.getsockopt(socket.IPPROTO_TCP, TCP_QUICKACK)
+
+
+def test_open_connection_applies_the_profile():
+    async def run():
+        server = await asyncio.start_server(lambda r, w: w.close(), "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        profile = TransportProfile(nodelay=False, read_chunk=1 << 12)
+        reader, writer, skipped = await open_connection("127.0.0.1", port, profile)
+        try:
+            sock = writer.get_extra_info("socket")
+            assert not sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+            if "read_chunk" not in skipped:
+                assert writer.transport.max_size == 1 << 12
+        finally:
+            writer.close()
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(run())
+
+
+def test_use_uvloop_reports_availability():
+    policy = asyncio.get_event_loop_policy()
+    try:
+        try:
+            import uvloop  # noqa: F401
+        except ImportError:
+            assert use_uvloop() is False
+            assert asyncio.get_event_loop_policy() is policy
+        else:
+            assert use_uvloop() is True
+    finally:
+        asyncio.set_event_loop_policy(policy)
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from btnl_client.websocket import parse_timestamp
+
+
+def epoch_ns(*args, offset=timedelta(0), nanos=0):
+    when = datetime(*args, tzinfo=timezone(offset))
+    return int(when.timestamp()) * 1_000_000_000 + nanos
+
+
+@pytest.mark.parametrize(
+    "timestamp, expected",
+    [
+        (
+            "2024-03-01T12:30:45.123456789Z",
+            epoch_ns(2024, 3, 1, 12, 30, 45, nanos=123_456_789),
+        ),
+        ("2024-03-01T12:30:45.5Z", epoch_ns(2024, 3, 1, 12, 30, 45, nanos=500_000_000)),
+        ("2024-03-01T12:30:45Z", epoch_ns(2024, 3, 1, 12, 30, 45)),
+        ("2024-03-01 12:30:45.000001Z", epoch_ns(2024, 3, 1, 12, 30, 45, nanos=1_000)),
+        # Digits past nanoseconds are dropped
+        (
+            "2024-03-01T12:30:45.1234567891Z",
+            epoch_ns(2024, 3, 1, 12, 30, 45, nanos=123_456_789),
+        ),
+    ],
+)
+def test_fractional_seconds(timestamp, expected):
+    assert parse_timestamp(timestamp) == expected
+
+
+@pytest.mark.parametrize("zone", ["+05:30", "+0530", "-08:00", "Z", ""])
+def test_zone_offsets(zone):
+    sign = -1 if zone.startswith("-") else 1
+    hours, minutes = (int(zone[1:3]), int(zone[-2:])) if len(zone) > 1 else (0, 0)
+    offset = sign * timedelta(hours=hours, minutes=minutes)
+    expected = epoch_ns(2024, 3, 1, 12, 30, 45, offset=offset, nanos=250_000_000)
+    assert parse_timestamp(f"2024-03-01T12:30:45.25{zone}") == expected
+    # The same wall clock time in UTC differs by exactly the offset
+    utc = parse_timestamp("2024-03-01T12:30:45.25Z")
+    assert utc - expected == int(offset.total_seconds()) * 1_000_000_000
+
+
+def test_cached_seconds_follow_second_boundaries():
+    before = parse_timestamp("2023-12-31T23:59:59.999999999Z")
+    after = parse_timestamp("2024-01-01T00:00:00.000000000Z")
+    assert after - before == 1
+    # Cached prefixes give the same answers the second time round
+    assert parse_timestamp("2023-12-31T23:59:59.999999999Z") == before
+    assert parse_timestamp("2024-01-01T00:00:00.000000001Z") == after + 1
+    # An offset is not cached as the UTC result of the same prefix
+    assert (
+        parse_timestamp("2024-01-01T00:00:00.000000000+01:00")
+        == after - 3_600_000_000_000
+    )
+
+
+def test_invalid_timestamp():
+    with pytest.raises(ValueError):
+        parse_timestamp("yesterday")